@@ -1,4 +1,11 @@
-"""Forensics package: expose analysis modules."""
-from . import ela, cfa, hos, jpeg_ghost, rambino, geometric_3d, lighting_text, watermarking, statistical_anomaly
+"""Forensics package: expose analysis modules (imported on first attribute access)."""
+import importlib
 
-__all__ = ["ela", "cfa", "hos", "jpeg_ghost", "rambino", "geometric_3d", "lighting_text", "watermarking", "statistical_anomaly"]
\ No newline at end of file
+__all__ = ["ela", "cfa", "hos", "jpeg_ghost", "rambino", "geometric_3d", "lighting_text", "watermarking", "statistical_anomaly"]
+
+
+def __getattr__(name):
+    # Detector modules import heavy dependencies, so they are only loaded when used
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,81 @@
 import numpy as np
 from PIL import Image
 import io
-from skimage.feature import graycomatrix, graycoprops
 
-def analyze_cfa(image_bytes: bytes):
+
+def _glcm_counts(channel: np.ndarray, distances=(1,), angles=(0.0,), levels: int = 256) -> np.ndarray:
+    """
+    Builds symmetric gray-level co-occurrence counts for several offsets in one pass.
+
+    Every (distance, angle) offset contributes its pixel pairs to a single paired-index
+    ``np.bincount``, so no per-offset float matrix is ever allocated. Offsets follow the
+    skimage ``graycomatrix`` convention (row = round(sin(angle) * d), col = round(cos(angle) * d)).
+
+    Args:
+        channel: 2-D uint8 image channel.
+        distances: Pixel pair distances.
+        angles: Pixel pair angles in radians.
+        levels: Number of gray levels; 256 keeps full precision, 64 or 32 quantize first.
+
+    Returns:
+        An int64 array of shape (len(distances), len(angles), levels, levels) holding
+        unnormalized symmetric co-occurrence counts.
+    """
+    if 256 % levels != 0:
+        raise ValueError(f"levels must divide 256, got {levels}")
+    offsets = [(int(round(np.sin(angle) * d)), int(round(np.cos(angle) * d))) for d in distances for angle in angles]
+    # Smallest integer type that can hold every paired index keeps the bincount input compact
+    code_dtype = np.uint16 if len(offsets) * levels * levels <= 1 << 16 else np.intp
+    quantized = channel.astype(code_dtype) // (256 // levels)
+    height, width = quantized.shape
+
+    codes = []
+    for k, (dr, dc) in enumerate(offsets):
+        first = quantized[max(0, -dr):height - max(0, dr), max(0, -dc):width - max(0, dc)]
+        second = quantized[max(0, dr):height - max(0, -dr), max(0, dc):width - max(0, -dc)]
+        codes.append(((k * levels + first) * levels + second).ravel())
+
+    codes = codes[0] if len(codes) == 1 else np.concatenate(codes)
+    counts = np.bincount(codes, minlength=len(offsets) * levels * levels)
+    counts = counts.reshape(len(offsets), levels, levels)
+    counts = counts + counts.transpose(0, 2, 1)
+    return counts.reshape(len(distances), len(angles), levels, levels)
+
+
+def _glcm_contrast_correlation(counts: np.ndarray):
+    """
+    Computes GLCM contrast and correlation straight from symmetric co-occurrence counts.
+
+    Only the per-offset totals, row marginals and the i*j cross moment are formed, so the
+    full matrix is never normalized. Gray values are expressed on the 0-255 scale, which
+    keeps contrast comparable between quantized and full-precision counts.
+
+    Args:
+        counts: Array of shape (..., levels, levels) from ``_glcm_counts``.
+
+    Returns:
+        A (contrast, correlation) tuple of arrays shaped like ``counts.shape[:-2]``.
+    """
+    levels = counts.shape[-1]
+    values = np.arange(levels, dtype=np.float64) * (256 // levels)
+    counts = counts.astype(np.float64)
+
+    total = counts.sum(axis=(-2, -1))
+    marginal = counts.sum(axis=-1)
+    mean = marginal @ values / total
+    second_moment = marginal @ (values ** 2) / total
+    variance = second_moment - mean ** 2
+    cross_moment = (counts @ values) @ values / total
+
+    # Symmetric counts: E[i^2] == E[j^2], so E[(i - j)^2] = 2 * (E[i^2] - E[ij])
+    contrast = 2.0 * (second_moment - cross_moment)
+    # Match skimage: a constant image has correlation 1
+    flat = variance < 1e-15
+    correlation = np.where(flat, 1.0, (cross_moment - mean ** 2) / np.where(flat, 1.0, variance))
+    return contrast, correlation
+
+
+def analyze_cfa(image_bytes: bytes, distances=(1,), angles=(0.0,), levels: int = 256):
     """
     Performs a simplified Color Filter Array (CFA) artifact analysis.
     A real image from a camera has a specific pattern of correlations between
@@ -12,6 +84,9 @@ def analyze_cfa(image_bytes: bytes):
 
     Args:
         image_bytes: The raw bytes of the image.
+        distances: GLCM pixel pair distances; texture properties are averaged over all offsets.
+        angles: GLCM pixel pair angles in radians.
+        levels: Gray levels used for the co-occurrence counts (256, or 64/32 to quantize).
 
     Returns:
         A score between 0.0 and 1.0, where a higher score indicates a higher
@@ -26,26 +101,27 @@ def analyze_cfa(image_bytes: bytes):
     # We'll use a simplified approach: analyze the texture of the green channel,
     # which typically contains the most detail in a Bayer filter.
     # A synthetic image may have an unnaturally uniform or different texture.
-    
+
     green_channel = image_array[:, :, 1]
 
     # Calculate Gray-Level Co-occurrence Matrix (GLCM)
     # This is a way to measure texture.
-    glcm = graycomatrix(green_channel, distances=[1], angles=[0], levels=256, symmetric=True, normed=True)
-    
+    glcm_counts = _glcm_counts(green_channel, distances=distances, angles=angles, levels=levels)
+
     # Calculate texture properties
-    contrast = graycoprops(glcm, 'contrast')[0, 0]
-    correlation = graycoprops(glcm, 'correlation')[0, 0]
-    
+    contrast, correlation = _glcm_contrast_correlation(glcm_counts)
+    contrast = float(np.mean(contrast))
+    correlation = float(np.mean(correlation))
+
     # Heuristic: Natural images tend to have high contrast and low correlation
     # in their green channel texture. CGI might be the opposite.
     # We'll create a score based on this assumption.
-    
+
     # Normalize the values (these are heuristics)
     normalized_contrast = min(contrast / 1000.0, 1.0)
     normalized_correlation = max(0, correlation)
 
     # If correlation is high and contrast is low, it's more likely to be CGI
     score = (normalized_correlation * (1 - normalized_contrast))
-    
+
     return min(score * 2.0, 1.0) # Amplify the score a bit
@@ -0,0 +1,76 @@
+"""
+Shared color-space helpers that work directly on uint8 RGB arrays.
+
+Color detectors often need a single HSV channel statistic. Converting the whole image
+with skimage.color.rgb2hsv builds three float64 planes just to read one of them. The
+helpers here use integer max/min reductions over the channels instead. Per-pixel
+values such as saturation are only ever looked up through a 256 x 256 table and
+accumulated over a histogram, so no float plane is materialized.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+def channel_extrema(rgb: np.ndarray):
+    """
+    Per-pixel maximum and minimum over the color channels.
+
+    The maximum is the HSV value channel (times 255); max - min is the chroma.
+
+    Args:
+        rgb: uint8 array of shape (H, W, 3)
+
+    Returns:
+        Tuple of (max, min) uint8 arrays of shape (H, W)
+    """
+    if rgb.dtype != np.uint8 or rgb.ndim != 3:
+        raise ValueError(f"expected a uint8 (H, W, C) array, got {rgb.dtype} with shape {rgb.shape}")
+    return rgb.max(axis=2), rgb.min(axis=2)
+
+
+@lru_cache(maxsize=1)
+def _saturation_table() -> np.ndarray:
+    """HSV saturation (max - min) / max for every (max, max - min) pair, 0 where max is 0."""
+    value = np.arange(256, dtype=np.float64)[:, None]
+    chroma = np.arange(256, dtype=np.float64)[None, :]
+    table = np.divide(chroma, value, out=np.zeros((256, 256)), where=value > 0)
+    table.flags.writeable = False
+    return table
+
+
+def saturation_histogram(rgb: np.ndarray) -> np.ndarray:
+    """
+    Counts of every (max, max - min) pair in a uint8 RGB image.
+
+    Args:
+        rgb: uint8 array of shape (H, W, 3)
+
+    Returns:
+        int64 array of shape (256, 256) indexed by [max, max - min]
+    """
+    channel_max, channel_min = channel_extrema(rgb)
+    chroma = channel_max - channel_min # No underflow: max >= min
+    codes = (channel_max.astype(np.uint16) << 8) | chroma
+    return np.bincount(codes.ravel(), minlength=256 * 256).reshape(256, 256)
+
+
+def saturation_statistics(rgb: np.ndarray) -> dict:
+    """
+    Mean and standard deviation of HSV saturation, matching skimage.color.rgb2hsv.
+
+    Args:
+        rgb: uint8 array of shape (H, W, 3)
+
+    Returns:
+        Dictionary with 'mean' and 'std' of the saturation channel (0.0 for empty images)
+    """
+    counts = saturation_histogram(rgb)
+    total = counts.sum()
+    if total == 0:
+        return {'mean': 0.0, 'std': 0.0}
+    table = _saturation_table()
+    mean = float((counts * table).sum() / total)
+    variance = float((counts * (table - mean) ** 2).sum() / total)
+    return {'mean': mean, 'std': float(np.sqrt(variance))}
@@ -1,4 +1,3 @@
-import cv2
 import mediapipe as mp
 import numpy as np
 from PIL import Image
@@ -8,8 +7,66 @@ import io
 This module provides functions for detecting deepfakes in images.
 Deepfake detection often involves analyzing inconsistencies in facial features
 or texture that are indicative of AI-generated manipulation.
+
+Face detection is exposed separately through `detect_faces` so that the engine can run it
+once per image and share the result with every face-aware detector. The MediaPipe FaceMesh
+graph is expensive to build, so one instance is created per worker process (see
+`init_face_mesh`) and reused for every image that worker handles.
 """
 
+_face_mesh = None  # Per-process FaceMesh instance, created by init_face_mesh()
+
+
+def init_face_mesh():
+    """
+    Builds the MediaPipe FaceMesh model for the current process if it does not exist yet.
+    Intended to be used as (part of) a process-pool initializer.
+
+    Returns:
+        The process-wide FaceMesh instance.
+    """
+    global _face_mesh
+    if _face_mesh is None:
+        _face_mesh = mp.solutions.face_mesh.FaceMesh(static_image_mode=True, max_num_faces=1,
+                                                     min_detection_confidence=0.5)
+    return _face_mesh
+
+
+def detect_faces(image_bytes: bytes) -> dict:
+    """
+    Detects faces and their landmarks with the per-process FaceMesh model.
+
+    The result only holds plain lists and arrays so it can be passed between processes
+    and reused by other detectors (e.g. specialized_detectors) instead of re-running
+    face detection.
+
+    Args:
+        image_bytes: The raw bytes of the image.
+
+    Returns:
+        A dictionary with:
+        - image_size: (width, height) of the analyzed image
+        - boxes: list of [x_min, y_min, x_max, y_max] pixel boxes, one per face
+        - landmarks: list of (N, 2) float32 arrays of landmark pixel coordinates
+    """
+    image_pil = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    image_np = np.array(image_pil)  # MediaPipe expects RGB input
+    height, width = image_np.shape[:2]
+
+    results = init_face_mesh().process(image_np)
+
+    boxes = []
+    landmarks = []
+    for face_landmarks in results.multi_face_landmarks or []:
+        points = np.array([(lm.x * width, lm.y * height) for lm in face_landmarks.landmark], dtype=np.float32)
+        x_min, y_min = np.clip(points.min(axis=0), 0, [width - 1, height - 1]).astype(int)
+        x_max, y_max = np.clip(points.max(axis=0), 0, [width - 1, height - 1]).astype(int)
+        boxes.append([int(x_min), int(y_min), int(x_max), int(y_max)])
+        landmarks.append(points)
+
+    return {"image_size": (width, height), "boxes": boxes, "landmarks": landmarks}
+
+
 def _analyze_landmark_motion(all_frame_landmarks: list[np.ndarray]) -> float:
     """
     Analyzes the motion of facial landmarks across frames for inconsistencies.
@@ -51,45 +108,41 @@ def _analyze_landmark_motion(all_frame_landmarks: list[np.ndarray]) -> float:
     
     return min(inconsistency_score * 0.5, 1.0) # Multiply by 0.5 to make it less aggressive initially
 
-def detect_deepfake(image_bytes: bytes) -> dict:
+def detect_deepfake(image_bytes: bytes, faces: dict = None) -> dict:
     """
     Analyzes an image for characteristics of a deepfake, focusing on static image analysis.
 
     Args:
         image_bytes: The raw bytes of the image.
+        faces: Optional face detection result from `detect_faces`; detection is run here
+               when it is not provided.
 
     Returns:
         A dictionary containing the detection results, including a confidence score
         and any identified artifacts.
     """
     try:
-        image_pil = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        image_np = np.array(image_pil)
-        image_rgb = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR) # Convert to BGR for MediaPipe
-        
-        mp_face_mesh = mp.solutions.face_mesh
-        with mp_face_mesh.FaceMesh(static_image_mode=True, max_num_faces=1, min_detection_confidence=0.5) as face_mesh:
-            results = face_mesh.process(image_rgb)
-            
-            if results.multi_face_landmarks:
-                # Static image analysis (e.g., texture inconsistencies, facial geometry)
-                # For now, just a placeholder. More advanced static analysis could be added here.
-                static_score = 0.5 # Placeholder for static analysis
-                return {
-                    "is_deepfake": (static_score > 0.5),
-                    "confidence": static_score,
-                    "details": "Deepfake detection with static image analysis."
-                }
-            else:
-                return {
-                    "is_deepfake": False,
-                    "confidence": 0.0,
-                    "details": "No face detected in the image."
-                }
+        if faces is None:
+            faces = detect_faces(image_bytes)
+
+        if faces["boxes"]:
+            # Static image analysis (e.g., texture inconsistencies, facial geometry)
+            # For now, just a placeholder. More advanced static analysis could be added here.
+            static_score = 0.5 # Placeholder for static analysis
+            return {
+                "is_deepfake": (static_score > 0.5),
+                "confidence": static_score,
+                "details": "Deepfake detection with static image analysis."
+            }
+        else:
+            return {
+                "is_deepfake": False,
+                "confidence": 0.0,
+                "details": "No face detected in the image."
+            }
     except Exception as e:
         return {
             "is_deepfake": False,
             "confidence": 0.0,
             "details": f"Error processing image bytes: {e}"
         }
-
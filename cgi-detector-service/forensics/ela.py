@@ -1,45 +1,61 @@
-from PIL import Image
 import numpy as np
-import io
+from .recompression import RecompressionCache
 
-def analyze_ela(image_bytes: bytes, quality=95):
+def _ela_score(original_array: np.ndarray, resaved_array: np.ndarray) -> float:
+    """Scores the error level between an image and its JPEG re-encode."""
+    # Calculate the difference
+    diff = np.abs(original_array.astype(np.float32) - resaved_array.astype(np.float32))
+
+    # Scale the difference to be more visible
+    diff = diff * 10
+    diff = np.clip(diff, 0, 255)
+
+    # A simple metric: high variance in the diff suggests manipulation
+    mean_diff = np.mean(diff)
+
+    # Normalize the score (this is a heuristic)
+    # A mean difference above a certain threshold could indicate tampering.
+    # For this example, we'll say a mean diff over 10 is suspicious.
+    score = min(mean_diff / 20.0, 1.0)
+
+    return score
+
+def analyze_ela(image_bytes: bytes, quality=95, cache: RecompressionCache = None):
     """
     Performs Error Level Analysis (ELA) on an image.
 
     Args:
         image_bytes: The raw bytes of the image.
         quality: The JPEG quality to re-save the image at.
+        cache: Optional RecompressionCache for this image, shared with other
+            recompression-based detectors; image_bytes is not decoded when given.
 
     Returns:
         A score between 0.0 and 1.0, where a higher score indicates a higher
         probability of manipulation.
     """
-    try:
-        original_image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-    except Exception:
-        return 0.0 # Cannot process image
+    return analyze_ela_multi_quality(image_bytes, qualities=(quality,), cache=cache).get(quality, 0.0)
 
-    # Re-save the image at a specific quality
-    resaved_buffer = io.BytesIO()
-    original_image.save(resaved_buffer, 'JPEG', quality=quality)
-    resaved_image = Image.open(resaved_buffer)
+def analyze_ela_multi_quality(image_bytes: bytes, qualities=(75, 85, 95), cache: RecompressionCache = None) -> dict:
+    """
+    Performs Error Level Analysis at several JPEG qualities.
 
-    # Calculate the difference
-    original_array = np.array(original_image, dtype=np.float32)
-    resaved_array = np.array(resaved_image, dtype=np.float32)
-    
-    diff = np.abs(original_array - resaved_array)
-    
-    # Scale the difference to be more visible
-    diff = diff * 10
-    diff = np.clip(diff, 0, 255)
+    Re-encodes come from the RecompressionCache, so qualities that another detector
+    (JPEG ghost) has already encoded cost nothing extra.
 
-    # A simple metric: high variance in the diff suggests manipulation
-    mean_diff = np.mean(diff)
-    
-    # Normalize the score (this is a heuristic)
-    # A mean difference above a certain threshold could indicate tampering.
-    # For this example, we'll say a mean diff over 10 is suspicious.
-    score = min(mean_diff / 20.0, 1.0)
+    Args:
+        image_bytes: The raw bytes of the image.
+        qualities: JPEG qualities to re-save the image at.
+        cache: Optional RecompressionCache for this image.
 
-    return score
+    Returns:
+        A dictionary mapping each quality to its ELA score (empty if the image cannot be opened).
+    """
+    if cache is None:
+        try:
+            cache = RecompressionCache.from_bytes(image_bytes)
+        except Exception:
+            return {} # Cannot process image
+
+    original_array = cache.array('RGB')
+    return {quality: _ela_score(original_array, cache.recompressed(quality, 'RGB')) for quality in qualities}
@@ -1,182 +1,488 @@
+import copy
+import os
 import sys
+import tempfile
+import threading
+import time
 import numpy as np
 from PIL import Image
-from io import BytesIO
-from concurrent.futures import ProcessPoolExecutor
-from . import ela, cfa, hos, jpeg_ghost, rambino, geometric_3d, lighting_text, jpeg_dimples
-from . import specialized_detectors
-from . import deepfake_detector, reflection_consistency, double_quantization, ml_predictor
-from . import watermarking, statistical_anomaly
+from . import ml_predictor, tiling, threads, warmup
+from .tasks import run_task, DETECTOR_TASKS
+from .recompression import RecompressionCache
+from .wavelets import WaveletCache
+from .image_io import prepare_analysis_inputs, detector_input, describe_inputs
+from .worker_pool import RecyclingExecutor, plan_rss_ceiling
+from .single_flight import SingleFlight, content_key
+from .perceptual_hash import NearDuplicateIndex, NEAR_DUPLICATE_DISTANCE
+from .profiles import DEFAULT_PROFILE, get_profile, skipped_features, covers
+from .qos import LoadGovernor
 
-_ml_model = ml_predictor.get_model() # Load ML model once at startup via get_model
+# Detector modules are not imported here: they are scheduled by name (tasks.DETECTOR_TASKS)
+# or imported inside the worker-side runners below, so importing the engine stays cheap.
+# The ML model is loaded by startup(), not at import time.
+_ml_model = None
 
-def reload_ml_model():
+_executor = None # Persistent process pool shared by all analyses, see get_executor()
+_executor_lock = threading.Lock() # Guards creating and shutting down _executor
+
+# Worker recycling, see worker_pool.RecyclingExecutor. Workers are replaced after this many
+# tasks on average, or as soon as one reports more resident memory than its share of the
+# container: WORKER_MEMORY_FRACTION of the cgroup memory limit split over the pool's
+# workers (worker_pool.plan_rss_ceiling), so the whole pool stays within the limit.
+# CGI_WORKER_MAX_RSS_MB sets the per-worker ceiling explicitly.
+WORKER_MAX_TASKS_PER_CHILD = 200
+WORKER_MEMORY_FRACTION = 0.75
+WORKER_MAX_RSS_MB = float(os.environ['CGI_WORKER_MAX_RSS_MB']) if os.environ.get('CGI_WORKER_MAX_RSS_MB') else None
+
+# Threads every detector task may use (BLAS, OpenCV, scipy.fft); see threads.plan_workers
+CORES_PER_TASK = 1
+
+# Run every detector on a synthetic image when a worker starts, see warmup.warm_up_process
+WARM_WORKERS = True
+WARMUP_TIMEOUT_SECONDS = 300
+
+# Identical analyses running at the same time share one run; uvicorn workers on this host
+# coordinate through lease files in this directory (see single_flight.SingleFlight)
+SINGLE_FLIGHT_DIR = os.environ.get('CGI_SINGLE_FLIGHT_DIR',
+                                   os.path.join(tempfile.gettempdir(), 'cgi-detector-single-flight'))
+_single_flight = SingleFlight(lease_dir=SINGLE_FLIGHT_DIR)
+
+# Near-duplicate lookup of earlier analyses by perceptual hash (re-encoded, resized or
+# screenshot copies): 'off'; 'flag' to report the closest earlier verdict within
+# NEAR_DUPLICATE_MAX_DISTANCE under "near_duplicate"; or 'reuse' to also return that
+# verdict instead of analyzing again, if it is within NEAR_DUPLICATE_REUSE_DISTANCE.
+# Reuse has its own much tighter radius: an edited copy of a picture can land within the
+# flagging distance of its original (a real/fake pair in my_dataset is 6 bits apart),
+# and a forensic verdict must not carry over from the original to its manipulated copy.
+# Even at the reuse radius a small local edit can leave the hash unchanged, so reuse
+# stays opt-in.
+NEAR_DUPLICATE_MODE = os.environ.get('CGI_NEAR_DUPLICATE_MODE', 'flag')
+NEAR_DUPLICATE_MAX_DISTANCE = NEAR_DUPLICATE_DISTANCE
+NEAR_DUPLICATE_REUSE_DISTANCE = int(os.environ.get('CGI_NEAR_DUPLICATE_REUSE_DISTANCE', '2'))
+_near_duplicates = NearDuplicateIndex(max_distance=NEAR_DUPLICATE_MAX_DISTANCE)
+
+# Load-based profile selection for requests that do not pin a profile (see qos.LoadGovernor):
+# step down when more analyses than this are in flight in a process, or when the p95
+# latency of recent analyses exceeds this many seconds
+QOS_MAX_IN_FLIGHT = int(os.environ.get('CGI_QOS_MAX_IN_FLIGHT', '4'))
+QOS_MAX_P95_SECONDS = float(os.environ.get('CGI_QOS_MAX_P95_SECONDS', '10'))
+_governor = LoadGovernor(max_in_flight=QOS_MAX_IN_FLIGHT, max_p95_seconds=QOS_MAX_P95_SECONDS)
+
+# ML feature behind each analysis_breakdown entry, so entries of skipped detectors can be left out
+BREAKDOWN_FEATURES = {
+    "Error Level Analysis (ELA)": 'ela',
+    "Color Filter Array (CFA)": 'cfa',
+    "Wavelet Statistics (HOS)": 'hos',
+    "JPEG Ghost Analysis": 'jpeg_ghost',
+    "JPEG Dimples Analysis": 'jpeg_dimples',
+    "RAMBiNo Statistical Analysis": 'rambino',
+    "3D Geometric Consistency": 'geometric',
+    "Scene Lighting Consistency": 'lighting',
+    "Deepfake Detection": 'deepfake',
+    "Reflection Inconsistency": 'reflection_inconsistency',
+    "Video Double Quantization": 'double_quantization',
+    "Digital Watermark Detection": 'watermark',
+    "Statistical Anomaly Detection": 'statistical_anomaly',
+}
+
+# Readiness of this replica, updated by startup() and warm_up(); see readiness()
+_readiness = {'model_loaded': False, 'pool_warm': False, 'workers': 0, 'warmup_seconds': None,
+              'errors': {}, 'error': None, 'imputation_error': None}
+_imputation_checked = False # Whether check_imputation() has looked at the training data
+
+
+def _init_worker(thread_budget: int = 1, warm: bool = False):
     """
-    Reloads the ML model into the engine from ml_predictor.
+    Process-pool initializer: builds per-worker resources once instead of per image.
+
+    Args:
+        thread_budget: Threads each task may use in BLAS/OpenMP, OpenCV and scipy.fft
+        warm: Run every detector once on a synthetic image before taking tasks
     """
-    global _ml_model
-    _ml_model = ml_predictor.reload_model()
-    print("ML model reloaded in engine.")
+    threads.apply_thread_budget(thread_budget)
+    run_task('deepfake_detector:init_face_mesh')
+    if warm:
+        warmup.warm_up_process()
+
+
+def get_executor() -> RecyclingExecutor:
+    """
+    Returns the engine's persistent process pool, creating it on first use.
+
+    Reusing the pool across requests keeps expensive per-worker state (such as the
+    MediaPipe FaceMesh graph) alive instead of rebuilding it for every image. Workers
+    are recycled after WORKER_MAX_TASKS_PER_CHILD tasks or when they exceed their
+    share of the container memory (see WORKER_MAX_RSS_MB), and a pool broken by a
+    crashed worker is replaced with its in-flight tasks retried one at a time in cold
+    workers (thread budget only, no FaceMesh or warmup).
+    """
+    global _executor
+    # The warmup thread and the first requests (run in the threadpool) race to create the pool
+    with _executor_lock:
+        if _executor is None:
+            # Size the pool from the container's CPU quota; every worker runs one task at a
+            # time with CORES_PER_TASK threads, so the pool never oversubscribes the CPUs
+            max_workers, thread_budget = threads.plan_workers(CORES_PER_TASK)
+            max_rss_mb = WORKER_MAX_RSS_MB
+            if max_rss_mb is None:
+                max_rss_mb = plan_rss_ceiling(max_workers, WORKER_MEMORY_FRACTION)
+            _executor = RecyclingExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(thread_budget, WARM_WORKERS),
+                                          max_tasks_per_child=WORKER_MAX_TASKS_PER_CHILD, max_rss_mb=max_rss_mb,
+                                          retry_initializer=threads.apply_thread_budget, retry_initargs=(thread_budget,))
+        return _executor
+
+
+def shutdown_executor():
+    """
+    Shuts down the persistent process pool, if one was started.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    _readiness['pool_warm'] = False
 
-def downsize_image_to_480p(image: Image.Image) -> Image.Image:
+def startup(train_if_missing: bool = False):
     """
-    Downsizes the input image to a maximum height of 480 pixels, maintaining aspect ratio.
+    Explicit startup hook: loads the ML model used by run_analysis.
 
     Args:
-        image: A PIL Image object.
+        train_if_missing: Train a model from the base training data if none is saved
+
+    Raises:
+        ml_predictor.ModelUnavailableError: If no model can be loaded, or if the model was
+            not trained on one feature per ml_predictor.FEATURE_NAMES entry (it could not
+            score a single request, so the replica must not become ready with it)
+    """
+    global _ml_model
+    model = ml_predictor.load_model(train_if_missing=train_if_missing)
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is not None and n_features != len(ml_predictor.FEATURE_NAMES):
+        raise ml_predictor.ModelUnavailableError(
+            f"ML model at {ml_predictor.MODEL_PATH} expects {n_features} features, but the engine sends "
+            f"{len(ml_predictor.FEATURE_NAMES)} ({', '.join(ml_predictor.FEATURE_NAMES)}); retrain it on "
+            f"features extracted by this engine (scripts/extract_features.py, scripts/train_model.py)")
+    _ml_model = model
+    _readiness['model_loaded'] = True
+    check_imputation()
+    return _ml_model
+
+def check_imputation():
+    """
+    Checks once whether the ML features of detectors a cheaper profile skips can be imputed.
+
+    Imputation needs training data with one column per ml_predictor.FEATURE_NAMES entry.
+    Without it the cheaper profiles cannot be scored, so the load governor is kept at
+    DEFAULT_PROFILE and run_analysis runs DEFAULT_PROFILE for requests pinning another:
+    slower under load rather than failing every request.
 
     Returns:
-        A new PIL Image object resized to 480p or smaller if the original height is less than 480p.
+        None if skipped features can be imputed, otherwise why not (also reported by
+        readiness() as 'imputation_error')
     """
-    max_height = 480
-    width, height = image.size
+    global _imputation_checked
+    if not _imputation_checked:
+        try:
+            ml_predictor.feature_means()
+            _readiness['imputation_error'] = None
+        except ValueError as e:
+            print(f"Cheaper analysis profiles disabled: {e}")
+            _readiness['imputation_error'] = str(e)
+        _governor.limit(None if _readiness['imputation_error'] is None else DEFAULT_PROFILE)
+        _imputation_checked = True
+    return _readiness['imputation_error']
 
-    if height <= max_height:
-        return image  # No downsizing needed if already 480p or smaller
+def get_ml_model():
+    """
+    Returns the engine's ML model, loading it from disk if startup() has not run yet.
 
-    # Calculate the new width while maintaining the aspect ratio
-    new_width = int(width * (max_height / height))
-    resized_image = image.resize((new_width, max_height), Image.LANCZOS)
-    return resized_image
+    Raises:
+        ml_predictor.ModelUnavailableError: If no saved model exists
+    """
+    if _ml_model is None:
+        return startup()
+    return _ml_model
 
-def run_rambino_analysis(image_bytes_for_rambino):
-    try:
-        image = Image.open(BytesIO(image_bytes_for_rambino)).convert('L')  # Convert to grayscale
-        image_data = np.array(image)
-    except Exception:
-        image_data = None
-        return {'score': 0.0, 'features': None, 'raw_score': 0.0}
+def warm_up(timeout: float = WARMUP_TIMEOUT_SECONDS) -> dict:
+    """
+    Loads the model and brings every pool worker up warm; the replica is ready afterwards.
 
-    rambino_score = 0.0
-    rambino_features_list = None
+    Workers warm themselves in the pool initializer (WARM_WORKERS), so this starts the
+    pool and waits until every worker has reported its warmup. The decode path and a
+    prediction are also run once in the calling process.
+
+    Args:
+        timeout: Seconds to wait for the workers
+
+    Returns:
+        The readiness() summary
+    """
+    start = time.perf_counter()
+    _readiness.update(pool_warm=False, error=None)
     try:
-        if image_data is not None:
-            rambino_result = rambino.analyze_rambino_features(image_data)
-            try:
-                raw_feats = rambino.compute_rambino_features(image_data)
-                max_return = 128
-                rambino_features_list = raw_feats.flatten()[:max_return].astype(float).tolist()
-            except Exception:
-                rambino_features_list = None
-
-            if isinstance(rambino_result, dict):
-                if "error" in rambino_result:
-                    rambino_score = 0.0
-                else:
-                    rambino_score = float(rambino_result.get("rambino_feature_mean_noise", 0.0))
-            else:
-                rambino_score = float(np.mean(rambino_result))
-    except Exception:
-        rambino_score = 0.0
-        rambino_features_list = None
+        model = get_ml_model()
+        image_bytes = warmup.synthetic_image_bytes()
+        prepare_analysis_inputs(image_bytes)
+        try:
+            ml_predictor.predict(model, [0.0] * getattr(model, 'n_features_in_', 1))
+        except Exception as e:
+            print(f"Warmup prediction failed: {e}")
+
+        executor = get_executor()
+        deadline = time.monotonic() + timeout
+        workers = {}
+        while len(workers) < executor.max_workers:
+            # Status tasks hold their worker briefly, so each round spreads over the pool;
+            # a worker only takes tasks once its initializer (the warmup) has finished
+            statuses = [executor.submit(warmup.worker_status) for _ in range(executor.max_workers)]
+            for status in statuses:
+                result = status.result(timeout=max(0.0, deadline - time.monotonic()))
+                workers[result['pid']] = result
+        errors = {}
+        for result in workers.values():
+            errors.update(result['errors'])
+        _readiness.update(pool_warm=True, workers=len(workers), errors=errors,
+                          warmup_seconds=round(time.perf_counter() - start, 3))
+        print(f"Warmed up {len(workers)} detector workers in {_readiness['warmup_seconds']} s")
+    except Exception as e:
+        print(f"Error warming up the engine: {e}")
+        _readiness['error'] = str(e)
+    return readiness()
+
+def readiness() -> dict:
+    """
+    Readiness of this replica: ready once the ML model is loaded and the worker pool is warm.
+
+    Returns:
+        Dictionary with 'ready', 'model_loaded', 'pool_warm', 'workers' (warm workers),
+        'warmup_seconds', 'errors' ({detector: message} for detectors whose warmup raised),
+        'error' (why the warmup failed, if it did), 'imputation_error' (why the cheaper
+        profiles are disabled, see check_imputation()) and 'qos' (the load governor's status)
+    """
+    summary = dict(_readiness, errors=dict(_readiness['errors']), qos=_governor.status())
+    summary['ready'] = summary['model_loaded'] and summary['pool_warm']
+    return summary
+
+def reload_ml_model():
+    """
+    Reloads the ML model into the engine from ml_predictor.
+    """
+    global _ml_model, _imputation_checked
+    _ml_model = ml_predictor.reload_model()
+    _near_duplicates.clear() # Earlier verdicts came from the previous model
+    _imputation_checked = False # The model may come with new training data
+    check_imputation()
+    print("ML model reloaded in engine.")
+
+def run_tile_analysis(tile: np.ndarray):
+    """
+    Scores one full-resolution tile with the tile-capable detectors (ELA, JPEG ghost,
+    HOS and RAMBiNo), sharing one RecompressionCache and one WaveletCache per tile.
+    Statistical anomaly detection is a placeholder for now and is not tiled (see
+    tiling.TILE_DETECTORS).
+
+    Args:
+        tile: uint8 RGB tile array
 
-    rambino_raw_score = rambino_score
-    scale = 30000.0
-    rambino_score = float(np.clip(rambino_raw_score / scale, 0.0, 1.0))
-    return {'score': rambino_score, 'features': rambino_features_list, 'raw_score': rambino_raw_score}
+    Returns:
+        Dictionary of scores keyed like the results of run_analysis, plus 'rambino_raw_score'
+    """
+    from . import ela, jpeg_ghost, hos, rambino
+    image = Image.fromarray(tile)
+    cache = RecompressionCache(image)
+    wavelets = WaveletCache(np.asarray(image.convert('L'), dtype=np.float32) / 255.0)
+    rambino_result = rambino.run_rambino_analysis(None, wavelets=wavelets)
+    return {
+        'ela': ela.analyze_ela(None, cache=cache),
+        'jpeg_ghost': jpeg_ghost.analyze_jpeg_ghost(None, cache=cache),
+        'hos': hos.analyze_hos(None, wavelets=wavelets),
+        'rambino': rambino_result['score'],
+        'rambino_raw_score': rambino_result['raw_score'],
+    }
 
-def run_analysis(image_bytes: bytes):
+def run_analysis(image_bytes: bytes, tiled: bool = False, tile_size: int = tiling.TILE_SIZE,
+                 tile_overlap: int = tiling.TILE_OVERLAP, profile: str = DEFAULT_PROFILE):
     """
     Runs all forensic analysis techniques on an image and returns a
     unified result.
 
     Args:
         image_bytes: The raw bytes of the image.
+        tiled: Run the tile-capable detectors (ELA, JPEG ghost, HOS, RAMBiNo) over
+            overlapping full-resolution tiles instead of the downsized image. Their
+            scores become tile-area-weighted means and the per-tile grid is returned
+            under "tiles". Detector memory is bounded by the tile size, but the decoded
+            full-resolution frame is held for the whole analysis and grows with the image.
+            The other detectors, including the placeholder statistical anomaly detector,
+            still run once on the downsized image.
+        tile_size: Tile side length in pixels for tiled mode.
+        tile_overlap: Pixels shared by neighbouring tiles in tiled mode.
+        profile: Analysis profile (see profiles.PROFILES): which detectors run. The ML
+            features of skipped detectors are imputed; if they cannot be (see
+            check_imputation()), DEFAULT_PROFILE runs instead.
 
     Returns:
         A dictionary containing the final prediction, confidence score,
-        and a detailed breakdown of the analysis.
+        and a detailed breakdown of the analysis. "profile" names the profile that ran,
+        the one requested and the features it skipped (left out of the breakdown). When
+        an earlier analysis of a copy of the picture is found, "near_duplicate" describes
+        it and whether its verdict was reused (see NEAR_DUPLICATE_MODE).
+
+    Raises:
+        ValueError: If the profile does not exist
     """
-    # Open and downsize the image
-    try:
-        original_image = Image.open(BytesIO(image_bytes))
-        downsized_image = downsize_image_to_480p(original_image)
+    requested_profile = profile
+    if skipped_features(profile, ml_predictor.FEATURE_NAMES, tiled=tiled) and check_imputation() is not None:
+        profile = DEFAULT_PROFILE
+    detectors = get_profile(profile)['detectors']
 
-        # Convert the downsized image back to bytes for analysis functions
-        buffered = BytesIO()
-        downsized_image.save(buffered, format="PNG")  # Use PNG to avoid re-compression artifacts for analysis
-        processed_image_bytes = buffered.getvalue()
-    except Exception as e:
-        # Handle potential errors during image processing/downsizing
-        print(f"Error processing or downsizing image: {e}")
-        # Fallback to original image_bytes if downsizing fails
-        processed_image_bytes = image_bytes
+    # Decode and downsize the image once per pixel budget the detectors declare
+    # (see image_io.DETECTOR_RESOLUTIONS)
+    inputs = prepare_analysis_inputs(image_bytes, detectors=detectors)
+
+    # Look up earlier analyses of a copy of this picture (tiled results are not indexed)
+    image_hash = inputs['perceptual_hash'] if NEAR_DUPLICATE_MODE in ('flag', 'reuse') and not tiled else None
+    near_duplicate = None
+    if image_hash is not None:
+        match = _near_duplicates.nearest(image_hash)
+        if match is not None:
+            distance, match_hash, prior = match
+            prior_profile = prior['profile']['name']
+            near_duplicate = {'distance': distance, 'phash': f'{match_hash:016x}',
+                              'prediction': prior['prediction'], 'confidence': prior['confidence'],
+                              'profile': prior_profile}
+            # Only near-identical copies are reused, and a cheaper profile's verdict is not
+            # reused for a more thorough request
+            if (NEAR_DUPLICATE_MODE == 'reuse' and distance <= NEAR_DUPLICATE_REUSE_DISTANCE
+                    and covers(prior_profile, profile)):
+                result = copy.deepcopy(prior)
+                result['preprocessing'] = describe_inputs(inputs)
+                result['near_duplicate'] = dict(near_duplicate, reused=True)
+                return result
 
     # Initialize a dictionary to hold future results from parallel tasks.
     futures = {}
-    # Use ThreadPoolExecutor for concurrent execution of forensic analysis functions.
-    # This allows multiple CPU-bound tasks to run in separate threads,
-    # potentially reducing overall execution time.
-    with ProcessPoolExecutor() as executor:
-        # Submit each analysis function to the executor.
-        # Each .submit() call returns a Future object representing the eventual result.
-        futures['ela'] = executor.submit(ela.analyze_ela, processed_image_bytes)
-        futures['cfa'] = executor.submit(cfa.analyze_cfa, processed_image_bytes)
-        futures['hos'] = executor.submit(hos.analyze_hos, processed_image_bytes)
-        futures['jpeg_ghost'] = executor.submit(jpeg_ghost.analyze_jpeg_ghost, processed_image_bytes)
-        futures['jpeg_dimples'] = executor.submit(jpeg_dimples.detect_jpeg_dimples, processed_image_bytes)
-        futures['geometric'] = executor.submit(geometric_3d.analyze_geometric_consistency, processed_image_bytes)
-        futures['lighting'] = executor.submit(lighting_text.analyze_lighting_consistency, processed_image_bytes)
-        futures['specialized_detector'] = executor.submit(specialized_detectors.analyze_specialized_cgi_types, processed_image_bytes)
-        futures['deepfake'] = executor.submit(deepfake_detector.detect_deepfake, processed_image_bytes)
-        futures['reflection_inconsistency'] = executor.submit(reflection_consistency.detect_reflection_inconsistencies, processed_image_bytes)
-        futures['double_quantization'] = executor.submit(double_quantization.detect_double_quantization, processed_image_bytes)
-        futures['watermark'] = executor.submit(watermarking.analyze_watermark, processed_image_bytes)
-        futures['statistical_anomaly'] = executor.submit(statistical_anomaly.analyze_statistical_anomaly, processed_image_bytes)
-
-        # RAMBiNo analysis requires specific image preprocessing (grayscale conversion to NumPy array).
-        # This helper function encapsulates the RAMBiNo-specific logic, including image conversion,
-        # and is submitted as a separate task to the executor.
-        futures['rambino'] = executor.submit(run_rambino_analysis, processed_image_bytes)
-
-        # Collect results from all futures.
-        # .result() blocks until the corresponding task is complete.
-        # Exception handling is included for robust error management in each analysis.
-        results = {}
-        rambino_raw_score = 0.0
-        rambino_features_list = None
-        specialized_detector_scores = {}
-        specialized_likely_type = 'Unknown'
-
-        for name, future in futures.items():
-            try:
-                if name == 'rambino':
-                    try:
-                        rambino_result = future.result()
-                        results['rambino'] = rambino_result['score']
-                        rambino_raw_score = rambino_result['raw_score']
-                        rambino_features_list = rambino_result['features']
-                    except Exception as e:
-                        print(f"Error running rambino analysis subprocess: {e}")
-                        results['rambino'] = 0.0
-                        rambino_raw_score = 0.0
-                        rambino_features_list = None
-                elif name == 'specialized_detector':
-                    try:
-                        specialized_result = future.result()
-                        results['specialized'] = specialized_result.get('overall_score', 0.0)
-                        specialized_detector_scores = specialized_result.get('detector_scores', {})
-                        specialized_likely_type = specialized_result.get('likely_type', 'Unknown')
-                    except Exception as e:
-                        print(f"Error running specialized_detector analysis subprocess: {e}")
-                        results['specialized'] = 0.0
-                        specialized_detector_scores = {}
-                        specialized_likely_type = 'Unknown'
-                elif name == 'watermark':
-                    try:
-                        results['watermark'] = future.result()
-                    except Exception as e:
-                        print(f"Error running watermark analysis subprocess: {e}")
-                        results['watermark'] = 0.0 # Default/error value
-                else:
-                    try:
-                        results[name] = future.result()
-                    except Exception as e:
-                        print(f"Error running {name} analysis subprocess: {e}")
-                        results[name] = 0.0 # Default/error value
-            except Exception as e:
-                print(f"Error running {name} analysis: {e}")
-                results[name] = 0.0 # Default/error value
+    # Use the engine's persistent worker pool for concurrent execution of forensic
+    # analysis functions. The pool outlives a single request, so per-worker state such as
+    # the face model is built once per process rather than once per image.
+    executor = get_executor()
+
+    def schedule(name, *args):
+        # Detectors outside the profile are not run; their ML features are imputed below
+        if name in detectors:
+            futures[name] = executor.submit(run_task, DETECTOR_TASKS[name], detector_input(inputs, name), *args)
+
+    # Face detection is a shared intermediate: it runs first and its result is handed
+    # to every face-aware detector instead of each one detecting faces again.
+    schedule('faces')
+    faces_future = futures.pop('faces', None)
+
+    # Submit each analysis function to the executor.
+    # Each .submit() call returns a Future object representing the eventual result.
+    if not tiled:
+        # ELA and JPEG ghost share one decode and one set of JPEG re-encodes
+        schedule('recompression')
+        # HOS (db1, full image) and RAMBiNo (db2 patches) share no decomposition and run in parallel
+        schedule('hos')
+        schedule('rambino')
+    schedule('cfa')
+    schedule('jpeg_dimples')
+    schedule('geometric')
+    schedule('lighting')
+    schedule('reflection_inconsistency')
+    schedule('double_quantization')
+    schedule('watermark')
+    schedule('statistical_anomaly')
+
+    faces = None # Face-aware detectors fall back to their own handling
+    if faces_future is not None:
+        try:
+            faces = faces_future.result()
+        except Exception as e:
+            print(f"Error running face detection subprocess: {e}")
+    schedule('specialized_detector', faces)
+    schedule('deepfake', faces)
+
+    # Tiled mode streams full-resolution tiles through the same pool; only a bounded
+    # number of tiles is in flight at once, so memory does not grow with the image
+    tiles = None
+    if tiled:
+        tiles = tiling.analyze_tiled(image_bytes, run_tile_analysis, executor=executor,
+                                     tile_size=tile_size, overlap=tile_overlap,
+                                     max_in_flight=executor.max_workers) # One tile per pool worker
+
+    # Collect results from all futures.
+    # .result() blocks until the corresponding task is complete.
+    # Exception handling is included for robust error management in each analysis.
+    results = {}
+    rambino_raw_score = 0.0
+    rambino_features_list = None
+    hos_statistics = {}
+    specialized_detector_scores = {}
+    specialized_likely_type = 'Unknown'
+
+    if tiles is not None:
+        for name in tiling.TILE_DETECTORS:
+            results[name] = tiles['scores'].get(name, 0.0)
+        rambino_raw_score = tiles['scores'].get('rambino_raw_score', 0.0)
+
+    for name, future in futures.items():
+        try:
+            if name == 'recompression':
+                try:
+                    recompression_result = future.result()
+                    results['ela'] = recompression_result['ela']
+                    results['jpeg_ghost'] = recompression_result['jpeg_ghost']
+                except Exception as e:
+                    print(f"Error running recompression analysis subprocess: {e}")
+                    results['ela'] = 0.0
+                    results['jpeg_ghost'] = 0.0
+            elif name == 'hos':
+                try:
+                    hos_result = future.result()
+                    results['hos'] = hos_result['hos']
+                    hos_statistics = hos_result['hos_statistics']
+                except Exception as e:
+                    print(f"Error running hos analysis subprocess: {e}")
+                    results['hos'] = 0.0
+            elif name == 'rambino':
+                try:
+                    rambino_result = future.result()
+                    results['rambino'] = rambino_result['score']
+                    rambino_raw_score = rambino_result['raw_score']
+                    rambino_features_list = rambino_result['features']
+                except Exception as e:
+                    print(f"Error running rambino analysis subprocess: {e}")
+                    results['rambino'] = 0.0
+                    rambino_raw_score = 0.0
+                    rambino_features_list = None
+            elif name == 'specialized_detector':
+                try:
+                    specialized_result = future.result()
+                    results['specialized'] = specialized_result.get('overall_score', 0.0)
+                    specialized_detector_scores = specialized_result.get('detector_scores', {})
+                    specialized_likely_type = specialized_result.get('likely_type', 'Unknown')
+                except Exception as e:
+                    print(f"Error running specialized_detector analysis subprocess: {e}")
+                    results['specialized'] = 0.0
+                    specialized_detector_scores = {}
+                    specialized_likely_type = 'Unknown'
+            elif name == 'watermark':
+                try:
+                    results['watermark'] = future.result()
+                except Exception as e:
+                    print(f"Error running watermark analysis subprocess: {e}")
+                    results['watermark'] = 0.0 # Default/error value
+            else:
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"Error running {name} analysis subprocess: {e}")
+                    results[name] = 0.0 # Default/error value
+        except Exception as e:
+            print(f"Error running {name} analysis: {e}")
+            results[name] = 0.0 # Default/error value
 
     ela_score = results.get('ela', 0.0)
     cfa_score = results.get('cfa', 0.0)
@@ -203,8 +509,12 @@ def run_analysis(image_bytes: bytes):
     # Replace any NaN values in ml_features with 0.0 to prevent prediction errors
     ml_features = [0.0 if np.isnan(f) else f for f in ml_features]
 
+    # Features of detectors the profile skipped get their training-set mean
+    skipped = skipped_features(profile, ml_predictor.FEATURE_NAMES, tiled=tiled)
+    ml_features = ml_predictor.impute_features(ml_features, skipped)
+
     # Make prediction using the loaded ML model
-    ml_prediction_result = ml_predictor.predict(_ml_model, ml_features)
+    ml_prediction_result = ml_predictor.predict(get_ml_model(), ml_features)
     prediction_label = ml_prediction_result["prediction_label"]
     final_score = ml_prediction_result["confidence"]
 
@@ -327,6 +637,7 @@ def run_analysis(image_bytes: bytes):
             "url": "https://farid.berkeley.edu/research/digital-forensics/"
         }
     ]
+    analysis_breakdown = [entry for entry in analysis_breakdown if BREAKDOWN_FEATURES[entry["feature"]] not in skipped]
 
 
     result = {
@@ -334,14 +645,68 @@ def run_analysis(image_bytes: bytes):
         "confidence": final_score,
         "analysis_breakdown": analysis_breakdown,
         "rambino_raw_score": rambino_raw_score,  # optional: raw, unscaled value
+        "preprocessing": describe_inputs(inputs), # original size and analysis scale factor(s)
+        "profile": {"name": profile, "requested": requested_profile, "skipped_features": sorted(skipped)},
     }
 
     # Attach truncated rambino features for inspection if available
     if rambino_features_list is not None:
         result["rambino_features"] = rambino_features_list
 
+    # Attach the per-tile score grid in tiled mode
+    if tiles is not None:
+        result["tiles"] = {key: value for key, value in tiles.items() if key != 'scores'}
+
+    # Attach per-level, per-subband wavelet statistics if available
+    if hos_statistics:
+        result["hos_statistics"] = hos_statistics
+
+    if image_hash is not None:
+        _near_duplicates.add(image_hash, copy.deepcopy(result))
+        if near_duplicate is not None:
+            result["near_duplicate"] = dict(near_duplicate, reused=False)
+
     # Attach full specialized detector breakdown for inspection, if desired
     # result["specialized_detector_scores"] = specialized_detector_scores
     # result["specialized_likely_type"] = specialized_likely_type
 
     return result
+
+def run_analysis_coalesced(image_bytes: bytes, profile: str = None, **options):
+    """
+    run_analysis() with in-flight deduplication: a request for an image (and options)
+    already being analyzed, in this process or another worker on the host, waits for
+    that analysis and receives the same result instead of starting a new one.
+
+    Without a pinned profile, the load governor picks one: the service steps down to
+    cheaper profiles while it is overloaded (see qos.LoadGovernor). Coalesced callers
+    add no load: the governor only counts the analysis that actually runs.
+
+    Args:
+        image_bytes: The raw bytes of the image.
+        profile: Analysis profile to pin, or None to let the load governor choose.
+        **options: Keyword arguments for run_analysis (tiled, tile_size, tile_overlap).
+
+    Returns:
+        The run_analysis result (a copy per caller); "profile" also records whether the
+        profile was selected by the 'client' or by 'load'.
+
+    Raises:
+        ValueError: If the profile does not exist
+    """
+    selected_by = 'load' if profile is None else 'client'
+    if profile is None:
+        profile = _governor.current_profile()
+    get_profile(profile)
+    result = _single_flight.run(content_key(image_bytes, profile=profile, **options), _run_tracked_analysis,
+                                image_bytes, profile, **options)
+    result["profile"]["selected_by"] = selected_by
+    return result
+
+def _run_tracked_analysis(image_bytes: bytes, profile: str, **options):
+    """
+    run_analysis() counted by the load governor. Only the single-flight leader runs it,
+    so callers waiting on a coalesced analysis do not count as load.
+    """
+    with _governor.track(profile):
+        return run_analysis(image_bytes, profile=profile, **options)
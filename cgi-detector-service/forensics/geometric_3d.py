@@ -16,9 +16,9 @@ import numpy as np
 from PIL import Image
 from io import BytesIO
 from scipy import ndimage
-from scipy.stats import entropy
 from skimage import filters, feature, measure
 from skimage.morphology import disk
+from .gradient_stats import compute_gradient_field, gradient_block_stats
 import warnings
 
 warnings.filterwarnings('ignore')
@@ -165,12 +165,82 @@ def _analyze_smoothness(gray_image: np.ndarray) -> float:
         return 0.0
 
 
-def _analyze_edge_regularity(gray_image: np.ndarray) -> float:
+def _segmented_gradient(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Applies np.gradient independently to every segment of a concatenated 1-D array.
+
+    Interior points use central differences and segment endpoints use one-sided
+    differences, exactly as np.gradient does for each segment on its own.
+
+    Args:
+        values: Concatenated 1-D samples of all segments
+        starts: Index of the first sample of each segment
+        ends: Index of the last sample of each segment (segments need at least 2 samples)
+
+    Returns:
+        Array of the same shape as values holding the per-segment gradients
+    """
+    grad = np.empty_like(values)
+    grad[1:-1] = (values[2:] - values[:-2]) / 2.0
+    grad[starts] = values[starts + 1] - values[starts]
+    grad[ends] = values[ends] - values[ends - 1]
+    return grad
+
+
+def _contour_curvature_entropies(contours: list, bins: int = 20) -> np.ndarray:
+    """
+    Computes the curvature-histogram entropy of many contours in one vectorized pass.
+
+    Contours are concatenated into a single (N, 2) array with segment offsets; curvature is
+    evaluated over all of them at once, and the per-contour density histograms are built
+    with np.minimum/np.maximum.reduceat and a 2-D bincount instead of a Python loop.
+
+    Args:
+        contours: List of (n_i, 2) contour coordinate arrays
+        bins: Number of histogram bins per contour
+
+    Returns:
+        1-D array with the entropy of each contour's curvature distribution
+    """
+    lengths = np.array([len(c) for c in contours])
+    points = np.concatenate(contours)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    ends = starts + lengths - 1
+
+    # Curvature along every contour using finite differences
+    dx = _segmented_gradient(points[:, 0], starts, ends)
+    dy = _segmented_gradient(points[:, 1], starts, ends)
+    ddx = _segmented_gradient(dx, starts, ends)
+    ddy = _segmented_gradient(dy, starts, ends)
+    curvature = np.abs(dx * ddy - dy * ddx) / (dx**2 + dy**2 + 1e-8)**1.5
+
+    # Per-contour histogram range, widened like np.histogram when min == max
+    low = np.minimum.reduceat(curvature, starts)
+    high = np.maximum.reduceat(curvature, starts)
+    flat = low == high
+    low = np.where(flat, low - 0.5, low)
+    high = np.where(flat, high + 0.5, high)
+    width = (high - low) / bins
+
+    segment = np.repeat(np.arange(len(contours)), lengths)
+    bin_index = ((curvature - low[segment]) / width[segment]).astype(np.intp)
+    bin_index = np.clip(bin_index, 0, bins - 1)
+    counts = np.bincount(segment * bins + bin_index, minlength=len(contours) * bins).reshape(-1, bins)
+
+    # Density histogram plus the epsilon the scalar version added before scipy's entropy
+    hist = counts / (lengths[:, None] * width[:, None]) + 1e-10
+    prob = hist / hist.sum(axis=1, keepdims=True)
+    return -np.sum(prob * np.log(prob), axis=1)
+
+
+def _analyze_edge_regularity(gray_image: np.ndarray, max_contours: int = None) -> float:
     """
     Analyzes edge regularity. CGI often has overly regular and perfect edges.
 
     Args:
         gray_image: Grayscale image as numpy array
+        max_contours: Optional cap on the number of contours analyzed; the longest
+            contours are kept when the image has more
 
     Returns:
         Edge regularity score (0-1), higher means suspiciously regular edges
@@ -185,40 +255,21 @@ def _analyze_edge_regularity(gray_image: np.ndarray) -> float:
         if len(contours) == 0:
             return 0.0
 
-        # Analyze curvature regularity of contours
-        regularity_scores = []
-
-        for contour in contours:
-            if len(contour) < 10:  # Skip very short contours
-                continue
-
-            # Calculate curvature along the contour
-            # Using finite differences
-            dx = np.gradient(contour[:, 0])
-            dy = np.gradient(contour[:, 1])
+        # Skip very short contours
+        contours = [contour for contour in contours if len(contour) >= 10]
+        if max_contours is not None and len(contours) > max_contours:
+            contours = sorted(contours, key=len, reverse=True)[:max_contours]
 
-            # Second derivatives
-            ddx = np.gradient(dx)
-            ddy = np.gradient(dy)
-
-            # Curvature formula
-            curvature = np.abs(dx * ddy - dy * ddx) / (dx**2 + dy**2 + 1e-8)**1.5
-
-            # Calculate entropy of curvature distribution
-            # Low entropy = regular curvature = suspicious for CGI
-            hist, _ = np.histogram(curvature, bins=20, density=True)
-            hist = hist + 1e-10  # Avoid log(0)
-            curv_entropy = entropy(hist)
+        if len(contours) == 0:
+            return 0.0
 
-            # Natural contours have high entropy (varied curvature)
-            # CGI contours often have low entropy (uniform curvature)
-            if curv_entropy < 1.5:
-                regularity_scores.append(1.0 - (curv_entropy / 1.5))
-            else:
-                regularity_scores.append(0.0)
+        # Calculate entropy of each contour's curvature distribution
+        # Low entropy = regular curvature = suspicious for CGI
+        curv_entropy = _contour_curvature_entropies(contours)
 
-        if len(regularity_scores) == 0:
-            return 0.0
+        # Natural contours have high entropy (varied curvature)
+        # CGI contours often have low entropy (uniform curvature)
+        regularity_scores = np.where(curv_entropy < 1.5, 1.0 - curv_entropy / 1.5, 0.0)
 
         # Return average regularity score
         return float(np.clip(np.mean(regularity_scores), 0.0, 1.0))
@@ -239,38 +290,18 @@ def _analyze_gradient_consistency(gray_image: np.ndarray) -> float:
         Gradient consistency score (0-1), higher means suspiciously consistent
     """
     try:
-        # Calculate image gradients
-        grad_x = ndimage.sobel(gray_image, axis=1)
-        grad_y = ndimage.sobel(gray_image, axis=0)
-
-        # Calculate gradient magnitude
-        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-
-        # Calculate gradient direction
-        gradient_direction = np.arctan2(grad_y, grad_x)
+        # Calculate image gradients (float32, so uint8 input cannot overflow)
+        gradients = compute_gradient_field(gray_image)
 
         # Divide image into blocks and analyze gradient consistency
         block_size = 32
-        height, width = gray_image.shape
-
-        direction_variances = []
-
-        for i in range(0, height - block_size, block_size):
-            for j in range(0, width - block_size, block_size):
-                block_dir = gradient_direction[i:i+block_size, j:j+block_size]
-                block_mag = gradient_magnitude[i:i+block_size, j:j+block_size]
+        block_stats = gradient_block_stats(gradients, block_size)
 
-                # Only consider blocks with significant gradients
-                if np.mean(block_mag) > 10:
-                    # Calculate circular variance of gradient directions
-                    # Convert to unit vectors
-                    cos_sum = np.sum(np.cos(block_dir))
-                    sin_sum = np.sum(np.sin(block_dir))
-                    r = np.sqrt(cos_sum**2 + sin_sum**2) / block_dir.size
+        # Only consider blocks with significant gradients
+        significant = block_stats['mean_magnitude'] > 10
 
-                    # Circular variance (0 = all same direction, 1 = random)
-                    circ_var = 1 - r
-                    direction_variances.append(circ_var)
+        # Circular variance of gradient directions (0 = all same direction, 1 = random)
+        direction_variances = 1 - block_stats['resultant_length'][significant]
 
         if len(direction_variances) == 0:
             return 0.0
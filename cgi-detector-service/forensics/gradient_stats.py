@@ -0,0 +1,116 @@
+"""
+Shared gradient-field and block-statistics helpers.
+
+Several detectors (geometric_3d, lighting_text) summarize Sobel gradients over a grid of
+non-overlapping blocks. Instead of walking the grid with nested Python loops, the image is
+reshaped to (H/b, b, W/b, b) and every block statistic is obtained with a few array
+reductions. Partial blocks on the right and bottom edges are reduced in a second, small pass
+so no image content is silently dropped.
+"""
+
+import numpy as np
+from scipy import ndimage
+
+
+def compute_gradient_field(gray_image: np.ndarray) -> dict:
+    """
+    Computes the Sobel gradient field of a grayscale image in float32.
+
+    Args:
+        gray_image: Grayscale image as numpy array
+
+    Returns:
+        Dictionary with float32 'grad_x', 'grad_y', 'magnitude' and 'direction' arrays
+    """
+    grad_x = ndimage.sobel(gray_image, axis=1, output=np.float32)
+    grad_y = ndimage.sobel(gray_image, axis=0, output=np.float32)
+    return {
+        'grad_x': grad_x,
+        'grad_y': grad_y,
+        'magnitude': np.hypot(grad_x, grad_y),
+        'direction': np.arctan2(grad_y, grad_x),
+    }
+
+
+def block_sums(arrays: list, block_size: int, include_partial: bool = True):
+    """
+    Sums 2-D arrays over non-overlapping blocks.
+
+    Full blocks are reduced with a single reshape to (H/b, b, W/b, b); when include_partial
+    is set, a second pass reduces the ragged right column, bottom row and corner.
+
+    Args:
+        arrays: Same-shaped 2-D arrays to reduce
+        block_size: Block side length in pixels
+        include_partial: Whether partial edge blocks are returned as well
+
+    Returns:
+        Tuple of (sums, counts): a float64 array of shape (len(arrays), n_blocks) and the
+        number of pixels in each block (full blocks first, then edge blocks)
+    """
+    height, width = arrays[0].shape
+    rows, cols = height // block_size, width // block_size
+    full_h, full_w = rows * block_size, cols * block_size
+    rem_h = height - full_h if include_partial else 0
+    rem_w = width - full_w if include_partial else 0
+
+    def _reduce(values):
+        sums = [values[:full_h, :full_w].reshape(rows, block_size, cols, block_size)
+                .sum(axis=(1, 3), dtype=np.float64).ravel()]
+        if rem_w and rows:
+            sums.append(values[:full_h, full_w:].reshape(rows, block_size, rem_w).sum(axis=(1, 2), dtype=np.float64))
+        if rem_h and cols:
+            sums.append(values[full_h:, :full_w].reshape(rem_h, cols, block_size).sum(axis=(0, 2), dtype=np.float64))
+        if rem_h and rem_w:
+            sums.append(np.array([values[full_h:, full_w:].sum(dtype=np.float64)]))
+        return np.concatenate(sums)
+
+    counts = [np.full(rows * cols, block_size * block_size)]
+    if rem_w and rows:
+        counts.append(np.full(rows, block_size * rem_w))
+    if rem_h and cols:
+        counts.append(np.full(cols, rem_h * block_size))
+    if rem_h and rem_w:
+        counts.append(np.array([rem_h * rem_w]))
+
+    return np.stack([_reduce(values) for values in arrays]), np.concatenate(counts)
+
+
+def gradient_block_stats(gradients: dict, block_size: int, include_partial: bool = True) -> dict:
+    """
+    Summarizes a gradient field per block without any per-block Python work.
+
+    The magnitude-weighted circular mean direction of a block is atan2(sum gy, sum gx),
+    and the unweighted resultant uses the unit vectors (gx, gy) / |g|, so neither needs
+    cos/sin of the direction field.
+
+    Args:
+        gradients: Gradient field from compute_gradient_field
+        block_size: Block side length in pixels
+        include_partial: Whether partial edge blocks are included
+
+    Returns:
+        Dictionary of 1-D per-block arrays:
+        - mean_magnitude: Mean gradient magnitude
+        - weighted_direction: Magnitude-weighted circular mean direction
+        - resultant_length: Mean resultant length of the unit direction vectors
+          (1 = all pixels point the same way, 0 = uniformly spread)
+        - counts: Number of pixels in the block
+    """
+    grad_x, grad_y, magnitude = gradients['grad_x'], gradients['grad_y'], gradients['magnitude']
+
+    # Unit direction vectors; atan2(0, 0) == 0, so zero-gradient pixels point along +x
+    nonzero = magnitude > 0
+    safe_magnitude = np.where(nonzero, magnitude, 1.0)
+    unit_cos = np.where(nonzero, grad_x / safe_magnitude, 1.0)
+    unit_sin = grad_y / safe_magnitude
+
+    (magnitude_sum, grad_x_sum, grad_y_sum, cos_sum, sin_sum), counts = block_sums(
+        [magnitude, grad_x, grad_y, unit_cos, unit_sin], block_size, include_partial=include_partial)
+
+    return {
+        'mean_magnitude': magnitude_sum / counts,
+        'weighted_direction': np.arctan2(grad_y_sum, grad_x_sum),
+        'resultant_length': np.hypot(cos_sum, sin_sum) / counts,
+        'counts': counts,
+    }
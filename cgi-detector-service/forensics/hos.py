@@ -1,10 +1,53 @@
 import numpy as np
 import pywt
-from PIL import Image
-import io
 from scipy.stats import kurtosis, skew
 
-def analyze_hos(image_bytes: bytes):
+from .wavelets import WaveletCache
+
+SUBBAND_NAMES = ('horizontal', 'vertical', 'diagonal')
+
+
+def _decomposition_level(wavelets: WaveletCache, wavelet: str, levels: int) -> int:
+    """Clamps the requested level to what the image size supports (at least one level)."""
+    max_level = pywt.dwt_max_level(min(wavelets.gray.shape), wavelet)
+    return max(1, min(levels, max_level))
+
+
+def compute_hos_statistics(wavelets: WaveletCache, wavelet: str = 'db1', levels: int = 3) -> dict:
+    """
+    Computes per-subband higher-order statistics of a multi-level wavelet decomposition.
+
+    All levels come from a single cached wavedec2 call; the finest level is exactly the
+    single-level dwt2 decomposition used by analyze_hos.
+
+    Args:
+        wavelets: WaveletCache of the grayscale image.
+        wavelet: pywt wavelet name.
+        levels: Number of decomposition levels (clamped to the image size).
+
+    Returns:
+        Dictionary keyed by 'level_1' (finest) ... 'level_n', each mapping 'horizontal',
+        'vertical' and 'diagonal' to a dict with the band's mean, variance, skew and kurtosis.
+    """
+    level = _decomposition_level(wavelets, wavelet, levels)
+    details = wavelets.decomposition(wavelet, level)[1:]
+
+    stats = {}
+    # wavedec2 lists details from the coarsest level to the finest
+    for depth, bands in enumerate(reversed(details), start=1):
+        stats[f'level_{depth}'] = {
+            name: {
+                'mean': float(np.mean(band)),
+                'variance': float(np.var(band)),
+                'skew': float(skew(band, axis=None)),
+                'kurtosis': float(kurtosis(band, axis=None)),
+            }
+            for name, band in zip(SUBBAND_NAMES, bands)
+        }
+    return stats
+
+
+def analyze_hos(image_bytes: bytes, wavelets: WaveletCache = None, levels: int = 3):
     """
     Performs Higher-Order Wavelet Statistics (HOS) analysis.
     Natural images have predictable statistical distributions in the wavelet
@@ -12,20 +55,24 @@ def analyze_hos(image_bytes: bytes):
 
     Args:
         image_bytes: The raw bytes of the image.
+        wavelets: Optional WaveletCache for this image, shared with other wavelet-domain
+            detectors; image_bytes is not decoded when given.
+        levels: Levels of the shared db1 decomposition, so compute_hos_statistics can
+            reuse it; the score itself only uses the finest level.
 
     Returns:
         A score between 0.0 and 1.0, where a higher score indicates a higher
         probability of the image being synthetic.
     """
-    try:
-        image = Image.open(io.BytesIO(image_bytes)).convert('L') # Grayscale
-        image_array = np.array(image, dtype=np.float32)
-    except Exception:
-        return 0.0
+    if wavelets is None:
+        try:
+            wavelets = WaveletCache.from_bytes(image_bytes)
+        except Exception:
+            return 0.0
 
-    # Perform a 2-level wavelet decomposition
-    coeffs = pywt.dwt2(image_array, 'db1')
-    cA, (cH, cV, cD) = coeffs
+    # Multi-level decomposition; its finest level equals a single-level dwt2
+    coeffs = wavelets.decomposition('db1', _decomposition_level(wavelets, 'db1', levels))
+    cH, cV, cD = coeffs[-1]
 
     # We will analyze the detail coefficients (horizontal, vertical, diagonal)
     detail_coeffs = np.concatenate([cH.flatten(), cV.flatten(), cD.flatten()])
@@ -50,3 +97,24 @@ def analyze_hos(image_bytes: bytes):
         score = 0.1
 
     return score
+
+
+def run_hos_analysis(image_bytes: bytes) -> dict:
+    """
+    Engine task: the HOS score and compute_hos_statistics of an image, both taken from
+    one cached db1 decomposition.
+
+    Returns:
+        Dictionary with 'hos' (the analyze_hos score) and 'hos_statistics'
+        (empty if they could not be computed)
+    """
+    try:
+        wavelets = WaveletCache.from_bytes(image_bytes)
+    except Exception:
+        return {'hos': 0.0, 'hos_statistics': {}}
+    try:
+        hos_statistics = compute_hos_statistics(wavelets)
+    except Exception as e:
+        print(f"Error computing HOS statistics: {e}")
+        hos_statistics = {}
+    return {'hos': analyze_hos(image_bytes, wavelets=wavelets), 'hos_statistics': hos_statistics}
@@ -0,0 +1,190 @@
+"""
+Image decoding helpers shared by the engine and the ML feature extractor.
+
+Every analysis runs on a copy of the upload reduced to a pixel budget: a maximum height
+(the historical 480p cap), a maximum long side and a maximum total pixel count, so a
+panorama or a long strip costs no more than an ordinary photo. Each detector declares
+the budget it operates at in DETECTOR_RESOLUTIONS, and one analysis input is prepared
+per budget in use.
+
+For JPEG sources the reduction starts in the decoder: Image.draft asks libjpeg to decode
+straight from the DCT coefficients at 1/2, 1/4 or 1/8 scale, choosing the smallest
+scale that is still at least the target size, so a 12-48 MP phone photo is never
+expanded to full resolution. The remaining factor (below 2x) is done by an ordinary
+resize with a selectable filter.
+"""
+
+import math
+from io import BytesIO
+from PIL import Image
+from .perceptual_hash import phash
+
+MAX_HEIGHT = 480
+
+# Any key may be omitted (or None) to leave that dimension unbounded
+DEFAULT_PIXEL_BUDGET = {
+    'max_height': MAX_HEIGHT,
+    'max_long_side': 1280,
+    'max_pixels': 1280 * MAX_HEIGHT,
+}
+
+# Named budgets available to the detectors
+PIXEL_BUDGETS = {
+    'default': DEFAULT_PIXEL_BUDGET,
+}
+
+# Operating resolution (a PIXEL_BUDGETS name) of every engine task. Face detection and the
+# face-aware detectors (specialized, deepfake) must share one resolution.
+DETECTOR_RESOLUTIONS = {
+    'faces': 'default',
+    'recompression': 'default',
+    'cfa': 'default',
+    'hos': 'default',
+    'rambino': 'default',
+    'jpeg_dimples': 'default',
+    'geometric': 'default',
+    'lighting': 'default',
+    'reflection_inconsistency': 'default',
+    'double_quantization': 'default',
+    'watermark': 'default',
+    'statistical_anomaly': 'default',
+    'specialized_detector': 'default',
+    'deepfake': 'default',
+}
+
+
+def budget_scale(size: tuple, budget: dict = None) -> float:
+    """
+    Largest scale factor (at most 1.0) that fits an image of the given size into a pixel budget.
+
+    Args:
+        size: (width, height) of the source image
+        budget: Dictionary with optional 'max_height', 'max_long_side' and 'max_pixels'
+            limits; defaults to DEFAULT_PIXEL_BUDGET
+
+    Returns:
+        Scale factor in (0, 1]
+    """
+    if budget is None:
+        budget = DEFAULT_PIXEL_BUDGET
+    width, height = size
+    scale = 1.0
+    if budget.get('max_height'):
+        scale = min(scale, budget['max_height'] / height)
+    if budget.get('max_long_side'):
+        scale = min(scale, budget['max_long_side'] / max(width, height))
+    if budget.get('max_pixels'):
+        scale = min(scale, math.sqrt(budget['max_pixels'] / (width * height)))
+    return scale
+
+
+def downsize_to_budget(image: Image.Image, budget: dict = None, resample=Image.LANCZOS, draft: bool = True):
+    """
+    Downsizes the input image to fit a pixel budget, maintaining aspect ratio.
+
+    Args:
+        image: A PIL Image object. Pass it unloaded (straight from Image.open) so JPEG
+            sources can use scaled decoding.
+        budget: Pixel budget, see budget_scale(); defaults to DEFAULT_PIXEL_BUDGET.
+        resample: PIL resampling filter for the final resize (default LANCZOS).
+        draft: Let the JPEG decoder reduce the image by 1/2, 1/4 or 1/8 first.
+
+    Returns:
+        Tuple of (image, scale): the resized image (the input itself if it already fits)
+        and the scale factor applied to the source dimensions.
+    """
+    width, height = image.size
+    scale = budget_scale((width, height), budget)
+
+    if scale >= 1.0:
+        return image, 1.0  # No downsizing needed if the image already fits
+
+    # Small epsilon so dimensions the budget hits exactly are not truncated by rounding error
+    new_size = (max(1, int(width * scale + 1e-9)), max(1, int(height * scale + 1e-9)))
+    if draft and image.format == 'JPEG':
+        # No-op once the image has been loaded; otherwise image.size becomes the scaled size
+        image.draft(None, new_size)
+    if image.size != new_size:
+        image = image.resize(new_size, resample)
+    return image, scale
+
+
+def downsize_image_to_480p(image: Image.Image, resample=Image.LANCZOS, draft: bool = True) -> Image.Image:
+    """
+    Downsizes the input image to a maximum height of 480 pixels, maintaining aspect ratio.
+
+    Only the height is bounded; use downsize_to_budget() to bound width and pixel count too.
+
+    Args:
+        image: A PIL Image object.
+        resample: PIL resampling filter for the final resize (default LANCZOS).
+        draft: Let the JPEG decoder reduce the image by 1/2, 1/4 or 1/8 first.
+
+    Returns:
+        A new PIL Image object resized to 480p or smaller if the original height is less than 480p.
+    """
+    return downsize_to_budget(image, {'max_height': MAX_HEIGHT}, resample=resample, draft=draft)[0]
+
+
+def prepare_analysis_inputs(image_bytes: bytes, detectors=None, resample=Image.LANCZOS) -> dict:
+    """
+    Builds the PNG-encoded analysis input of every pixel budget the given detectors use.
+
+    PNG avoids adding re-compression artifacts. If the image cannot be decoded, the
+    original bytes are used for every budget with a scale of 1.0.
+
+    Args:
+        image_bytes: Raw bytes of the uploaded image
+        detectors: Task names to prepare inputs for; defaults to every DETECTOR_RESOLUTIONS entry
+        resample: PIL resampling filter for the final resize
+
+    Returns:
+        Dictionary with:
+        - original_size: (width, height) of the upload, or None if it could not be decoded
+        - resolutions: {budget name: {'bytes', 'size', 'scale'}}
+        - perceptual_hash: pHash of the downsized image (see perceptual_hash.phash), or
+          None if it could not be decoded
+    """
+    if detectors is None:
+        detectors = DETECTOR_RESOLUTIONS.keys()
+    names = sorted({DETECTOR_RESOLUTIONS.get(detector, 'default') for detector in detectors})
+
+    original_size = None
+    perceptual_hash = None
+    resolutions = {}
+    for name in names:
+        try:
+            image = Image.open(BytesIO(image_bytes))
+            original_size = image.size
+            downsized_image, scale = downsize_to_budget(image, PIXEL_BUDGETS[name], resample=resample)
+            buffered = BytesIO()
+            downsized_image.save(buffered, format="PNG")
+            resolutions[name] = {'bytes': buffered.getvalue(), 'size': downsized_image.size, 'scale': scale}
+            if perceptual_hash is None:
+                # Hashed from the already decoded and downsized image, not the upload
+                perceptual_hash = phash(downsized_image)
+        except Exception as e:
+            # Fall back to the original bytes if decoding or downsizing fails
+            print(f"Error processing or downsizing image for the '{name}' budget: {e}")
+            resolutions[name] = {'bytes': image_bytes, 'size': original_size, 'scale': 1.0}
+    return {'original_size': original_size, 'resolutions': resolutions, 'perceptual_hash': perceptual_hash}
+
+
+def detector_input(inputs: dict, detector: str) -> bytes:
+    """Returns the analysis bytes prepared for a detector's declared resolution."""
+    return inputs['resolutions'][DETECTOR_RESOLUTIONS.get(detector, 'default')]['bytes']
+
+
+def describe_inputs(inputs: dict) -> dict:
+    """
+    Summarizes prepared inputs for reporting: the original size and, per budget, the
+    analysis size and scale factor. 'scale' is the default budget's factor.
+    """
+    resolutions = {name: {'size': list(entry['size']) if entry['size'] else None, 'scale': entry['scale']}
+                   for name, entry in inputs['resolutions'].items()}
+    default = resolutions.get('default', next(iter(resolutions.values()), {'scale': 1.0}))
+    return {
+        'original_size': list(inputs['original_size']) if inputs['original_size'] else None,
+        'scale': default['scale'],
+        'resolutions': resolutions,
+    }
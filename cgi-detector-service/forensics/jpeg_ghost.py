@@ -1,8 +1,7 @@
-import io
-from PIL import Image
 import numpy as np
+from .recompression import RecompressionCache
 
-def analyze_jpeg_ghost(image_bytes: bytes) -> float:
+def analyze_jpeg_ghost(image_bytes: bytes, cache: RecompressionCache = None) -> float:
     """
     Analyzes an image using JPEG Ghost analysis to detect manipulation.
 
@@ -13,17 +12,20 @@ def analyze_jpeg_ghost(image_bytes: bytes) -> float:
 
     Args:
         image_bytes: The image content as bytes.
+        cache: Optional RecompressionCache for this image, shared with other
+            recompression-based detectors; image_bytes is not decoded when given.
 
     Returns:
         A score from 0.0 to 1.0, where a higher score indicates a higher
         probability of manipulation.
     """
-    try:
-        original_image = Image.open(io.BytesIO(image_bytes)).convert("L")  # Convert to grayscale
-    except Exception:
-        return 0.0  # Return 0 if image cannot be opened or is not a JPEG
+    if cache is None:
+        try:
+            cache = RecompressionCache.from_bytes(image_bytes)
+        except Exception:
+            return 0.0  # Return 0 if image cannot be opened or is not a JPEG
 
-    width, height = original_image.size
+    width, height = cache.size
     if width < 16 or height < 16:  # Images too small for meaningful analysis
         return 0.0
 
@@ -31,17 +33,14 @@ def analyze_jpeg_ghost(image_bytes: bytes) -> float:
     best_quality = -1
     ssd_map = None
 
+    original_array = cache.array("L").astype(np.float32)  # Grayscale
+
     # Loop through a range of JPEG quality levels
     for quality in range(75, 101):  # Common range for original JPEG compression
-        buffer = io.BytesIO()
-        original_image.save(buffer, format="JPEG", quality=quality)
-        recompressed_image = Image.open(buffer).convert("L")
-
-        # Resize recompressed_image to match original_image if dimensions differ
-        if recompressed_image.size != original_image.size:
-            recompressed_image = recompressed_image.resize(original_image.size, Image.Resampling.LANCZOS)
+        # Grayscale view of the shared RGB re-encode (also used by ELA); the cache matches sizes
+        recompressed_array = cache.recompressed(quality, "L")
 
-        diff = np.array(original_image, dtype=np.float32) - np.array(recompressed_image, dtype=np.float32)
+        diff = original_array - recompressed_array.astype(np.float32)
         current_ssd = np.sum(diff**2)
 
         if current_ssd < min_ssd:
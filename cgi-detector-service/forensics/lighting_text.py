@@ -15,21 +15,24 @@ Key Detection Strategies:
 import numpy as np
 from PIL import Image
 from io import BytesIO
-from scipy import ndimage
 from scipy.stats import circmean, circstd
 from skimage import filters, feature, morphology, measure
 from skimage.util import img_as_float
+from .gradient_stats import compute_gradient_field, gradient_block_stats
+from .box_filters import box_mean, disk_sum
 import warnings
 
 warnings.filterwarnings('ignore')
 
 
-def analyze_lighting_consistency(image_bytes: bytes) -> float:
+def analyze_lighting_consistency(image_bytes: bytes, exact_disk: bool = False) -> float:
     """
     Analyzes lighting consistency across the image to detect CGI or composite artifacts.
 
     Args:
         image_bytes: Raw image bytes
+        exact_disk: Measure edge density over an exact disk (FFT convolution) instead of
+            its box approximation
 
     Returns:
         A score between 0 and 1, where higher values indicate lighting inconsistencies
@@ -49,11 +52,14 @@ def analyze_lighting_consistency(image_bytes: bytes) -> float:
         # Convert to grayscale for analysis
         gray = np.mean(img_array, axis=2).astype(np.uint8)
 
+        # The Sobel gradient field is shared by every gradient-based sub-analysis
+        gradients = compute_gradient_field(gray)
+
         # Perform multiple lighting analyses
-        direction_score = _analyze_lighting_direction_consistency(gray)
-        region_score = _analyze_regional_lighting_consistency(gray, img_array)
+        direction_score = _analyze_lighting_direction_consistency(gray, gradients)
+        region_score = _analyze_regional_lighting_consistency(gray, img_array, gradients)
         shadow_score = _analyze_shadow_consistency(gray)
-        contrast_region_score = _analyze_high_contrast_regions(gray)
+        contrast_region_score = _analyze_high_contrast_regions(gray, gradients, exact_disk=exact_disk)
 
         # Weight the different components
         weights = {
@@ -78,61 +84,33 @@ def analyze_lighting_consistency(image_bytes: bytes) -> float:
         return 0.0
 
 
-def _analyze_lighting_direction_consistency(gray_image: np.ndarray) -> float:
+def _analyze_lighting_direction_consistency(gray_image: np.ndarray, gradients: dict) -> float:
     """
     Analyzes consistency of lighting direction across the image.
     Inconsistent lighting directions suggest composite or CGI images.
 
     Args:
         gray_image: Grayscale image as numpy array
+        gradients: Gradient field from gradient_stats.compute_gradient_field
 
     Returns:
         Inconsistency score (0-1), higher means inconsistent lighting
     """
     try:
-        # Calculate gradients
-        grad_x = ndimage.sobel(gray_image.astype(float), axis=1)
-        grad_y = ndimage.sobel(gray_image.astype(float), axis=0)
-
-        # Calculate gradient magnitude and direction
-        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-        gradient_direction = np.arctan2(grad_y, grad_x)
-
         # Divide image into grid
         block_size = 64
-        height, width = gray_image.shape
-
-        # Collect dominant directions from blocks with significant gradients
-        block_directions = []
-        block_strengths = []
 
-        for i in range(0, height - block_size, block_size):
-            for j in range(0, width - block_size, block_size):
-                block_mag = gradient_magnitude[i:i+block_size, j:j+block_size]
-                block_dir = gradient_direction[i:i+block_size, j:j+block_size]
+        # Magnitude-weighted circular mean direction of every block, edge blocks included
+        block_stats = gradient_block_stats(gradients, block_size)
 
-                # Only consider blocks with significant gradients
-                mean_magnitude = np.mean(block_mag)
-                if mean_magnitude > 10:  # Threshold for significant gradients
-                    # Estimate dominant direction using circular statistics
-                    # Weight by magnitude
-                    weights = block_mag.flatten()
-                    directions = block_dir.flatten()
-
-                    # Calculate weighted circular mean
-                    weighted_cos = np.sum(weights * np.cos(directions))
-                    weighted_sin = np.sum(weights * np.sin(directions))
-                    dominant_direction = np.arctan2(weighted_sin, weighted_cos)
-
-                    block_directions.append(dominant_direction)
-                    block_strengths.append(mean_magnitude)
+        # Only consider blocks with significant gradients
+        significant = block_stats['mean_magnitude'] > 10  # Threshold for significant gradients
+        block_directions = block_stats['weighted_direction'][significant]
+        block_strengths = block_stats['mean_magnitude'][significant]
 
         if len(block_directions) < 4:  # Need at least 4 blocks
             return 0.0
 
-        block_directions = np.array(block_directions)
-        block_strengths = np.array(block_strengths)
-
         # Calculate circular standard deviation
         # Low std = consistent lighting (natural)
         # High std = inconsistent lighting (suspicious)
@@ -154,7 +132,7 @@ def _analyze_lighting_direction_consistency(gray_image: np.ndarray) -> float:
         return 0.0
 
 
-def _analyze_regional_lighting_consistency(gray_image: np.ndarray, color_image: np.ndarray) -> float:
+def _analyze_regional_lighting_consistency(gray_image: np.ndarray, color_image: np.ndarray, gradients: dict) -> float:
     """
     Analyzes lighting consistency between different regions of the image.
     Compares bright and dark regions for consistent light sources.
@@ -162,6 +140,7 @@ def _analyze_regional_lighting_consistency(gray_image: np.ndarray, color_image:
     Args:
         gray_image: Grayscale image
         color_image: Color image
+        gradients: Gradient field from gradient_stats.compute_gradient_field
 
     Returns:
         Inconsistency score (0-1)
@@ -176,10 +155,8 @@ def _analyze_regional_lighting_consistency(gray_image: np.ndarray, color_image:
         dark_regions = blurred < threshold
 
         # Analyze gradient directions in bright vs dark regions
-        grad_x = ndimage.sobel(gray_image.astype(float), axis=1)
-        grad_y = ndimage.sobel(gray_image.astype(float), axis=0)
-        gradient_direction = np.arctan2(grad_y, grad_x)
-        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
+        gradient_direction = gradients['direction']
+        gradient_magnitude = gradients['magnitude']
 
         # Calculate dominant direction in bright regions
         bright_mask = bright_regions & (gradient_magnitude > 10)
@@ -232,9 +209,9 @@ def _analyze_shadow_consistency(gray_image: np.ndarray) -> float:
         # Detect dark regions that could be shadows
         blurred = filters.gaussian(gray_image, sigma=3)
 
-        # Use adaptive thresholding to find dark regions
+        # Use adaptive thresholding to find dark regions (local box mean from an integral image)
         block_size = 51
-        threshold = filters.threshold_local(blurred, block_size, offset=10)
+        threshold = box_mean(blurred, block_size) - 10
         dark_regions = blurred < threshold
 
         # Clean up small noise
@@ -279,13 +256,15 @@ def _analyze_shadow_consistency(gray_image: np.ndarray) -> float:
         return 0.0
 
 
-def _analyze_high_contrast_regions(gray_image: np.ndarray) -> float:
+def _analyze_high_contrast_regions(gray_image: np.ndarray, gradients: dict, exact_disk: bool = False) -> float:
     """
     Detects and analyzes high-contrast regions (text, patterns) for lighting consistency.
     Text and patterns added to CGI often have inconsistent lighting with the scene.
 
     Args:
         gray_image: Grayscale image
+        gradients: Gradient field from gradient_stats.compute_gradient_field
+        exact_disk: Use the exact disk window (FFT convolution) instead of the box approximation
 
     Returns:
         Inconsistency score (0-1)
@@ -296,8 +275,7 @@ def _analyze_high_contrast_regions(gray_image: np.ndarray) -> float:
 
         # Calculate local edge density
         kernel_size = 15
-        kernel = morphology.disk(kernel_size)
-        edge_density = ndimage.convolve(edges.astype(float), kernel.astype(float))
+        edge_density = disk_sum(edges, kernel_size, exact=exact_disk)
 
         # Find high-edge-density regions (potential text/patterns)
         if edge_density[edge_density > 0].size == 0:
@@ -308,11 +286,9 @@ def _analyze_high_contrast_regions(gray_image: np.ndarray) -> float:
         if np.sum(text_like_regions) < 100:  # Not enough text-like regions
             return 0.0
 
-        # Calculate gradients
-        grad_x = ndimage.sobel(gray_image.astype(float), axis=1)
-        grad_y = ndimage.sobel(gray_image.astype(float), axis=0)
-        gradient_direction = np.arctan2(grad_y, grad_x)
-        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
+        # Reuse the shared gradient field
+        gradient_direction = gradients['direction']
+        gradient_magnitude = gradients['magnitude']
 
         # Analyze lighting in text regions vs non-text regions
         text_mask = text_like_regions & (gradient_magnitude > 10)
@@ -5,119 +5,76 @@ and making predictions with a machine learning model for forensic analysis.
 import os
 import numpy as np
 import joblib
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
-from PIL import Image
-from io import BytesIO
 from concurrent.futures import ProcessPoolExecutor
-from . import ela, cfa, hos, jpeg_ghost, rambino, geometric_3d, lighting_text, jpeg_dimples
-from . import specialized_detectors
-from . import deepfake_detector, reflection_consistency, double_quantization
-from . import watermarking, statistical_anomaly
+from . import threads
+from .tasks import run_task, DETECTOR_TASKS
+from .image_io import prepare_analysis_inputs, detector_input
+from .perceptual_hash import deduplicate_files
 import uuid # For generating unique filenames
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "ml_model.joblib")
 FEEDBACK_DATASET_DIR = "/app/forensics_data/feedback_dataset"
 
 _current_ml_model = None # Global variable to hold the loaded model
+_feature_means = None # Training-set feature means, see feature_means()
 
+# Order of the features in the model's input vector (see engine.run_analysis)
+FEATURE_NAMES = (
+    'ela', 'cfa', 'hos', 'jpeg_ghost', 'jpeg_dimples', 'rambino', 'geometric', 'lighting', 'specialized',
+    'deepfake', 'reflection_inconsistency', 'double_quantization', 'watermark', 'statistical_anomaly',
+)
 
-def downsize_image_to_480p(image: Image.Image) -> Image.Image:
-    """
-    Downsizes the input image to a maximum height of 480 pixels, maintaining aspect ratio.
 
-    Args:
-        image: A PIL Image object.
+class ModelUnavailableError(RuntimeError):
+    """Raised when no trained ML model can be loaded."""
 
-    Returns:
-        A new PIL Image object resized to 480p or smaller if the original height is less than 480p.
-    """
-    max_height = 480
-    width, height = image.size
-
-    if height <= max_height:
-        return image  # No downsizing needed if already 480p or smaller
-
-    # Calculate the new width while maintaining the aspect ratio
-    new_width = int(width * (max_height / height))
-    resized_image = image.resize((new_width, max_height), Image.LANCZOS)
-    return resized_image
-
-def run_rambino_analysis(image_bytes_for_rambino):
-    try:
-        image = Image.open(BytesIO(image_bytes_for_rambino)).convert('L')  # Convert to grayscale
-        image_data = np.array(image)
-    except Exception:
-        image_data = None
-        return {'score': 0.0, 'features': None, 'raw_score': 0.0}
-
-    rambino_score = 0.0
-    rambino_features_list = None
-    try:
-        if image_data is not None:
-            rambino_result = rambino.analyze_rambino_features(image_data)
-            try:
-                raw_feats = rambino.compute_rambino_features(image_data)
-                max_return = 128
-                rambino_features_list = raw_feats.flatten()[:max_return].astype(float).tolist()
-            except Exception:
-                rambino_features_list = None
-
-            if isinstance(rambino_result, dict):
-                if "error" in rambino_result:
-                    rambino_score = 0.0
-                else:
-                    rambino_score = float(rambino_result.get("rambino_feature_mean_noise", 0.0))
-            else:
-                rambino_score = float(np.mean(rambino_result))
-    except Exception:
-        rambino_score = 0.0
-        rambino_features_list = None
-
-    rambino_raw_score = rambino_score
-    scale = 30000.0
-    rambino_score = float(np.clip(rambino_raw_score / scale, 0.0, 1.0))
-    return {'score': rambino_score, 'features': rambino_features_list, 'raw_score': rambino_raw_score}
 
 def extract_features_from_image_bytes(image_bytes: bytes) -> np.ndarray:
     """
     Extracts all forensic features from an image, given its bytes.
     This is a streamlined version of engine.run_analysis, focused solely on feature extraction.
     """
-    try:
-        original_image = Image.open(BytesIO(image_bytes))
-        downsized_image = downsize_image_to_480p(original_image)
-        buffered = BytesIO()
-        downsized_image.save(buffered, format="PNG")
-        processed_image_bytes = buffered.getvalue()
-    except Exception as e:
-        print(f"Error processing or downsizing image for feature extraction: {e}")
-        processed_image_bytes = image_bytes
+    # Same per-detector pixel budgets as engine.run_analysis
+    inputs = prepare_analysis_inputs(image_bytes)
 
     futures = {}
-    with ProcessPoolExecutor() as executor:
-        futures['ela'] = executor.submit(ela.analyze_ela, processed_image_bytes)
-        futures['cfa'] = executor.submit(cfa.analyze_cfa, processed_image_bytes)
-        futures['hos'] = executor.submit(hos.analyze_hos, processed_image_bytes)
-        futures['jpeg_ghost'] = executor.submit(jpeg_ghost.analyze_jpeg_ghost, processed_image_bytes)
-        futures['jpeg_dimples'] = executor.submit(jpeg_dimples.detect_jpeg_dimples, processed_image_bytes)
-        futures['geometric'] = executor.submit(geometric_3d.analyze_geometric_consistency, processed_image_bytes)
-        futures['lighting'] = executor.submit(lighting_text.analyze_lighting_consistency, processed_image_bytes)
-        futures['specialized_detector'] = executor.submit(specialized_detectors.analyze_specialized_cgi_types, processed_image_bytes)
-        futures['deepfake'] = executor.submit(deepfake_detector.detect_deepfake, processed_image_bytes)
-        futures['reflection_inconsistency'] = executor.submit(reflection_consistency.detect_reflection_inconsistencies, processed_image_bytes)
-        futures['double_quantization'] = executor.submit(double_quantization.detect_double_quantization, processed_image_bytes)
-        futures['rambino'] = executor.submit(run_rambino_analysis, processed_image_bytes)
-        futures['watermark'] = executor.submit(watermarking.analyze_watermark, processed_image_bytes)
-        futures['statistical_anomaly'] = executor.submit(statistical_anomaly.analyze_statistical_anomaly, processed_image_bytes)
+    # Same thread budget as the engine's pool, so workers do not oversubscribe the CPUs
+    max_workers, thread_budget = threads.plan_workers()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=threads.apply_thread_budget,
+                             initargs=(thread_budget,)) as executor:
+        # Face detection runs once and is shared with the face-aware detectors, as in engine.run_analysis
+        faces_future = executor.submit(run_task, DETECTOR_TASKS['faces'], detector_input(inputs, 'faces'))
+        # ELA and JPEG ghost share one decode and one set of JPEG re-encodes
+        futures['recompression'] = executor.submit(run_task, DETECTOR_TASKS['recompression'], detector_input(inputs, 'recompression'))
+        futures['cfa'] = executor.submit(run_task, DETECTOR_TASKS['cfa'], detector_input(inputs, 'cfa'))
+        # Only the HOS score is a feature, so its per-band statistics are not computed
+        futures['hos'] = executor.submit(run_task, 'hos:analyze_hos', detector_input(inputs, 'hos'))
+        futures['rambino'] = executor.submit(run_task, DETECTOR_TASKS['rambino'], detector_input(inputs, 'rambino'))
+        futures['jpeg_dimples'] = executor.submit(run_task, DETECTOR_TASKS['jpeg_dimples'], detector_input(inputs, 'jpeg_dimples'))
+        futures['geometric'] = executor.submit(run_task, DETECTOR_TASKS['geometric'], detector_input(inputs, 'geometric'))
+        futures['lighting'] = executor.submit(run_task, DETECTOR_TASKS['lighting'], detector_input(inputs, 'lighting'))
+        futures['reflection_inconsistency'] = executor.submit(run_task, DETECTOR_TASKS['reflection_inconsistency'], detector_input(inputs, 'reflection_inconsistency'))
+        futures['double_quantization'] = executor.submit(run_task, DETECTOR_TASKS['double_quantization'], detector_input(inputs, 'double_quantization'))
+        futures['watermark'] = executor.submit(run_task, DETECTOR_TASKS['watermark'], detector_input(inputs, 'watermark'))
+        futures['statistical_anomaly'] = executor.submit(run_task, DETECTOR_TASKS['statistical_anomaly'], detector_input(inputs, 'statistical_anomaly'))
+
+        try:
+            faces = faces_future.result()
+        except Exception as e:
+            print(f"Error running face detection for feature extraction: {e}")
+            faces = None
+        futures['specialized_detector'] = executor.submit(run_task, DETECTOR_TASKS['specialized_detector'], detector_input(inputs, 'specialized_detector'), faces)
+        futures['deepfake'] = executor.submit(run_task, DETECTOR_TASKS['deepfake'], detector_input(inputs, 'deepfake'), faces)
 
         results = {}
         for name, future in futures.items():
             try:
-                if name == 'rambino':
-                    rambino_result = future.result()
-                    results['rambino'] = rambino_result['score']
+                if name == 'recompression':
+                    recompression_result = future.result()
+                    results['ela'] = recompression_result['ela']
+                    results['jpeg_ghost'] = recompression_result['jpeg_ghost']
+                elif name == 'rambino':
+                    results['rambino'] = future.result()['score']
                 elif name == 'specialized_detector':
                     specialized_result = future.result()
                     results['specialized'] = specialized_result.get('overall_score', 0.0)
@@ -167,6 +124,9 @@ def save_feedback_image_and_label(image_bytes: bytes, true_label: str):
 def load_feedback_data():
     """
     Loads all feedback images, extracts features, and returns them with labels.
+
+    Near-duplicate images within a label (re-encoded or resized copies of one picture)
+    are extracted once.
     """
     all_features = []
     all_labels = []
@@ -176,17 +136,22 @@ def load_feedback_data():
     for label_dir_name in ['real', 'cgi']:
         current_label_path = os.path.join(FEEDBACK_DATASET_DIR, label_dir_name)
         if os.path.exists(current_label_path):
-            for filename in os.listdir(current_label_path):
-                if filename.lower().endswith( ('.png', '.jpg', '.jpeg') ):
-                    image_path = os.path.join(current_label_path, filename)
-                    try:
-                        with open(image_path, "rb") as f:
-                            image_bytes = f.read()
-                        features = extract_features_from_image_bytes(image_bytes)
-                        all_features.append(features.flatten())
-                        all_labels.append(1 if label_dir_name == 'cgi' else 0)
-                    except Exception as e:
-                        print(f"Error processing feedback image {image_path}: {e}")
+            image_paths = [os.path.join(current_label_path, filename) for filename in os.listdir(current_label_path)
+                           if filename.lower().endswith( ('.png', '.jpg', '.jpeg') )]
+            # Users report the same picture repeatedly; keep the newest copy of each (per label)
+            image_paths.sort(key=os.path.getmtime, reverse=True)
+            image_paths, duplicates = deduplicate_files(image_paths)
+            if duplicates:
+                print(f"Skipping {len(duplicates)} near-duplicate feedback images in {current_label_path}")
+            for image_path in image_paths:
+                try:
+                    with open(image_path, "rb") as f:
+                        image_bytes = f.read()
+                    features = extract_features_from_image_bytes(image_bytes)
+                    all_features.append(features.flatten())
+                    all_labels.append(1 if label_dir_name == 'cgi' else 0)
+                except Exception as e:
+                    print(f"Error processing feedback image {image_path}: {e}")
 
     if not all_features:
         return np.array([]), np.array([])
@@ -247,14 +212,28 @@ def retrain_with_feedback():
     else:
         print("No combined features for training. Skipping model update.")
 
-def load_model():
+def load_model(train_if_missing: bool = False):
     """
     Loads the trained ML model from disk into the global _current_ml_model.
-    If no model exists, it triggers an initial training via retrain_with_feedback.
+
+    Args:
+        train_if_missing: If no model is saved, train one from the base training data
+            (and any feedback) first. Training never happens implicitly.
+
+    Raises:
+        ModelUnavailableError: If no model is saved and it may not or cannot be trained.
     """
     global _current_ml_model
     if _current_ml_model is None or not os.path.exists(MODEL_PATH):
         if not os.path.exists(MODEL_PATH):
+            training_data_path = MODEL_PATH.replace('.joblib', '_training_data.joblib')
+            if not train_if_missing:
+                raise ModelUnavailableError(
+                    f"No trained ML model at {MODEL_PATH}. Train one with scripts/train_model.py "
+                    f"or load it with train_if_missing=True.")
+            if not os.path.exists(training_data_path):
+                raise ModelUnavailableError(
+                    f"No trained ML model at {MODEL_PATH} and no base training data at {training_data_path}.")
             print(f"Model not found at {MODEL_PATH}. Performing initial training...")
             retrain_with_feedback() # Perform initial training
         _current_ml_model = joblib.load(MODEL_PATH)
@@ -263,7 +242,10 @@ def load_model():
 
 def get_model():
     """
-    Returns the currently loaded ML model, ensuring it's loaded if not already.
+    Returns the currently loaded ML model, loading it from disk if not already.
+
+    Raises:
+        ModelUnavailableError: If no trained model is saved.
     """
     if _current_ml_model is None:
         load_model()
@@ -273,8 +255,9 @@ def reload_model():
     """
     Forces a reload of the ML model from disk and updates the global _current_ml_model.
     """
-    global _current_ml_model
+    global _current_ml_model, _feature_means
     _current_ml_model = joblib.load(MODEL_PATH)
+    _feature_means = None # The model may have been trained on new data
     print(f"ML model reloaded from {MODEL_PATH}")
     return _current_ml_model
 
@@ -282,6 +265,11 @@ def train_and_save_model(features: np.ndarray, labels: np.ndarray):
     """
     Trains a RandomForestClassifier and saves it and its training data to files.
     """
+    # scikit-learn is only needed for training (joblib unpickles saved models on its own)
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import accuracy_score
+
     print("Training RandomForestClassifier ML model...")
     # Split data for demonstration
     X_train, X_test, y_train, y_test = train_test_split(features, labels, test_size=0.2, random_state=42)
@@ -302,6 +290,58 @@ def train_and_save_model(features: np.ndarray, labels: np.ndarray):
     joblib.dump({'features': features, 'labels': labels}, training_data_path)
     print(f"Training data saved to {training_data_path}")
 
+def feature_means() -> dict:
+    """
+    Mean of every feature over the saved training data, keyed by FEATURE_NAMES.
+
+    Loaded once and cached until the model is reloaded. If the training data cannot be
+    loaded, every feature gets 0.0.
+
+    Raises:
+        ValueError: If the training data does not have one column per FEATURE_NAMES entry,
+            so its columns cannot be matched to features
+    """
+    global _feature_means
+    if _feature_means is None:
+        means = {name: 0.0 for name in FEATURE_NAMES}
+        training_data_path = MODEL_PATH.replace('.joblib', '_training_data.joblib')
+        try:
+            features = np.asarray(joblib.load(training_data_path)['features'], dtype=float)
+        except Exception as e:
+            print(f"Could not load training data for feature imputation: {e}")
+            features = None
+        if features is not None and len(features):
+            if features.ndim != 2 or features.shape[1] != len(FEATURE_NAMES):
+                raise ValueError(f"Training data at {training_data_path} has {features.shape[-1]} feature columns, "
+                                 f"expected {len(FEATURE_NAMES)} ({', '.join(FEATURE_NAMES)}); retrain the model")
+            for name, mean in zip(FEATURE_NAMES, np.nanmean(features, axis=0)):
+                means[name] = 0.0 if np.isnan(mean) else float(mean)
+        _feature_means = means
+    return _feature_means
+
+def impute_features(features: list, skipped) -> list:
+    """
+    Replaces the features of detectors that were not run with their training-set mean.
+
+    A cheaper analysis profile (see profiles.PROFILES) skips some detectors; filling in
+    the mean keeps the one trained model usable for every profile, at the cost of
+    those detectors' evidence.
+
+    Args:
+        features: Feature vector in FEATURE_NAMES order
+        skipped: Names of the features that were not computed
+
+    Returns:
+        A new feature list
+
+    Raises:
+        ValueError: If features are skipped and the training data does not match FEATURE_NAMES
+    """
+    if not skipped:
+        return list(features)
+    means = feature_means()
+    return [means[name] if name in skipped else value for name, value in zip(FEATURE_NAMES, features)]
+
 def predict(model, features: list) -> dict:
     """
     Makes a prediction using the loaded ML model.
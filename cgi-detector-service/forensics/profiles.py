@@ -0,0 +1,80 @@
+"""
+Named analysis profiles, from the full detector suite down to a cheap subset.
+
+Under load the engine steps down to a cheaper profile instead of letting latency climb
+for everyone (see qos.LoadGovernor); clients can also pin a profile. A profile selects
+the engine tasks to run; the ones it runs work at their usual resolution
+(image_io.DETECTOR_RESOLUTIONS), since the one ML model is trained on features computed
+there. The model still receives every feature: those of skipped detectors are imputed
+with their training-set mean (ml_predictor.impute_features).
+
+Measured per-image detector cost at the default budget on this service's test photos:
+geometric ~2.1 s, RAMBiNo ~165 ms, specialized ~110 ms, recompression (ELA + JPEG ghost)
+and lighting ~45 ms each, HOS ~15 ms, everything else under 15 ms.
+"""
+
+ALL_DETECTORS = (
+    'faces', 'recompression', 'hos', 'rambino', 'cfa', 'jpeg_dimples', 'geometric', 'lighting',
+    'reflection_inconsistency', 'double_quantization', 'watermark', 'statistical_anomaly',
+    'specialized_detector', 'deepfake',
+)
+
+PROFILES = {
+    # Every detector
+    'thorough': {
+        'detectors': ALL_DETECTORS,
+    },
+    # Everything but 3D geometric consistency, which costs about 80% of a full analysis
+    'balanced': {
+        'detectors': tuple(name for name in ALL_DETECTORS if name != 'geometric'),
+    },
+    # Only the cheap detectors
+    'fast': {
+        'detectors': ('faces', 'recompression', 'cfa', 'jpeg_dimples', 'lighting', 'reflection_inconsistency',
+                      'double_quantization', 'watermark', 'statistical_anomaly', 'deepfake'),
+    },
+}
+
+# From most to least thorough; the order the engine steps down in under load
+PROFILE_ORDER = ('thorough', 'balanced', 'fast')
+DEFAULT_PROFILE = 'thorough'
+
+# Engine task that produces each ML feature
+FEATURE_DETECTORS = {
+    'ela': 'recompression',
+    'jpeg_ghost': 'recompression',
+    'specialized': 'specialized_detector',
+}
+
+
+def get_profile(name: str) -> dict:
+    """
+    Returns a profile's definition.
+
+    Raises:
+        ValueError: If there is no profile of that name
+    """
+    if name not in PROFILES:
+        raise ValueError(f"Unknown analysis profile '{name}'; expected one of {', '.join(PROFILE_ORDER)}")
+    return PROFILES[name]
+
+
+def skipped_features(name: str, feature_names, tiled: bool = False) -> set:
+    """
+    ML features a profile does not compute.
+
+    Args:
+        name: Profile name
+        feature_names: Feature names to check (ml_predictor.FEATURE_NAMES)
+        tiled: Tiled mode computes the tile detectors' features regardless of the profile
+    """
+    from .tiling import TILE_DETECTORS
+    detectors = get_profile(name)['detectors']
+    return {feature for feature in feature_names
+            if FEATURE_DETECTORS.get(feature, feature) not in detectors
+            and not (tiled and feature in TILE_DETECTORS)}
+
+
+def covers(name: str, requested: str) -> bool:
+    """Whether a result of one profile is at least as thorough as another profile."""
+    return PROFILE_ORDER.index(name) <= PROFILE_ORDER.index(requested)
@@ -0,0 +1,170 @@
+"""
+Quality-of-service degradation under load.
+
+LoadGovernor picks the analysis profile (see profiles.PROFILES) for requests that do not
+pin one. It watches the number of analyses in flight in this process and the 95th
+percentile latency of recent analyses, steps down to the next cheaper profile when
+either crosses its limit, and steps back up once both have been well below their limits
+for a while:
+
+- Step down when more than max_in_flight analyses are running, or when the p95 of the
+  recent latencies exceeds max_p95_seconds. At most once per step_down_seconds, so the
+  cheaper profile gets a chance to drain the queue first.
+- Step up when at most half of max_in_flight analyses are running and the p95 is below
+  recover_ratio * max_p95_seconds (or too few recent analyses to tell), after
+  step_up_seconds at the current level. The gap between the two thresholds keeps the
+  governor from flapping between levels.
+
+Latencies are only sampled at the current level (the window is cleared on a change),
+so a slow thorough run does not keep the service degraded after it stepped down.
+
+limit() keeps the governor from stepping below a profile, e.g. while the cheaper
+profiles cannot be scored.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from .profiles import PROFILE_ORDER
+
+
+class LoadGovernor:
+    """
+    Thread-safe load tracker that selects the analysis profile for new requests.
+
+    Args:
+        profiles: Profile names from most to least thorough
+        max_in_flight: Analyses in flight above which the governor steps down
+        max_p95_seconds: p95 latency above which the governor steps down
+        recover_ratio: Fraction of max_p95_seconds the p95 must fall below to step up
+        window: Most recent latencies kept for the p95
+        window_seconds: Latencies older than this are dropped from the p95
+        min_samples: Latencies needed before the p95 is used
+        step_down_seconds: Minimum time between two step-downs
+        step_up_seconds: Minimum time at a level before stepping up
+        clock: Monotonic time source (replaceable in tests)
+    """
+
+    def __init__(self, profiles=PROFILE_ORDER, max_in_flight: int = 4, max_p95_seconds: float = 10.0,
+                 recover_ratio: float = 0.6, window: int = 50, window_seconds: float = 120.0, min_samples: int = 5,
+                 step_down_seconds: float = 5.0, step_up_seconds: float = 30.0, clock=time.monotonic):
+        self.profiles = tuple(profiles)
+        self.max_in_flight = max_in_flight
+        self.max_p95_seconds = max_p95_seconds
+        self.recover_ratio = recover_ratio
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.step_down_seconds = step_down_seconds
+        self.step_up_seconds = step_up_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._level = 0 # Index into profiles
+        self._lowest = len(self.profiles) - 1 # Index of the cheapest profile it may step down to
+        self._changed = clock()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=window) # (finished, seconds)
+        self.step_downs = 0
+        self.step_ups = 0
+
+    def current_profile(self) -> str:
+        """Profile for a new request that does not pin one."""
+        with self._lock:
+            self._evaluate()
+            return self.profiles[self._level]
+
+    def limit(self, lowest: str = None):
+        """
+        Keeps the governor at or above a profile, stepping up to it right away if needed.
+
+        Args:
+            lowest: Cheapest profile to step down to, or None to allow all of them
+        """
+        with self._lock:
+            self._lowest = len(self.profiles) - 1 if lowest is None else self.profiles.index(lowest)
+            if self._level > self._lowest:
+                self._change(self._lowest, self._clock(), f"limited to '{lowest}'")
+
+    @contextmanager
+    def track(self, profile: str = None):
+        """
+        Counts an analysis as in flight while the block runs and records its latency.
+
+        Args:
+            profile: Profile the analysis runs at; its latency is only sampled if that is
+                the current level (pinned requests at another level still count as load)
+        """
+        with self._lock:
+            self._in_flight += 1
+            self._evaluate()
+        start = self._clock()
+        try:
+            yield
+        finally:
+            now = self._clock()
+            with self._lock:
+                self._in_flight -= 1
+                if profile is None or profile == self.profiles[self._level]:
+                    self._latencies.append((now, now - start))
+                self._evaluate()
+
+    def status(self) -> dict:
+        """
+        Current state, for health endpoints.
+
+        Returns:
+            Dictionary with 'profile', 'lowest_profile' (see limit()), 'in_flight',
+            'p95_seconds' (None until enough analyses finished), 'samples',
+            'seconds_at_level', 'step_downs' and 'step_ups'
+        """
+        with self._lock:
+            self._evaluate()
+            p95 = self._p95()
+            return {
+                'profile': self.profiles[self._level],
+                'lowest_profile': self.profiles[self._lowest],
+                'in_flight': self._in_flight,
+                'p95_seconds': None if p95 is None else round(p95, 3),
+                'samples': len(self._latencies),
+                'seconds_at_level': round(self._clock() - self._changed, 3),
+                'step_downs': self.step_downs,
+                'step_ups': self.step_ups,
+            }
+
+    def _p95(self):
+        """p95 of the recent latencies, or None if there are fewer than min_samples."""
+        cutoff = self._clock() - self.window_seconds
+        while self._latencies and self._latencies[0][0] < cutoff:
+            self._latencies.popleft()
+        if len(self._latencies) < self.min_samples:
+            return None
+        return float(np.percentile([seconds for _, seconds in self._latencies], 95))
+
+    def _evaluate(self):
+        """Steps the level down or up if the thresholds call for it; the lock must be held."""
+        now = self._clock()
+        at_level = now - self._changed
+        p95 = self._p95()
+        overloaded = self._in_flight > self.max_in_flight or (p95 is not None and p95 > self.max_p95_seconds)
+        if overloaded:
+            if self._level < self._lowest and at_level >= self.step_down_seconds:
+                self._change(self._level + 1, now, f"{self._in_flight} in flight, p95 {p95}")
+            return
+        relaxed = (self._in_flight <= self.max_in_flight // 2
+                   and (p95 is None or p95 < self.recover_ratio * self.max_p95_seconds))
+        if relaxed and self._level > 0 and at_level >= self.step_up_seconds:
+            self._change(self._level - 1, now, f"{self._in_flight} in flight, p95 {p95}")
+
+    def _change(self, level: int, now: float, reason: str):
+        direction = 'down' if level > self._level else 'up'
+        if direction == 'down':
+            self.step_downs += 1
+        else:
+            self.step_ups += 1
+        print(f"QoS: stepping {direction} from '{self.profiles[self._level]}' to '{self.profiles[level]}' ({reason})")
+        self._level = level
+        self._changed = now
+        self._latencies.clear()
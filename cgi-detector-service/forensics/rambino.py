@@ -3,18 +3,20 @@ RAMBiNo-inspired forensic features for noise and texture analysis.
 
 Improvements/tuning added:
 - Adaptive histogram clipping based on subband standard deviation
-- Patch sampling for large images to bound compute
+- Patch sampling for large images to bound compute (patches decomposed as one batch)
 - Additional summary stats (entropy)
 - Parameterizable bins, range_scale, patch_size, max_patches
 """
 from typing import List, Dict, Optional
+from functools import lru_cache
 import io
 import numpy as np
 from PIL import Image
-import pywt
 from scipy.stats import skew, kurtosis
 from scipy.stats import entropy as _entropy
 
+from .wavelets import WaveletCache
+
 
 def _load_gray(image) -> np.ndarray:
     """Load an image (path, bytes, or ndarray) and return a normalized float32 gray image."""
@@ -41,122 +43,151 @@ def _load_gray(image) -> np.ndarray:
     return arr
 
 
-def _wavelet_details(gray: np.ndarray, wavelet: str = "db2", level: int = 2):
-    """Return detail coefficients list: [(cH,cV,cD), ...] from deepest to shallowest."""
-    coeffs = pywt.wavedec2(gray, wavelet=wavelet, level=level)
-    return coeffs[1:]
+def _shifted(subband: np.ndarray, dx: int, dy: int) -> np.ndarray:
+    """Shift a subband (or stack of subbands) by (dx, dy), zero-filling instead of wrapping."""
+    b = np.roll(subband, shift=-dy, axis=-2) if dy != 0 else subband.copy()
+    b = np.roll(b, shift=-dx, axis=-1) if dx != 0 else b
+    if dy != 0:
+        if dy > 0:
+            b[..., -dy:, :] = 0
+        else:
+            b[..., : -dy, :] = 0
+    if dx != 0:
+        if dx > 0:
+            b[..., :, -dx:] = 0
+        else:
+            b[..., :, : -dx] = 0
+    return b
 
 
 def _bivariate_hist(a: np.ndarray, b: np.ndarray, bins: int = 48, range_val: float = 0.05) -> np.ndarray:
-    """Compute a normalized 2D histogram of paired coefficients."""
-    min_shape = (min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1]))
-    a = a[:min_shape[0], :min_shape[1]].ravel()
-    b = b[:min_shape[0], :min_shape[1]].ravel()
-    a = np.clip(a, -range_val, range_val)
-    b = np.clip(b, -range_val, range_val)
-    H, _, _ = np.histogram2d(a, b, bins=bins,
-                             range=[[-range_val, range_val], [-range_val, range_val]], density=True)
-    return H
-
-
-def _feature_from_hist(H: np.ndarray) -> np.ndarray:
-    """Summarize a 2D histogram into moments + radial + angular profiles."""
-    flat = H.ravel()
-    m_mean = float(flat.mean())
-    m_var = float(flat.var())
-    # scipy skew/kurtosis can produce nan for flat arrays; guard
-    m_skew = float(skew(flat)) if flat.size > 0 else 0.0
-    m_kurt = float(kurtosis(flat)) if flat.size > 0 else 0.0
+    """Compute normalized 2D histograms of paired coefficients.
 
-    bins = H.shape[0]
+    ``a`` and ``b`` are (N, H, W) stacks; one (bins, bins) density histogram is returned per
+    leading index, i.e. an array of shape (N, bins, bins). Binning follows ``np.histogram2d``
+    exactly: pairs falling outside ``[-range_val, range_val]`` after clipping are dropped.
+    """
+    n = a.shape[0]
+    edges = np.linspace(-range_val, range_val, bins + 1)
+
+    def _bin_index(values):
+        values = np.clip(values, -range_val, range_val)
+        index = np.searchsorted(edges, values, side="right") - 1
+        # The closing edge belongs to the last bin, as in np.histogram2d
+        index[values == edges[-1]] -= 1
+        return index
+
+    ia = _bin_index(a)
+    ib = _bin_index(b)
+    valid = (ia >= 0) & (ia < bins) & (ib >= 0) & (ib < bins)
+
+    patch_index = np.broadcast_to(np.arange(n, dtype=np.intp).reshape((n,) + (1,) * (a.ndim - 1)), a.shape)
+    flat = (patch_index[valid] * bins + ia[valid]) * bins + ib[valid]
+    counts = np.bincount(flat, minlength=n * bins * bins).reshape(n, bins, bins).astype(np.float64)
+    totals = counts.sum(axis=(1, 2), keepdims=True)
+    bin_area = (2.0 * range_val / bins) ** 2
+    return np.divide(counts, totals * bin_area, out=np.full_like(counts, np.nan), where=totals > 0)
+
+
+@lru_cache(maxsize=8)
+def _profile_masks(bins: int):
+    """Radial (5 rings) and angular (8 sectors) membership masks for a bins x bins histogram."""
     coords = np.linspace(-1, 1, bins)
     xv, yv = np.meshgrid(coords, coords, indexing="xy")
     rad = np.sqrt(xv**2 + yv**2)
-
     radial_edges = np.linspace(0.0, rad.max(), 6)
-    radial_profile = []
-    for i in range(len(radial_edges) - 1):
-        mask = (rad >= radial_edges[i]) & (rad < radial_edges[i + 1])
-        radial_profile.append(float(H[mask].mean()) if np.any(mask) else 0.0)
+    masks = [(rad >= radial_edges[i]) & (rad < radial_edges[i + 1]) for i in range(len(radial_edges) - 1)]
 
     angles = np.arctan2(yv, xv)
-    angular_profile = []
     sectors = 8
     edges = np.linspace(-np.pi, np.pi, sectors + 1)
-    for i in range(sectors):
-        mask = (angles >= edges[i]) & (angles < edges[i + 1])
-        angular_profile.append(float(H[mask].mean()) if np.any(mask) else 0.0)
+    masks += [(angles >= edges[i]) & (angles < edges[i + 1]) for i in range(sectors)]
+
+    masks = np.stack([m.ravel() for m in masks]).astype(np.float64)
+    return masks, masks.sum(axis=1)
+
 
-    return np.asarray([m_mean, m_var, m_skew, m_kurt] + radial_profile + angular_profile, dtype=np.float32)
+def _feature_from_hist(H: np.ndarray) -> np.ndarray:
+    """Summarize (N, bins, bins) 2D histograms into moments + radial + angular profiles.
+
+    Returns an (N, 17) float32 array: mean, var, skew, kurtosis, 5 radial and 8 angular means.
+    """
+    flat = H.reshape(H.shape[0], -1)
+    m_mean = flat.mean(axis=1)
+    m_var = flat.var(axis=1)
+    # scipy skew/kurtosis can produce nan for flat arrays; guard
+    m_skew = skew(flat, axis=1) if flat.shape[1] > 0 else np.zeros(flat.shape[0])
+    m_kurt = kurtosis(flat, axis=1) if flat.shape[1] > 0 else np.zeros(flat.shape[0])
+
+    masks, mask_sizes = _profile_masks(H.shape[-1])
+    profiles = np.divide(flat @ masks.T, mask_sizes, out=np.zeros((flat.shape[0], masks.shape[0])),
+                         where=mask_sizes > 0)
+
+    return np.column_stack([m_mean, m_var, m_skew, m_kurt, profiles]).astype(np.float32)
+
+
+def _subband_features(details, bins: int, range_scale: float) -> List[np.ndarray]:
+    """Bivariate-histogram features for every (level, subband, offset) of a batched decomposition."""
+    offsets = [(0, 1), (1, 0), (1, 1), (1, -1)]
+    features: List[np.ndarray] = []
+    for (cH, cV, cD) in details:
+        for subband in (cH, cV, cD):
+            for dx, dy in offsets:
+                H = _bivariate_hist(subband, _shifted(subband, dx, dy), bins=bins, range_val=range_scale)
+                features.append(_feature_from_hist(H))
+    return features
 
 
 def compute_rambino_features(image, wavelet: str = "db2", level: int = 2, bins: int = 48,
-                             range_scale: float = 0.05, patch_size: int = 256, max_patches: int = 10) -> np.ndarray:
+                             range_scale: float = 0.05, patch_size: int = 256, max_patches: int = 10,
+                             wavelets: Optional[WaveletCache] = None) -> np.ndarray:
     """Compute RAMBiNo-inspired features from an image input (bytes/path/ndarray).
 
+    Large images are summarized from up to ``max_patches`` randomly placed patches, which
+    are gathered into a single (N, patch_size, patch_size) stack and decomposed together.
+    Patch placement uses a local generator seeded with 77, so results are deterministic
+    without touching the global ``np.random`` state.
+
+    When a ``WaveletCache`` is given, ``image`` is ignored: the cached gray image is used and
+    decompositions are requested from (and shared through) the cache.
+
     Returns a 1D float32 numpy array.
     """
-    np.random.seed(77) # Ensure deterministic patch sampling ##
-    gray = _load_gray(image)
-    details = _wavelet_details(gray, wavelet=wavelet, level=level)
-    offsets = [(0, 1), (1, 0), (1, 1), (1, -1)]
-    features: List[np.ndarray] = []
+    rng = np.random.default_rng(77)  # Ensure deterministic patch sampling
+    if wavelets is None:
+        wavelets = WaveletCache(_load_gray(image))
+    gray = wavelets.gray
 
     h, w = gray.shape
     # Patch sampling for large images
-    if h * w > patch_size ** 2:
-        for _ in range(max_patches):
-            y = np.random.randint(0, h - patch_size)
-            x = np.random.randint(0, w - patch_size)
-            gray_patch = gray[y:y + patch_size, x:x + patch_size]
-            details = _wavelet_details(gray_patch, wavelet=wavelet, level=level)
-            for (cH, cV, cD) in details:
-                for subband in (cH, cV, cD):
-                    for dx, dy in offsets:
-                        a = subband
-                        b = np.roll(subband, shift=-dy, axis=0) if dy != 0 else subband.copy()
-                        b = np.roll(b, shift=-dx, axis=1) if dx != 0 else b
-                        if dy != 0:
-                            if dy > 0:
-                                b[-dy:, :] = 0
-                            else:
-                                b[: -dy, :] = 0
-                        if dx != 0:
-                            if dx > 0:
-                                b[:, -dx:] = 0
-                            else:
-                                b[:, : -dx] = 0
-                        H = _bivariate_hist(a, b, bins=bins, range_val=range_scale)
-                        feat = _feature_from_hist(H)
-                        features.append(feat)
+    if h * w > patch_size ** 2 and h > patch_size and w > patch_size:
+        ys = rng.integers(0, h - patch_size, size=max_patches)
+        xs = rng.integers(0, w - patch_size, size=max_patches)
+        region = tuple((int(y), int(x), patch_size, patch_size) for y, x in zip(ys, xs))
+        details = wavelets.decomposition(wavelet, level, region=region)[1:]
+        features = _subband_features(details, bins=bins, range_scale=range_scale)
         # Return mean feature vector from patches
         if features:
-            return np.mean(np.asarray(features), axis=0).astype(np.float32)
+            return np.concatenate(features).mean(axis=0).astype(np.float32)
 
     # Original computation for small images or if no patching is desired
-    for (cH, cV, cD) in details:
-        for subband in (cH, cV, cD):
-            for dx, dy in offsets:
-                a = subband
-                b = np.roll(subband, shift=-dy, axis=0) if dy != 0 else subband.copy()
-                b = np.roll(b, shift=-dx, axis=1) if dx != 0 else b
-                if dy != 0:
-                    if dy > 0:
-                        b[-dy:, :] = 0
-                    else:
-                        b[: -dy, :] = 0
-                if dx != 0:
-                    if dx > 0:
-                        b[:, -dx:] = 0
-                    else:
-                        b[:, : -dx] = 0
-                H = _bivariate_hist(a, b, bins=bins, range_val=range_scale)
-                feat = _feature_from_hist(H)
-                features.append(feat)
+    details = [tuple(band[np.newaxis] for band in bands)
+               for bands in wavelets.decomposition(wavelet, level)[1:]]
+    features = _subband_features(details, bins=bins, range_scale=range_scale)
 
     if not features:
         return np.zeros(16, dtype=np.float32)
-    return np.concatenate(features).astype(np.float32)
+    return np.concatenate(features).ravel().astype(np.float32)
+
+
+def summarize_rambino_features(feats: np.ndarray) -> Dict[str, float]:
+    """Reduce a RAMBiNo feature vector to the named summary values used as scores."""
+    return {
+        "rambino_feature_mean_noise": float(np.mean(feats)),
+        "rambino_feature_std": float(np.std(feats)),
+        "rambino_feature_length": int(feats.size),
+        "rambino_feature_entropy": float(_entropy(feats))
+    }
 
 
 def analyze_rambino_features(image_array: np.ndarray) -> Dict[str, float]:
@@ -168,11 +199,36 @@ def analyze_rambino_features(image_array: np.ndarray) -> Dict[str, float]:
     try:
         feats = compute_rambino_features(image_array)
         # Simple aggregations as example scores
-        return {
-            "rambino_feature_mean_noise": float(np.mean(feats)),
-            "rambino_feature_std": float(np.std(feats)),
-            "rambino_feature_length": int(feats.size),
-            "rambino_feature_entropy": float(_entropy(feats))
-        }
+        return summarize_rambino_features(feats)
     except Exception as e:
         return {"error": str(e)}
+
+
+def run_rambino_analysis(image_bytes_for_rambino, wavelets: Optional[WaveletCache] = None) -> Dict:
+    """Engine task: the RAMBiNo score (scaled to [0, 1]), its raw value and the first 128 features."""
+    if wavelets is None:
+        try:
+            wavelets = WaveletCache.from_bytes(image_bytes_for_rambino)  # Grayscale
+        except Exception:
+            return {'score': 0.0, 'features': None, 'raw_score': 0.0}
+    image_data = wavelets.gray
+
+    rambino_score = 0.0
+    rambino_features_list = None
+    try:
+        if image_data is not None:
+            # Compute the features once; both the summary score and the returned
+            # feature list are derived from the same vector.
+            raw_feats = compute_rambino_features(image_data, wavelets=wavelets)
+            rambino_result = summarize_rambino_features(raw_feats)
+            max_return = 128
+            rambino_features_list = raw_feats.flatten()[:max_return].astype(float).tolist()
+            rambino_score = float(rambino_result.get("rambino_feature_mean_noise", 0.0))
+    except Exception:
+        rambino_score = 0.0
+        rambino_features_list = None
+
+    rambino_raw_score = rambino_score
+    scale = 30000.0
+    rambino_score = float(np.clip(rambino_raw_score / scale, 0.0, 1.0))
+    return {'score': rambino_score, 'features': rambino_features_list, 'raw_score': rambino_raw_score}
@@ -0,0 +1,108 @@
+"""
+Per-image JPEG recompression service shared by the recompression-based detectors.
+
+ELA and JPEG ghost both compare an image against JPEG re-encodes of itself. A
+RecompressionCache decodes the source image once and encodes it in RGB at most once per
+quality. ELA reads the RGB decode of an encode; JPEG ghost reads its grayscale view,
+which libjpeg decodes straight from the luma plane (the plane a grayscale encode would
+have produced), so a quality both detectors use is encoded only once.
+"""
+
+import io
+import numpy as np
+from PIL import Image
+
+
+class RecompressionCache:
+    """
+    Memoizes JPEG re-encodes of a single image.
+
+    Args:
+        image: Source PIL image; it is converted to RGB once on construction.
+    """
+
+    def __init__(self, image: Image.Image):
+        rgb = image.convert('RGB')
+        self._images = {'RGB': rgb}
+        self._arrays = {}
+        self._encoded = {}
+        self._recompressed = {}
+
+    @classmethod
+    def from_bytes(cls, image_bytes: bytes) -> 'RecompressionCache':
+        """Decodes image bytes once and wraps the result in a cache."""
+        return cls(Image.open(io.BytesIO(image_bytes)))
+
+    @property
+    def size(self):
+        """(width, height) of the source image."""
+        return self._images['RGB'].size
+
+    def image(self, mode: str = 'RGB') -> Image.Image:
+        """Returns the source image in the given PIL mode, converting at most once."""
+        if mode not in self._images:
+            self._images[mode] = self._images['RGB'].convert(mode)
+        return self._images[mode]
+
+    def array(self, mode: str = 'RGB') -> np.ndarray:
+        """Returns the source image in the given mode as a read-only uint8 array."""
+        if mode not in self._arrays:
+            values = np.asarray(self.image(mode), dtype=np.uint8)
+            values.flags.writeable = False
+            self._arrays[mode] = values
+        return self._arrays[mode]
+
+    def encoded(self, quality: int) -> bytes:
+        """Returns the RGB image encoded as JPEG at the given quality, encoding at most once."""
+        quality = int(quality)
+        if quality not in self._encoded:
+            buffer = io.BytesIO()
+            self.image('RGB').save(buffer, format='JPEG', quality=quality)
+            self._encoded[quality] = buffer.getvalue()
+        return self._encoded[quality]
+
+    def recompressed(self, quality: int, mode: str = 'RGB') -> np.ndarray:
+        """
+        Returns the image re-encoded as JPEG at the given quality and decoded again.
+
+        Args:
+            quality: JPEG quality passed to PIL.
+            mode: PIL mode the encode is decoded to, e.g. 'RGB' or 'L'. Every mode is a
+                view of the same RGB encode; 'L' is decoded from its luma plane only.
+
+        Returns:
+            A read-only uint8 array in the given mode, shared between callers.
+        """
+        key = (int(quality), mode)
+        if key not in self._recompressed:
+            decoded = Image.open(io.BytesIO(self.encoded(quality)))
+            if mode == 'L':
+                decoded.draft('L', decoded.size) # Skip chroma upsampling and color conversion
+            decoded = decoded.convert(mode)
+            if decoded.size != self.size:
+                decoded = decoded.resize(self.size, Image.Resampling.LANCZOS)
+            values = np.asarray(decoded, dtype=np.uint8)
+            values.flags.writeable = False
+            self._recompressed[key] = values
+        return self._recompressed[key]
+
+    @property
+    def encode_count(self) -> int:
+        """Number of distinct JPEG encodes performed so far."""
+        return len(self._encoded)
+
+
+def run_recompression_analysis(image_bytes: bytes):
+    """
+    Runs ELA and JPEG ghost on one shared RecompressionCache, so the image is decoded
+    once and every quality both detectors use is encoded once.
+    """
+    from . import ela, jpeg_ghost # Imported here: both detectors import this module
+    try:
+        cache = RecompressionCache.from_bytes(image_bytes)
+    except Exception:
+        return {'ela': 0.0, 'jpeg_ghost': 0.0}
+    return {
+        'ela': ela.analyze_ela(image_bytes, cache=cache),
+        'jpeg_ghost': jpeg_ghost.analyze_jpeg_ghost(image_bytes, cache=cache),
+    }
@@ -0,0 +1,220 @@
+"""
+Single-flight coalescing of identical concurrent computations.
+
+When the same image is uploaded many times within seconds, every upload would run a
+full analysis. SingleFlight runs one computation per key at a time and hands its result
+to every caller that asks for the same key while it is running:
+
+- Within a process, later callers wait on the running computation's Future.
+- Across processes (uvicorn workers), the process that computes holds a lease file
+  "<key>.lease" in a shared local directory, created atomically with O_EXCL. Other
+  processes wait for the matching "<key>.result" file instead of computing. A lease
+  whose process has died, or that is older than lease_timeout, is taken over.
+
+Only in-flight work is shared: a request that arrives after the computation finished
+starts a new one. Results crossing processes are passed as JSON, so they must be
+JSON-serializable (numpy scalars and arrays are converted).
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def content_key(data: bytes, **options) -> str:
+    """
+    Key for a computation on the given bytes: the SHA-256 of the content, combined with
+    any options that change the result.
+    """
+    digest = hashlib.sha256(data)
+    if options:
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _to_builtin(value):
+    """json.dumps fallback for numpy values."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one computation.
+
+    Args:
+        lease_dir: Local directory for lease and result files shared by the processes
+            that should coalesce; None coalesces within this process only.
+        lease_timeout: Seconds after which a lease is considered abandoned (and the
+            longest a caller waits on another process).
+        poll_interval: Seconds between checks while waiting on another process.
+        result_ttl: Seconds finished result files are kept for slow waiters before
+            they are removed.
+    """
+
+    def __init__(self, lease_dir: str = None, lease_timeout: float = 600.0, poll_interval: float = 0.05,
+                 result_ttl: float = 60.0):
+        self.lease_dir = lease_dir
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.computed = 0 # Computations run by this process
+        self.coalesced = 0 # Calls answered by another caller's computation
+
+    def run(self, key: str, fn, *args, **kwargs):
+        """
+        Returns fn(*args, **kwargs), sharing one computation with concurrent callers of the same key.
+
+        Every caller gets its own copy of the result, so callers may modify it. If the
+        computation raises, every caller waiting on it raises too.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            if self.lease_dir:
+                result = self._run_shared(key, fn, args, kwargs)
+            else:
+                self._count('computed')
+                result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return copy.deepcopy(result)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _paths(self, key: str):
+        return os.path.join(self.lease_dir, f"{key}.lease"), os.path.join(self.lease_dir, f"{key}.result")
+
+    def _acquire(self, lease_path: str):
+        """Creates the lease file if no other process holds it; returns its token or None."""
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, 'w') as lease:
+            json.dump({'token': token, 'pid': os.getpid(), 'started': time.time()}, lease)
+        return token
+
+    @staticmethod
+    def _read_json(path: str):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None # Missing, or still being written by its owner
+
+    def _is_stale(self, lease: dict) -> bool:
+        if time.time() - lease.get('started', 0) > self.lease_timeout:
+            return True
+        try:
+            os.kill(lease['pid'], 0)
+        except ProcessLookupError:
+            return True # The owner died without releasing its lease
+        except (PermissionError, KeyError, TypeError, OSError):
+            pass
+        return False
+
+    def _run_shared(self, key: str, fn, args, kwargs):
+        """Computes under the key's lease, or waits for the process that holds it."""
+        os.makedirs(self.lease_dir, exist_ok=True)
+        lease_path, result_path = self._paths(key)
+        followed = None # Token of the lease this process is waiting on
+        deadline = time.monotonic() + self.lease_timeout
+        while True:
+            lease = self._read_json(lease_path)
+            if lease is not None:
+                followed = lease.get('token')
+            # The result is checked before the lease is tried: the computation being waited
+            # on may have finished (and released its lease) since the last poll
+            result = self._read_json(result_path)
+            if result is not None and followed is not None and result.get('token') == followed:
+                self._count('coalesced')
+                if 'error' in result:
+                    raise RuntimeError(f"Coalesced computation failed: {result['error']}")
+                return result['result']
+            if lease is None:
+                token = self._acquire(lease_path)
+                if token is not None:
+                    return self._lead(token, lease_path, result_path, fn, args, kwargs)
+            elif self._is_stale(lease):
+                print(f"Taking over abandoned single-flight lease {lease_path}")
+                if self._read_json(lease_path) == lease:
+                    self._remove(lease_path)
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for the computation holding {lease_path}")
+            time.sleep(self.poll_interval)
+
+    def _lead(self, token: str, lease_path: str, result_path: str, fn, args, kwargs):
+        """Runs the computation under a held lease and publishes its result to waiting processes."""
+        self._count('computed')
+        try:
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._publish(result_path, {'token': token, 'error': str(e)})
+                raise
+            self._publish(result_path, {'token': token, 'result': result})
+            return result
+        finally:
+            self._remove(lease_path)
+            self._expire_results()
+
+    def _publish(self, result_path: str, outcome: dict):
+        """Writes the result file atomically, so waiters never read a partial file."""
+        temp_path = f"{result_path}.{outcome['token']}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(outcome, f, default=_to_builtin)
+            os.replace(temp_path, result_path)
+        except (OSError, TypeError, ValueError) as e:
+            # Waiting processes see the lease disappear and compute for themselves
+            print(f"Error publishing single-flight result {result_path}: {e}")
+            self._remove(temp_path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _expire_results(self):
+        """Removes result files older than result_ttl."""
+        cutoff = time.time() - self.result_ttl
+        try:
+            with os.scandir(self.lease_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.result') and entry.stat().st_mtime < cutoff:
+                        self._remove(entry.path)
+        except OSError:
+            pass
@@ -11,21 +11,50 @@ Based on research into generative model fingerprints and CGI rendering artifacts
 import numpy as np
 from PIL import Image
 from io import BytesIO
-from scipy import ndimage, fft, signal
+from functools import lru_cache
+from scipy import ndimage, fft
 from scipy.stats import kurtosis, skew
-from skimage import filters, feature, color
-from skimage.util import img_as_float
+from skimage import filters, feature
 import warnings
 
+from .spectrum import compute_spectrum, get_default_workers
+from .color_stats import saturation_statistics
+
 warnings.filterwarnings('ignore')
 
+# Numeric policy: every detector below works on FLOAT_DTYPE arrays. The filter chain
+# (Gaussian, Laplacian, Sobel, Gabor, local statistics) is bound by memory bandwidth, so
+# float32 roughly halves its cost while scores stay within a small tolerance of float64.
+FLOAT_DTYPE = np.float32
+
+
+def _to_gray(img_array: np.ndarray) -> np.ndarray:
+    """Averages the RGB channels into a FLOAT_DTYPE grayscale image."""
+    return np.mean(img_array, axis=2, dtype=FLOAT_DTYPE)
+
 
-def analyze_specialized_cgi_types(image_bytes: bytes) -> dict:
+def _local_std(image: np.ndarray, size: int) -> np.ndarray:
+    """
+    Local standard deviation over a size x size window.
+
+    Equivalent to ndimage.generic_filter(image, np.std, size=size) (same window placement
+    and 'reflect' borders) but built from two uniform filters, sqrt(E[x^2] - E[x]^2),
+    instead of a Python callback per pixel.
+    """
+    mean = ndimage.uniform_filter(image, size=size)
+    mean_sq = ndimage.uniform_filter(image * image, size=size)
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0))
+
+
+def analyze_specialized_cgi_types(image_bytes: bytes, faces: dict = None) -> dict:
     """
     Runs all specialized CGI type detectors and returns detailed results.
 
     Args:
         image_bytes: Raw image bytes
+        faces: Optional face detection result from deepfake_detector.detect_faces. When
+               given, face-specific analysis runs on the detected face region and is
+               skipped entirely for images without faces.
 
     Returns:
         Dictionary containing:
@@ -47,7 +76,7 @@ def analyze_specialized_cgi_types(image_bytes: bytes) -> dict:
         # Run all specialized detectors
         gan_score = _detect_gan_fingerprints(img_array)
         diffusion_score = _detect_diffusion_artifacts(img_array)
-        face_synthesis_score = _detect_face_synthesis(img_array)
+        face_synthesis_score = _detect_face_synthesis(img_array, faces)
         render_3d_score = _detect_3d_rendering(img_array)
 
         # Weight the different detectors
@@ -115,7 +144,7 @@ def _detect_gan_fingerprints(img_array: np.ndarray) -> float:
     """
     try:
         # Convert to grayscale for frequency analysis
-        gray = np.mean(img_array, axis=2).astype(float)
+        gray = _to_gray(img_array)
 
         # 1. Check for checkerboard artifacts (common in GANs with upsampling)
         checkerboard_score = _detect_checkerboard_pattern(gray)
@@ -144,12 +173,10 @@ def _detect_gan_fingerprints(img_array: np.ndarray) -> float:
 def _detect_checkerboard_pattern(gray_image: np.ndarray) -> float:
     """Detects checkerboard artifacts from upsampling in GANs."""
     try:
-        # Create checkerboard detection kernels
-        kernel_size = 4
-        checkerboard_kernel = np.array([[1, -1], [-1, 1]])
-
-        # Convolve with checkerboard kernel
-        response = signal.correlate2d(gray_image, checkerboard_kernel, mode='valid')
+        # Correlate with the 2x2 checkerboard kernel [[1, -1], [-1, 1]] ('valid' mode)
+        # as four shifted slices
+        response = (gray_image[:-1, :-1] - gray_image[:-1, 1:]
+                    - gray_image[1:, :-1] + gray_image[1:, 1:])
 
         # Calculate strength of checkerboard pattern
         pattern_strength = np.abs(response).mean()
@@ -167,25 +194,8 @@ def _detect_checkerboard_pattern(gray_image: np.ndarray) -> float:
 def _analyze_gan_spectral_signature(gray_image: np.ndarray) -> float:
     """Analyzes frequency spectrum for GAN-specific patterns."""
     try:
-        # Compute 2D FFT
-        f_transform = fft.fft2(gray_image)
-        f_shift = fft.fftshift(f_transform)
-        magnitude_spectrum = np.abs(f_shift)
-
-        # Analyze radial frequency distribution
-        center = np.array(magnitude_spectrum.shape) // 2
-        y, x = np.ogrid[:magnitude_spectrum.shape[0], :magnitude_spectrum.shape[1]]
-        r = np.sqrt((x - center[1])**2 + (y - center[0])**2)
-
-        # Compute radial average
-        r_int = r.astype(int)
-        max_r = min(center)
-        radial_profile = np.zeros(max_r)
-
-        for radius in range(max_r):
-            mask = (r_int == radius)
-            if mask.any():
-                radial_profile[radius] = magnitude_spectrum[mask].mean()
+        # Radial average of the magnitude spectrum
+        radial_profile = compute_spectrum(gray_image)['radial_profile']
 
         # GANs often show unnatural peaks in mid-frequencies
         # Analyze kurtosis of radial profile (GAN = high kurtosis)
@@ -210,7 +220,7 @@ def _detect_spectral_regularity(gray_image: np.ndarray) -> float:
         high_pass = gray_image - ndimage.gaussian_filter(gray_image, sigma=5)
 
         # Calculate local standard deviation
-        local_std = ndimage.generic_filter(high_pass, np.std, size=16)
+        local_std = _local_std(high_pass, 16)
 
         # GANs often produce overly regular high-frequency content
         # Measure variance of the local standard deviations
@@ -245,7 +255,7 @@ def _detect_diffusion_artifacts(img_array: np.ndarray) -> float:
         Score (0-1) indicating likelihood of diffusion model generation
     """
     try:
-        gray = np.mean(img_array, axis=2).astype(float)
+        gray = _to_gray(img_array)
 
         # 1. Detect diffusion noise residuals
         noise_score = _detect_diffusion_noise_pattern(gray)
@@ -271,24 +281,63 @@ def _detect_diffusion_artifacts(img_array: np.ndarray) -> float:
         return 0.0
 
 
+def _stratified_patches(image: np.ndarray, margin: int, grid: int = 10, patch_size: int = 10,
+                        seed: int = 0) -> np.ndarray:
+    """
+    Samples one patch per cell of a grid x grid stratification of the image.
+
+    Each patch is placed at a random (seeded) position inside its cell and extended by
+    margin pixels on every side, taken from the padded image. Filtering
+    the stack with a kernel of radius <= margin and cropping the margin gives exactly the
+    full-image filter response at the sampled pixels (ndimage 'reflect' borders).
+
+    Args:
+        image: 2-D image
+        margin: Context kept around every patch
+        grid: Number of strata along each axis
+        patch_size: Side length of every sampled patch
+        seed: Seed of the local generator placing the patches
+
+    Returns:
+        Array of shape (N, patch_size + 2 * margin, patch_size + 2 * margin), or the whole
+        padded image with a leading axis of 1 when it is too small to stratify
+    """
+    height, width = image.shape
+    padded = np.pad(image, margin, mode='symmetric')
+    if height < grid * patch_size or width < grid * patch_size:
+        return padded[np.newaxis]
+
+    rng = np.random.default_rng(seed)
+    row_edges = np.linspace(0, height, grid + 1).astype(int)
+    col_edges = np.linspace(0, width, grid + 1).astype(int)
+    side = patch_size + 2 * margin
+    patches = []
+    for top, bottom in zip(row_edges[:-1], row_edges[1:]):
+        for left, right in zip(col_edges[:-1], col_edges[1:]):
+            y = rng.integers(top, bottom - patch_size + 1)
+            x = rng.integers(left, right - patch_size + 1)
+            patches.append(padded[y:y + side, x:x + side])
+    return np.stack(patches)
+
+
 def _detect_diffusion_noise_pattern(gray_image: np.ndarray) -> float:
     """Detects noise patterns characteristic of diffusion models."""
     try:
-        # Apply multi-scale Laplacian to extract noise
+        # Apply multi-scale Laplacian to extract noise on a spatially stratified sample
+        # of the image; the margin covers the widest kernel (truncate=4 -> radius 4 * sigma)
+        sigmas = [1, 2, 4]
+        margin = int(4 * max(sigmas) + 0.5)
+        patches = _stratified_patches(gray_image, margin)
         noise_bands = []
-        for sigma in [1, 2, 4]:
-            laplacian = ndimage.gaussian_laplace(gray_image, sigma=sigma)
-            noise_bands.append(laplacian)
+        for sigma in sigmas:
+            laplacian = ndimage.gaussian_laplace(patches, sigma=sigma, axes=(1, 2))
+            noise_bands.append(laplacian[:, margin:-margin, margin:-margin].ravel())
 
         # Diffusion models leave specific cross-scale correlations
         # Calculate correlation between different scales
         correlations = []
         for i in range(len(noise_bands) - 1):
-            # Downsample larger scale to match
-            corr = np.corrcoef(
-                noise_bands[i].flatten()[:10000],
-                noise_bands[i+1].flatten()[:10000]
-            )[0, 1]
+            corr = np.corrcoef(noise_bands[i], noise_bands[i+1])[0, 1]
             correlations.append(abs(corr))
 
         # Diffusion models show higher cross-scale correlation
@@ -308,14 +357,11 @@ def _detect_diffusion_noise_pattern(gray_image: np.ndarray) -> float:
 def _analyze_color_saturation(img_array: np.ndarray) -> float:
     """Analyzes color saturation patterns (diffusion models often oversaturate)."""
     try:
-        # Convert to HSV
-        img_float = img_as_float(img_array)
-        hsv = color.rgb2hsv(img_float)
-        saturation = hsv[:, :, 1]
-
-        # Calculate saturation statistics
-        mean_sat = np.mean(saturation)
-        std_sat = np.std(saturation)
+        # HSV saturation statistics straight from the uint8 channels
+        # (img_array is the uint8 RGB array from analyze_specialized_cgi_types)
+        saturation = saturation_statistics(img_array)
+        mean_sat = saturation['mean']
+        std_sat = saturation['std']
 
         # Diffusion models often produce:
         # 1. Higher mean saturation (> 0.5)
@@ -369,7 +415,38 @@ def _detect_diffusion_smoothness(gray_image: np.ndarray) -> float:
         return 0.0
 
 
-def _detect_face_synthesis(img_array: np.ndarray) -> float:
+def _face_region(faces: dict, image_shape: tuple, margin: float = 0.1):
+    """
+    Returns the (y0, y1, x0, x1) pixel bounds of the first detected face, padded by a margin.
+
+    Faces may have been detected on a copy of the image at another resolution (see
+    image_io.DETECTOR_RESOLUTIONS); the box is then scaled from faces['image_size'] to
+    the analyzed image.
+
+    Args:
+        faces: Face detection result from deepfake_detector.detect_faces
+        image_shape: Shape of the analyzed image array
+        margin: Padding added on every side, as a fraction of the box size
+
+    Returns:
+        Tuple of slice bounds, or None when no face was detected
+    """
+    if not faces or not faces.get('boxes'):
+        return None
+    height, width = image_shape[:2]
+    x_min, y_min, x_max, y_max = faces['boxes'][0]
+    face_width, face_height = faces.get('image_size') or (width, height)
+    if (face_width, face_height) != (width, height):
+        scale_x, scale_y = width / face_width, height / face_height
+        x_min, x_max = int(x_min * scale_x), int(round(x_max * scale_x))
+        y_min, y_max = int(y_min * scale_y), int(round(y_max * scale_y))
+    pad_x = int((x_max - x_min) * margin)
+    pad_y = int((y_max - y_min) * margin)
+    return (max(0, y_min - pad_y), min(height, y_max + pad_y + 1),
+            max(0, x_min - pad_x), min(width, x_max + pad_x + 1))
+
+
+def _detect_face_synthesis(img_array: np.ndarray, faces: dict = None) -> float:
     """
     Detects face synthesis and deepfakes.
 
@@ -381,15 +458,26 @@ def _detect_face_synthesis(img_array: np.ndarray) -> float:
 
     Args:
         img_array: RGB image as numpy array
+        faces: Optional face detection result. When provided, the analysis is restricted
+               to the detected face, and images without a face score 0 without any work.
+               When omitted, the image center is assumed to contain the face.
 
     Returns:
         Score (0-1) indicating likelihood of face synthesis
     """
     try:
-        gray = np.mean(img_array, axis=2).astype(float)
+        face_bounds = None
+        if faces is not None:
+            face_bounds = _face_region(faces, img_array.shape)
+            if face_bounds is None:
+                return 0.0  # No face: nothing face-specific to analyze
+            y0, y1, x0, x1 = face_bounds
+            img_array = img_array[y0:y1, x0:x1]
+
+        gray = _to_gray(img_array)
 
         # 1. Detect unnatural symmetry (common in face synthesis)
-        symmetry_score = _analyze_face_symmetry(gray)
+        symmetry_score = _analyze_face_symmetry(gray, centered=face_bounds is not None)
 
         # 2. Analyze skin texture patterns
         texture_score = _analyze_skin_texture(img_array)
@@ -412,17 +500,27 @@ def _detect_face_synthesis(img_array: np.ndarray) -> float:
         return 0.0
 
 
-def _analyze_face_symmetry(gray_image: np.ndarray) -> float:
-    """Analyzes facial symmetry (synthesis often creates unnatural symmetry)."""
+def _analyze_face_symmetry(gray_image: np.ndarray, centered: bool = False) -> float:
+    """
+    Analyzes facial symmetry (synthesis often creates unnatural symmetry).
+
+    Args:
+        gray_image: Grayscale image, or the face crop itself when centered is True
+        centered: Whether gray_image is already cropped to the detected face; otherwise
+                  the central half of the image is assumed to contain the face
+    """
     try:
-        height, width = gray_image.shape
+        if centered:
+            face_region = gray_image
+        else:
+            height, width = gray_image.shape
 
-        # Focus on center region (likely to contain face)
-        center_h, center_w = height // 2, width // 2
-        face_region = gray_image[
-            center_h - height//4:center_h + height//4,
-            center_w - width//4:center_w + width//4
-        ]
+            # Focus on center region (likely to contain face)
+            center_h, center_w = height // 2, width // 2
+            face_region = gray_image[
+                center_h - height//4:center_h + height//4,
+                center_w - width//4:center_w + width//4
+            ]
 
         if face_region.size == 0:
             return 0.0
@@ -456,25 +554,78 @@ def _analyze_face_symmetry(gray_image: np.ndarray) -> float:
         return 0.0
 
 
-def _analyze_skin_texture(img_array: np.ndarray) -> float:
-    """Analyzes skin texture patterns (synthetic skin looks different)."""
+@lru_cache(maxsize=32)
+def _gabor_real_kernel(frequency: float, theta: float) -> np.ndarray:
+    """Real part of the skimage Gabor kernel (default bandwidth and extent) in FLOAT_DTYPE."""
+    return np.real(filters.gabor_kernel(frequency, theta=theta)).astype(FLOAT_DTYPE)
+
+
+@lru_cache(maxsize=32)
+def _gabor_kernel_spectrum(fft_shape: tuple, frequency: float, theta: float, dtype: str) -> np.ndarray:
+    """Zero-padded rfft2 of a real Gabor kernel, cached per transform shape."""
+    return fft.rfft2(_gabor_real_kernel(frequency, theta).astype(dtype), s=fft_shape)
+
+
+def _gabor_real_responses(gray_image: np.ndarray, frequencies, thetas=(0.0,)) -> list:
+    """
+    Real Gabor responses for a bank of frequencies and orientations, computed in the FFT domain.
+
+    Matches skimage.filters.gabor(...)[0] (reflect borders): the image is reflect-padded
+    and transformed once, then every band costs one multiply by a cached kernel spectrum
+    and one inverse transform. The imaginary responses are never computed.
+
+    Args:
+        gray_image: 2-D grayscale image
+        frequencies: Gabor frequencies
+        thetas: Orientations in radians; each extra orientation costs one inverse transform
+
+    Returns:
+        List of real responses shaped like gray_image, ordered by frequency then orientation
+    """
+    bank = [(frequency, theta) for frequency in frequencies for theta in thetas]
+    kernels = [_gabor_real_kernel(frequency, theta) for frequency, theta in bank]
+    pad_y = max(kernel.shape[0] for kernel in kernels) // 2
+    pad_x = max(kernel.shape[1] for kernel in kernels) // 2
+
+    height, width = gray_image.shape
+    padded = np.pad(gray_image, ((pad_y, pad_y), (pad_x, pad_x)), mode='symmetric') # == ndimage 'reflect'
+    # Large enough that the circular convolution equals the linear one on the cropped area
+    fft_shape = (fft.next_fast_len(height + 4 * pad_y, real=True),
+                 fft.next_fast_len(width + 4 * pad_x, real=True))
+    workers = get_default_workers()
+    image_spectrum = fft.rfft2(padded, s=fft_shape, workers=workers)
+
+    responses = []
+    for (frequency, theta), kernel in zip(bank, kernels):
+        kernel_spectrum = _gabor_kernel_spectrum(fft_shape, frequency, theta, padded.dtype.name)
+        full = fft.irfft2(image_spectrum * kernel_spectrum, s=fft_shape, workers=workers)
+        top = pad_y + kernel.shape[0] // 2
+        left = pad_x + kernel.shape[1] // 2
+        responses.append(full[top:top + height, left:left + width])
+    return responses
+
+
+def _analyze_skin_texture(img_array: np.ndarray, thetas=(0.0,)) -> float:
+    """
+    Analyzes skin texture patterns (synthetic skin looks different).
+
+    Args:
+        img_array: RGB image (or face crop) as numpy array
+        thetas: Gabor orientations; extra orientations add bands at the cost of one inverse FFT each
+    """
     try:
         # Convert to grayscale
-        gray = np.mean(img_array, axis=2)
+        gray = _to_gray(img_array)
 
-        # Extract texture using Gabor filters at multiple scales
+        # Extract texture using a Gabor filter bank at multiple scales
         frequencies = [0.1, 0.2, 0.3]
-        texture_responses = []
-
-        for freq in frequencies:
-            real, imag = filters.gabor(gray, frequency=freq)
-            texture_responses.append(np.abs(real))
+        texture_responses = [np.abs(real) for real in _gabor_real_responses(gray, frequencies, thetas)]
 
         # Calculate texture regularity
         regularity_scores = []
         for response in texture_responses:
             # Synthetic skin often has overly regular texture
-            local_std = ndimage.generic_filter(response, np.std, size=20)
+            local_std = _local_std(response, 20)
             regularity = np.std(local_std)
             regularity_scores.append(regularity)
 
@@ -548,7 +699,7 @@ def _detect_3d_rendering(img_array: np.ndarray) -> float:
         Score (0-1) indicating likelihood of 3D rendering
     """
     try:
-        gray = np.mean(img_array, axis=2).astype(float)
+        gray = _to_gray(img_array)
 
         # 1. Detect perfect edges (3D renders have precise geometry)
         precision_score = _detect_geometric_precision(gray)
@@ -582,7 +733,8 @@ def _detect_geometric_precision(gray_image: np.ndarray) -> float:
 
         # Find lines using Hough transform
         from skimage.transform import probabilistic_hough_line
-        lines = probabilistic_hough_line(edges, threshold=10, line_length=30, line_gap=3)
+        # Fixed seed: the probabilistic transform samples edge pixels at random
+        lines = probabilistic_hough_line(edges, threshold=10, line_length=30, line_gap=3, rng=0)
 
         if not lines or len(lines) < 5:
             return 0.0
@@ -0,0 +1,127 @@
+"""
+Shared 2-D Fourier spectrum intermediate for the spectral detectors.
+
+The spectrum of a real image is conjugate symmetric, so only the half spectrum from
+scipy.fft.rfft2 is computed. Interior columns of the half spectrum stand for two bins
+of the full spectrum (DC and, for even widths, Nyquist stand for one), and every
+statistic below weights them accordingly, so results match the full fft2 exactly
+while the transform costs about half as much.
+"""
+
+import numpy as np
+from scipy import fft
+
+_default_workers = 1 # Threads per transform, see set_default_workers()
+
+
+def set_default_workers(workers: int):
+    """
+    Sets the scipy.fft worker threads used when a caller does not pass workers.
+
+    The engine sets this from the per-task thread budget when a worker process
+    starts, so parallel detectors do not oversubscribe the CPU.
+
+    Args:
+        workers: Number of threads per transform (at least 1)
+    """
+    global _default_workers
+    _default_workers = max(1, int(workers))
+
+
+def get_default_workers() -> int:
+    """Returns the scipy.fft worker threads used by default."""
+    return _default_workers
+
+
+def column_weights(width: int) -> np.ndarray:
+    """
+    Multiplicity of each rfft column in the full spectrum of a row of the given width.
+
+    Args:
+        width: Width of the real input
+
+    Returns:
+        Float array of length width // 2 + 1 holding 1 for DC (and Nyquist for even widths) and 2 otherwise
+    """
+    weights = np.full(width // 2 + 1, 2.0)
+    weights[0] = 1.0
+    if width % 2 == 0:
+        weights[-1] = 1.0
+    return weights
+
+
+def _radial_bins(height: int, width: int):
+    """
+    Integer radius of every half-spectrum bin, measured as in the fftshift-centered full spectrum.
+
+    Returns:
+        Tuple of (radius index array of shape (height, width // 2 + 1), number of radii
+        inside the inscribed circle, i.e. min(height // 2, width // 2))
+    """
+    # |row frequency| of each rfft row (fftshift layout), kept integral so radii truncate exactly
+    rows = np.arange(height)
+    fy = np.minimum(rows, height - rows)
+    fx = np.arange(width // 2 + 1)
+    radius = np.sqrt(fx[None, :] ** 2 + fy[:, None] ** 2).astype(int)
+    return radius, min(height // 2, width // 2)
+
+
+def compute_spectrum(gray_image: np.ndarray, workers: int = None) -> dict:
+    """
+    Computes the magnitude spectrum of one gray image, or of a stack of equally sized images.
+
+    Args:
+        gray_image: Array of shape (H, W) or (N, H, W)
+        workers: scipy.fft worker threads; defaults to get_default_workers()
+
+    Returns:
+        Dictionary with:
+        - magnitude: |rfft2| with shape (..., H, W // 2 + 1)
+        - log_magnitude: 20 * ln(magnitude + 1e-10)
+        - column_weights: Multiplicity of each half-spectrum column in the full spectrum
+        - radial_profile: Mean full-spectrum magnitude per integer radius, shape (..., min(H, W) // 2)
+        - shape: (H, W) of the input
+    """
+    if workers is None:
+        workers = _default_workers
+    height, width = gray_image.shape[-2:]
+
+    magnitude = np.abs(fft.rfft2(gray_image, axes=(-2, -1), workers=workers))
+    weights = column_weights(width)
+
+    radius, max_r = _radial_bins(height, width)
+    inside = radius < max_r
+    bins = radius[inside]
+    bin_weights = np.broadcast_to(weights, radius.shape)[inside]
+    counts = np.bincount(bins, weights=bin_weights, minlength=max_r)
+
+    values = magnitude[..., inside]
+    flat = values.reshape(-1, values.shape[-1])
+    sums = np.stack([np.bincount(bins, weights=row * bin_weights, minlength=max_r) for row in flat])
+    radial_profile = (sums / np.where(counts > 0, counts, 1.0)).reshape(magnitude.shape[:-2] + (max_r,))
+
+    return {
+        'magnitude': magnitude,
+        'log_magnitude': 20 * np.log(magnitude + 1e-10), # Add epsilon to prevent log(0)
+        'column_weights': weights,
+        'radial_profile': radial_profile,
+        'shape': (height, width),
+    }
+
+
+def weighted_spectrum_stats(values: np.ndarray, weights: np.ndarray):
+    """
+    Mean and standard deviation of half-spectrum values over the full spectrum.
+
+    Args:
+        values: Half-spectrum array of shape (..., H, W // 2 + 1)
+        weights: Column weights from column_weights()
+
+    Returns:
+        Tuple of (mean, std) arrays with shape values.shape[:-2]
+    """
+    total = values.shape[-2] * weights.sum()
+    mean = (values.sum(axis=-2) @ weights) / total
+    centered = values - mean[..., None, None]
+    std = np.sqrt(((centered ** 2).sum(axis=-2) @ weights) / total)
+    return mean, std
@@ -0,0 +1,49 @@
+"""
+Lazily imported detector entry points.
+
+The detector modules pull in mediapipe, OpenCV, scikit-image and most of scipy, which
+together take about a second to import. The engine therefore never imports them itself:
+it schedules detectors by name ("module:function") and run_task() imports the module in
+the worker process the first time that detector runs there. The web process stays light
+and starts quickly; workers pay the import once (or ahead of time, during warmup).
+"""
+
+import importlib
+
+# Entry point of every detector the engine schedules by name
+DETECTOR_TASKS = {
+    'faces': 'deepfake_detector:detect_faces',
+    'recompression': 'recompression:run_recompression_analysis',
+    'hos': 'hos:run_hos_analysis',
+    'rambino': 'rambino:run_rambino_analysis',
+    'cfa': 'cfa:analyze_cfa',
+    'jpeg_dimples': 'jpeg_dimples:detect_jpeg_dimples',
+    'geometric': 'geometric_3d:analyze_geometric_consistency',
+    'lighting': 'lighting_text:analyze_lighting_consistency',
+    'reflection_inconsistency': 'reflection_consistency:detect_reflection_inconsistencies',
+    'double_quantization': 'double_quantization:detect_double_quantization',
+    'watermark': 'watermarking:analyze_watermark',
+    'statistical_anomaly': 'statistical_anomaly:analyze_statistical_anomaly',
+    'specialized_detector': 'specialized_detectors:analyze_specialized_cgi_types',
+    'deepfake': 'deepfake_detector:detect_deepfake',
+}
+
+
+def load_task(target: str):
+    """
+    Resolves a "module:function" target inside the forensics package, importing the module if needed.
+
+    Args:
+        target: Module name relative to the package and function name, e.g. "cfa:analyze_cfa"
+
+    Returns:
+        The function object
+    """
+    module_name, _, function_name = target.partition(':')
+    module = importlib.import_module(f'{__package__}.{module_name}')
+    return getattr(module, function_name)
+
+
+def run_task(target: str, *args, **kwargs):
+    """Worker-side entry point: imports the detector on first use and calls it with the given arguments."""
+    return load_task(target)(*args, **kwargs)
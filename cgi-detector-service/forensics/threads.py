@@ -0,0 +1,107 @@
+"""
+Thread-budget management for the detector worker processes.
+
+Every pool worker would otherwise start its own native thread pools: OpenBLAS/MKL/OpenMP
+(via numpy and scipy), OpenCV, and scipy.fft when asked for workers. With one worker per
+core, each sized to the whole machine, a single request ends up with hundreds of runnable
+threads fighting over the same cores. The engine instead sizes its pool from the CPUs the
+container may actually use (the cgroup CPU quota, not os.cpu_count()) and gives every
+task a fixed number of threads, which apply_thread_budget() enforces in each worker.
+"""
+
+import os
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError: # Optional: without it only the environment variables are set
+    threadpool_limits = None
+
+# Read by OpenMP, OpenBLAS, MKL, Accelerate and numexpr when their pools are created
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+)
+
+_CGROUP_V2_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+_CGROUP_V1_QUOTA = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+_CGROUP_V1_PERIOD = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+_blas_limiter = None # Keeps the threadpoolctl limit alive for the life of the process
+
+
+def _read_cgroup_quota():
+    """CPU quota of the container as a (quota, period) pair in microseconds, or None if unlimited."""
+    try:
+        with open(_CGROUP_V2_CPU_MAX) as cpu_max:
+            quota, period = cpu_max.read().split()[:2]
+        return None if quota == 'max' else (int(quota), int(period))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(_CGROUP_V1_QUOTA) as quota_file, open(_CGROUP_V1_PERIOD) as period_file:
+            quota, period = int(quota_file.read()), int(period_file.read())
+        return None if quota <= 0 else (quota, period)
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> int:
+    """
+    Number of CPUs this process can actually use.
+
+    The smallest of the cgroup CPU quota (rounded up, cgroup v2 or v1), the scheduler
+    affinity mask and os.cpu_count(); at least 1.
+    """
+    cpus = os.cpu_count() or 1
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = min(cpus, len(os.sched_getaffinity(0)))
+    quota = _read_cgroup_quota()
+    if quota is not None:
+        cpus = min(cpus, -(-quota[0] // quota[1])) # Ceiling division
+    return max(1, cpus)
+
+
+def plan_workers(cores_per_task: int = 1, cpus: int = None):
+    """
+    Splits the available CPUs into pool workers and threads per task.
+
+    Args:
+        cores_per_task: Threads each task may use
+        cpus: CPU count to plan for; defaults to available_cpus()
+
+    Returns:
+        Tuple of (max_workers, threads_per_task)
+    """
+    if cpus is None:
+        cpus = available_cpus()
+    threads = max(1, min(int(cores_per_task), cpus))
+    return max(1, cpus // threads), threads
+
+
+def apply_thread_budget(threads: int):
+    """
+    Caps every native thread pool of the calling process at the given size.
+
+    Sets the BLAS/OpenMP environment variables (for pools created later and for child
+    processes), limits already-loaded BLAS/OpenMP libraries through threadpoolctl when it
+    is installed, calls cv2.setNumThreads and sets the scipy.fft default workers.
+
+    Args:
+        threads: Threads per pool (at least 1)
+    """
+    global _blas_limiter
+    threads = max(1, int(threads))
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    if threadpool_limits is not None:
+        _blas_limiter = threadpool_limits(limits=threads)
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+    from . import spectrum # Imported here so importing this module stays cheap
+    spectrum.set_default_workers(threads)
@@ -0,0 +1,146 @@
+"""
+Tiled full-resolution analysis for very large images.
+
+The regular pipeline analyzes a downsized copy of the upload. For high-resolution review
+the image can instead be split into overlapping tiles that are scored one at a time by
+the tile-capable detectors. The image is decoded once; each tile is cropped, scored and
+released, and at most max_in_flight tiles exist at any moment. Detector working memory
+(float intermediates, JPEG re-encodes, wavelet coefficients) therefore depends on the
+tile size rather than on the image size, and only the decoded uint8 frame grows with
+the image.
+
+Tile origins are multiples of 8, so every tile keeps the source's JPEG 8x8 block grid,
+which the recompression-based detectors (ELA, JPEG ghost) rely on.
+"""
+
+from collections import deque
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+TILE_SIZE = 512
+TILE_OVERLAP = 64
+JPEG_BLOCK = 8
+
+# Scores reported per tile in the heatmap grid. The local-statistics detector
+# (statistical_anomaly) is not tiled: it is still a placeholder that returns a constant
+# without reading the pixels, so per-tile scores would carry no information. It keeps
+# running once on the downsized image and can join here once it computes real statistics.
+TILE_DETECTORS = ('ela', 'jpeg_ghost', 'hos', 'rambino')
+
+
+def _tile_spans(length: int, tile_size: int, stride: int) -> list:
+    """
+    Block-aligned (start, end) tile spans along one axis.
+
+    Starts step by stride; the last tile starts at the last block boundary that still
+    leaves a full tile and runs to the far edge, so it may be up to 7 pixels longer.
+    """
+    if length <= tile_size:
+        return [(0, length)]
+    starts = list(range(0, length - tile_size + 1, stride))
+    last = (length - tile_size) // JPEG_BLOCK * JPEG_BLOCK
+    if last > starts[-1]:
+        starts.append(last)
+    return [(start, start + tile_size) for start in starts[:-1]] + [(starts[-1], length)]
+
+
+def tile_boxes(size: tuple, tile_size: int = TILE_SIZE, overlap: int = TILE_OVERLAP) -> list:
+    """
+    Lays an overlapping grid of tiles over an image.
+
+    Args:
+        size: (width, height) of the image
+        tile_size: Tile side length; rounded down to a multiple of 8
+        overlap: Pixels shared by neighbouring tiles; rounded down to a multiple of 8
+
+    Returns:
+        List of (row, col, (left, top, right, bottom)) in row-major order, covering the
+        whole image.
+    """
+    width, height = size
+    tile_size = max(JPEG_BLOCK, tile_size // JPEG_BLOCK * JPEG_BLOCK)
+    overlap = min(overlap // JPEG_BLOCK * JPEG_BLOCK, tile_size - JPEG_BLOCK)
+    stride = tile_size - overlap
+    boxes = []
+    for row, (top, bottom) in enumerate(_tile_spans(height, tile_size, stride)):
+        for col, (left, right) in enumerate(_tile_spans(width, tile_size, stride)):
+            boxes.append((row, col, (left, top, right, bottom)))
+    return boxes
+
+
+def analyze_tiled(image_bytes: bytes, tile_fn, executor=None, tile_size: int = TILE_SIZE,
+                  overlap: int = TILE_OVERLAP, max_in_flight: int = 4) -> dict:
+    """
+    Scores an image tile by tile at full resolution and aggregates the tile scores.
+
+    Args:
+        image_bytes: Raw bytes of the image
+        tile_fn: Picklable callable taking a uint8 RGB tile array and returning a dict of scores
+        executor: Optional concurrent.futures executor; tiles are scored in the calling
+            process when omitted
+        tile_size: Tile side length in pixels
+        overlap: Pixels shared by neighbouring tiles
+        max_in_flight: Maximum number of tiles cropped but not yet scored
+
+    Returns:
+        Dictionary with:
+        - scores: Tile-area-weighted mean of every score over the tiles that succeeded
+        - grid: {detector: rows x cols nested list} for TILE_DETECTORS, None for failed tiles
+        - rows, cols, tile_size, overlap: Grid geometry
+        - size: [width, height] of the analyzed image
+        Empty scores and grid if the image cannot be decoded.
+    """
+    try:
+        image = Image.open(BytesIO(image_bytes))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.load()
+    except Exception as e:
+        print(f"Error decoding image for tiled analysis: {e}")
+        return {'scores': {}, 'grid': {}, 'rows': 0, 'cols': 0, 'tile_size': tile_size,
+                'overlap': overlap, 'size': None}
+
+    boxes = tile_boxes(image.size, tile_size, overlap)
+    rows = max(row for row, _, _ in boxes) + 1
+    cols = max(col for _, col, _ in boxes) + 1
+    grid = {name: [[None] * cols for _ in range(rows)] for name in TILE_DETECTORS}
+    sums = {}
+    area_total = 0.0
+
+    def collect(row, col, box, get_scores):
+        nonlocal area_total
+        try:
+            scores = get_scores()
+        except Exception as e:
+            print(f"Error analyzing tile ({row}, {col}): {e}")
+            return
+        area = float((box[2] - box[0]) * (box[3] - box[1]))
+        area_total += area
+        for name, value in scores.items():
+            sums[name] = sums.get(name, 0.0) + area * float(value)
+            if name in grid:
+                grid[name][row][col] = float(value)
+
+    pending = deque()
+    for row, col, box in boxes:
+        tile = np.asarray(image.crop(box), dtype=np.uint8)
+        if executor is None:
+            collect(row, col, box, lambda: tile_fn(tile))
+            continue
+        pending.append((row, col, box, executor.submit(tile_fn, tile).result))
+        if len(pending) >= max_in_flight:
+            collect(*pending.popleft())
+    while pending:
+        collect(*pending.popleft())
+
+    scores = {name: total / area_total for name, total in sums.items()} if area_total else {}
+    return {
+        'scores': scores,
+        'grid': grid,
+        'rows': rows,
+        'cols': cols,
+        'tile_size': tile_size,
+        'overlap': overlap,
+        'size': list(image.size),
+    }
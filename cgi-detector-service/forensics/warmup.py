@@ -0,0 +1,121 @@
+"""
+Worker warmup on a synthetic image.
+
+The first analyses a fresh worker runs are several times slower than later ones:
+detector modules and their dependencies (MediaPipe, OpenCV, scikit-image, scipy) are
+imported on first use, caches are empty and numpy/scipy code paths are paged in.
+warm_up_process() takes that cost up front by running every detector once on a
+synthetic photo-like image. The engine calls it from its pool initializer, so every
+worker, including the replacements of recycled or crashed ones, is warm before it
+takes its first real task.
+"""
+
+import os
+import time
+from io import BytesIO
+import numpy as np
+from PIL import Image, ImageDraw
+
+WARMUP_SIZE = (960, 720) # Above the analysis budget, so the downsizing path is exercised too
+
+_warmup = None # Result of this process's warmup, see warm_up_process()
+
+
+def synthetic_image_bytes(size: tuple = WARMUP_SIZE, seed: int = 0) -> bytes:
+    """
+    Builds a deterministic photo-like JPEG: smooth lighting gradients, sensor-like noise,
+    flat and textured shapes and thin high-contrast strokes, so every detector reaches
+    its main code path.
+
+    Args:
+        size: (width, height) of the image
+        seed: Seed of the noise generator
+
+    Returns:
+        JPEG-encoded image bytes
+    """
+    width, height = size
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        120 + 80 * x / width,
+        100 + 60 * y / height,
+        140 + 40 * np.sin(x / 37.0) * np.cos(y / 53.0),
+    ], axis=-1)
+    base += rng.normal(0.0, 6.0, base.shape)
+    image = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((width // 8, height // 6, width // 3, height // 2), fill=(230, 190, 160))
+    draw.rectangle((width // 2, height // 2, width * 7 // 8, height * 7 // 8), fill=(40, 60, 90))
+    for offset in range(0, width // 3, 12):
+        draw.line((width // 2 + offset, height // 8, width // 2 + offset, height // 3), fill=(250, 250, 250), width=2)
+
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG", quality=90)
+    return buffered.getvalue()
+
+
+def _attempt(name: str, fn, *args, errors: dict):
+    """Runs one warmup step, recording (rather than raising) its error."""
+    try:
+        return fn(*args)
+    except Exception as e:
+        print(f"Warmup of {name} failed: {e}")
+        errors[name] = str(e)
+        return None
+
+
+def warm_up_process(image_bytes: bytes = None) -> dict:
+    """
+    Runs every engine detector once in the calling process; later calls return the
+    first call's result without running anything.
+
+    Args:
+        image_bytes: Image to analyze; defaults to synthetic_image_bytes()
+
+    Returns:
+        Dictionary with 'pid', 'seconds' (time the warmup took) and 'errors'
+        ({detector: message} for detectors that raised)
+    """
+    global _warmup
+    if _warmup is not None:
+        return _warmup
+
+    from . import engine # Imported here: the engine imports this module
+    from .image_io import prepare_analysis_inputs, detector_input
+    from .tasks import run_task, DETECTOR_TASKS
+
+    start = time.perf_counter()
+    errors = {}
+    if image_bytes is None:
+        image_bytes = synthetic_image_bytes()
+    inputs = prepare_analysis_inputs(image_bytes)
+
+    faces = _attempt('faces', run_task, DETECTOR_TASKS['faces'], detector_input(inputs, 'faces'), errors=errors)
+    for name, target in DETECTOR_TASKS.items():
+        if name == 'faces':
+            continue
+        args = (detector_input(inputs, name), faces) if name in ('specialized_detector', 'deepfake') else (detector_input(inputs, name),)
+        _attempt(name, run_task, target, *args, errors=errors)
+    tile = np.asarray(Image.open(BytesIO(image_bytes)).convert('RGB'))[:256, :256]
+    _attempt('tile', engine.run_tile_analysis, np.ascontiguousarray(tile), errors=errors)
+
+    _warmup = {'pid': os.getpid(), 'seconds': round(time.perf_counter() - start, 3), 'errors': errors}
+    return _warmup
+
+
+def worker_status(hold: float = 0.05) -> dict:
+    """
+    Pool task reporting the warmup of the worker that runs it.
+
+    Args:
+        hold: Seconds to keep the worker busy, so a burst of status tasks spreads across
+            the pool instead of being drained by the first idle worker
+
+    Returns:
+        The worker's warm_up_process() result
+    """
+    status = warm_up_process()
+    time.sleep(hold)
+    return status
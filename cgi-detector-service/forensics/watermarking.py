@@ -3,36 +3,39 @@ import cv2
 from scipy.stats import entropy
 from typing import Tuple
 
+from .spectrum import compute_spectrum, weighted_spectrum_stats
+
+ANALYSIS_SIZE = (256, 256)
+
+
+def _decode_image(image_bytes: bytes):
+    """Decodes image bytes once into a BGR array; returns None if decoding fails."""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def _to_grayscale(image: np.ndarray) -> np.ndarray:
+    """Converts a decoded image to a single gray channel at its native resolution."""
+    if len(image.shape) == 3 and image.shape[2] == 3:  # Check if it's a color image
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
 def _apply_grayscale_and_resize(image: np.ndarray) -> np.ndarray:
     """Applies grayscale and resizes the image to a standard size for analysis."""
-    if len(image.shape) == 3 and image.shape[2] == 3:  # Check if it's a color image
-        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray_image = image
-    return cv2.resize(gray_image, (256, 256), interpolation=cv2.INTER_AREA)
+    return cv2.resize(_to_grayscale(image), ANALYSIS_SIZE, interpolation=cv2.INTER_AREA)
 
-def _least_significant_bit_analysis(image_bytes: bytes) -> float:
+def _lsb_score(gray_image: np.ndarray) -> float:
     """
-    Performs Least Significant Bit (LSB) analysis on the image.
-    A non-random distribution of LSBs can indicate simple steganography or watermarking.
-    The analysis calculates the entropy of the LSB plane and compares it to a threshold.
-    Returns a score from 0.0 to 1.0, where a higher score indicates a higher likelihood of LSB manipulation.
+    Scores the LSB plane of a gray image by its entropy.
+    The gray image must be at native resolution: resampling averages neighbouring pixels
+    and destroys the LSB plane this analysis looks at.
     """
     try:
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if image is None:
-            return 0.0  # Could not decode image
-
-        gray_image = _apply_grayscale_and_resize(image)
-
-        # Extract the LSB plane
-        lsb_plane = (gray_image & 1).flatten()
+        if gray_image.size == 0:
+            return 0.0
 
-        # Calculate the histogram of the LSB plane (should be close to 0.5 for 0s and 1s if random)
-        hist, _ = np.histogram(lsb_plane, bins=[0, 1, 2])
-        probabilities = hist / hist.sum()
+        # Count the set bits of the LSB plane (should be close to 0.5 for 0s and 1s if random)
+        ones = np.count_nonzero(gray_image & 1)
+        probabilities = np.array([gray_image.size - ones, ones]) / gray_image.size
 
         # Calculate entropy of the LSB plane
         lsb_entropy = entropy(probabilities, base=2)
@@ -54,54 +57,74 @@ def _least_significant_bit_analysis(image_bytes: bytes) -> float:
         print(f"Error during LSB analysis: {e}")
         return 0.0
 
-def _frequency_domain_analysis(image_bytes: bytes) -> float:
+def _frequency_domain_scores(gray_images: np.ndarray) -> np.ndarray:
     """
-    Performs Frequency Domain (FFT) analysis on the image.
+    Performs Frequency Domain (FFT) analysis on a stack of equally sized gray images.
     Analyzes the magnitude spectrum for unnatural peaks or periodic patterns,
     characteristic of some frequency-domain watermarking techniques.
-    Returns a score from 0.0 to 1.0, where a higher score indicates a higher likelihood of a frequency-domain watermark.
-    """
-    try:
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
-        if image is None:
-            return 0.0  # Could not decode image
+    The half spectrum comes from the shared spectrum module, whose column weights keep
+    the mean, standard deviation and peak count identical to the full fft2. The
+    statistics do not depend on bin order, so no fftshift is needed.
 
-        gray_image = _apply_grayscale_and_resize(image)
-
-        # Convert to float32 for FFT
-        f = np.fft.fft2(gray_image)
-        fshift = np.fft.fftshift(f)
-        magnitude_spectrum = 20 * np.log(np.abs(fshift) + 1e-10) # Add epsilon to prevent log(0)
+    Args:
+        gray_images: Array of shape (N, H, W) holding N gray images.
 
-        # Analyze magnitude_spectrum for abnormal peaks or patterns.
-        # This is a complex area and often requires domain-specific knowledge or ML.
-        # For a basic detection, we can look for high variance or unusual concentrated energy.
-        # A simple approach is to look for peaks that deviate significantly from the general spectrum.
+    Returns:
+        Array of N scores from 0.0 to 1.0, where a higher score indicates a higher likelihood of a frequency-domain watermark.
+    """
+    count, height, width = gray_images.shape
+    if height * width == 0:
+        return np.zeros(count)
+
+    # One batched transform over the last two axes
+    spectrum = compute_spectrum(gray_images.astype(np.float32))
+    magnitude_spectrum = spectrum['log_magnitude']
+    weights = spectrum['column_weights']
+
+    # Analyze magnitude_spectrum for abnormal peaks or patterns.
+    # For a basic detection, we look for strong, localized peaks which might indicate
+    # embedded patterns: values significantly above the spectrum mean.
+    mean_magnitude, std_magnitude = weighted_spectrum_stats(magnitude_spectrum, weights)
+
+    # Count bins that are significantly brighter than average (e.g., 3 standard deviations above mean)
+    # These could correspond to strong frequency components of a watermark.
+    threshold = mean_magnitude + 3 * std_magnitude
+    peaks = magnitude_spectrum > threshold[:, None, None]
+    peak_count = peaks.sum(axis=1) @ weights
+
+    # Normalize peak_count by image size to get a score.
+    # The exact normalization and threshold might need tuning.
+    return np.minimum(1.0, peak_count / (height * width * 0.01)) # Heuristic scaling
 
-        # Let's try to detect strong, localized peaks in the high-frequency areas
-        # which might indicate embedded patterns.
-        # We can normalize the spectrum and look for values significantly above the mean.
-        
-        mean_magnitude = np.mean(magnitude_spectrum)
-        std_magnitude = np.std(magnitude_spectrum)
-
-        # Count pixels that are significantly brighter than average (e.g., 3 standard deviations above mean)
-        # These could correspond to strong frequency components of a watermark.
-        threshold = mean_magnitude + 3 * std_magnitude
-        peak_count = np.sum(magnitude_spectrum > threshold)
-
-        # Normalize peak_count by image size to get a score.
-        # The exact normalization and threshold might need tuning.
-        max_possible_peaks = gray_image.size
-        if max_possible_peaks == 0:
-            return 0.0
-        
-        fft_score = min(1.0, peak_count / (max_possible_peaks * 0.01)) # Heuristic scaling
+def _least_significant_bit_analysis(image_bytes: bytes) -> float:
+    """
+    Performs Least Significant Bit (LSB) analysis on the image.
+    A non-random distribution of LSBs can indicate simple steganography or watermarking.
+    The analysis calculates the entropy of the LSB plane and compares it to a threshold.
+    Returns a score from 0.0 to 1.0, where a higher score indicates a higher likelihood of LSB manipulation.
+    """
+    image = _decode_image(image_bytes)
+    if image is None:
+        return 0.0  # Could not decode image
+    return _lsb_score(_to_grayscale(image))
 
-        return fft_score
+def _frequency_domain_analysis(image_bytes: bytes) -> float:
+    """
+    Performs Frequency Domain (FFT) analysis on the image.
+    Analyzes the magnitude spectrum for unnatural peaks or periodic patterns,
+    characteristic of some frequency-domain watermarking techniques.
+    Returns a score from 0.0 to 1.0, where a higher score indicates a higher likelihood of a frequency-domain watermark.
+    """
+    image = _decode_image(image_bytes)
+    if image is None:
+        return 0.0  # Could not decode image
+    return _fft_score(_apply_grayscale_and_resize(image))
 
+def _fft_score(gray_image: np.ndarray) -> float:
+    """Scores a single resized gray image with _frequency_domain_scores."""
+    try:
+        return float(_frequency_domain_scores(gray_image[None])[0])
     except Exception as e:
         print(f"Error during FFT analysis: {e}")
         return 0.0
@@ -110,6 +133,8 @@ def analyze_watermark(image_bytes: bytes) -> float:
     """
     Analyzes an image for the presence of digital watermarks using multiple techniques.
     Combines Least Significant Bit (LSB) analysis and Frequency Domain (FFT) analysis.
+    The image is decoded once; LSB statistics use the native-resolution gray channel
+    and the FFT uses the 256x256 resized gray image.
 
     Args:
         image_bytes: The raw bytes of the image to analyze.
@@ -118,8 +143,13 @@ def analyze_watermark(image_bytes: bytes) -> float:
         A score from 0.0 to 1.0, indicating the likelihood of a watermark being present.
         A higher score means a higher probability of a watermark.
     """
-    lsb_score = _least_significant_bit_analysis(image_bytes)
-    fft_score = _frequency_domain_analysis(image_bytes)
+    image = _decode_image(image_bytes)
+    if image is None:
+        return 0.0  # Could not decode image
+
+    gray_image = _to_grayscale(image)
+    lsb_score = _lsb_score(gray_image)
+    fft_score = _fft_score(cv2.resize(gray_image, ANALYSIS_SIZE, interpolation=cv2.INTER_AREA))
 
     # Combine scores. A simple average for now, but can be weighted based on
     # empirical performance of each method.
@@ -127,6 +157,43 @@ def analyze_watermark(image_bytes: bytes) -> float:
 
     return combined_score
 
+def analyze_watermark_batch(image_bytes_list: list) -> list:
+    """
+    Scores many images for bulk scanning, with a single batched FFT over all of them.
+
+    Each image is decoded once and scored exactly as analyze_watermark would; the resized
+    gray images are stacked so the frequency analysis runs as one rfft2 call.
+
+    Args:
+        image_bytes_list: Raw bytes of the images to analyze.
+
+    Returns:
+        A list of scores from 0.0 to 1.0, in input order. Images that cannot be decoded score 0.0.
+    """
+    scores = [0.0] * len(image_bytes_list)
+    lsb_scores, resized, indices = [], [], []
+    for i, image_bytes in enumerate(image_bytes_list):
+        image = _decode_image(image_bytes)
+        if image is None:
+            continue
+        gray_image = _to_grayscale(image)
+        lsb_scores.append(_lsb_score(gray_image))
+        resized.append(cv2.resize(gray_image, ANALYSIS_SIZE, interpolation=cv2.INTER_AREA))
+        indices.append(i)
+
+    if not indices:
+        return scores
+
+    try:
+        fft_scores = _frequency_domain_scores(np.stack(resized))
+    except Exception as e:
+        print(f"Error during batched FFT analysis: {e}")
+        fft_scores = np.zeros(len(indices))
+
+    for i, lsb_score, fft_score in zip(indices, lsb_scores, fft_scores):
+        scores[i] = (lsb_score + float(fft_score)) / 2.0
+    return scores
+
 if __name__ == '__main__':
     # Example usage with dummy image bytes for testing
     # In a real scenario, you would load an actual image file.
@@ -0,0 +1,62 @@
+"""
+Per-image wavelet decomposition service shared by the wavelet-domain detectors.
+
+HOS and RAMBiNo both analyze 2-D wavelet decompositions of the grayscale image. A
+WaveletCache decodes the image once and keeps every decomposition it computes, keyed by
+(wavelet, level, region), so a decomposition asked for twice is computed once: the HOS
+score and its per-band statistics share one db1 transform, and a tile analysis decodes
+each tile once for both detectors. HOS (db1, full image) and RAMBiNo (db2, patches) use
+different transforms, so the engine runs them as separate tasks.
+"""
+
+import io
+import numpy as np
+import pywt
+from PIL import Image
+
+
+class WaveletCache:
+    """
+    Memoizes pywt.wavedec2 decompositions of a single grayscale image.
+
+    Args:
+        gray: 2-D float32 grayscale image, normalized to [0, 1].
+    """
+
+    def __init__(self, gray: np.ndarray):
+        self.gray = np.asarray(gray, dtype=np.float32)
+        self._decompositions = {}
+
+    @classmethod
+    def from_bytes(cls, image_bytes: bytes) -> 'WaveletCache':
+        """Decodes image bytes once into a normalized grayscale image and wraps it in a cache."""
+        image = Image.open(io.BytesIO(image_bytes)).convert('L')
+        return cls(np.asarray(image, dtype=np.float32) / 255.0)
+
+    def decomposition(self, wavelet: str = 'db1', level: int = 1, region=None) -> list:
+        """
+        Returns the wavedec2 decomposition of the image or of a set of regions.
+
+        Args:
+            wavelet: pywt wavelet name.
+            level: Decomposition level.
+            region: None for the full image, or a tuple of (y, x, height, width) boxes of
+                equal size; the boxes are stacked and decomposed in one batched call.
+
+        Returns:
+            The coefficient list [cA_n, (cH_n, cV_n, cD_n), ..., (cH_1, cV_1, cD_1)] as returned
+            by pywt.wavedec2. For regions every array has a leading box axis.
+        """
+        key = (wavelet, int(level), region)
+        if key not in self._decompositions:
+            if region is None:
+                data = self.gray
+            else:
+                data = np.stack([self.gray[y:y + height, x:x + width] for y, x, height, width in region])
+            self._decompositions[key] = pywt.wavedec2(data, wavelet=wavelet, level=level, axes=(-2, -1))
+        return self._decompositions[key]
+
+    @property
+    def transform_count(self) -> int:
+        """Number of distinct decompositions computed so far."""
+        return len(self._decompositions)
@@ -0,0 +1,288 @@
+"""
+Self-healing process pool for the engine's detector workers.
+
+Detector workers accumulate memory over time (OpenCV and MediaPipe allocations, large
+float temporaries, heap fragmentation), and a single pathological image can crash a
+worker outright. With a plain ProcessPoolExecutor a dead worker breaks the pool: every
+pending future fails with BrokenProcessPool and every later submit raises.
+
+RecyclingExecutor wraps a ProcessPoolExecutor "generation" and replaces it as a whole:
+
+- Recycling: after max_tasks_per_child * max_workers tasks (max_tasks_per_child per worker
+  on average) the generation is retired. ProcessPoolExecutor's own max_tasks_per_child
+  needs Python 3.11 and a non-fork start method, so it is not used.
+- Memory ceiling: every task reports its worker's RSS when it finishes; a worker above
+  max_rss_mb retires its generation.
+- Crashes: a generation broken by a dead worker is replaced, and every task that failed
+  with BrokenProcessPool is retried (up to max_retries times) in a single-use worker of
+  its own, so the requests that shared the pool with a poisoned task still complete
+  while the poisoned task fails alone. Retries run one at a time, in workers started
+  with retry_initializer (no warmup), so a crash that was an OOM kill is not followed by
+  a burst of freshly warmed processes on top of the replacement generation.
+
+A retired generation is shut down without waiting: new tasks go to the replacement,
+while tasks already queued on the old generation finish there before its workers exit.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+_CGROUP_V2_MEMORY_MAX = '/sys/fs/cgroup/memory.max'
+_CGROUP_V1_MEMORY_LIMIT = '/sys/fs/cgroup/memory/memory.limit_in_bytes'
+
+
+def current_rss_mb() -> float:
+    """
+    Resident set size of the calling process in MiB.
+
+    Reads /proc/self/statm where available; elsewhere falls back to the peak RSS
+    reported by getrusage (an upper bound), or 0.0 if neither is available.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak / (1024 * 1024) if peak > 1 << 32 else peak / 1024
+    return 0.0
+
+
+def available_memory_mb() -> float:
+    """
+    Memory the container may use in MiB.
+
+    The cgroup memory limit (v2 or v1), capped by the machine's physical memory (an
+    unlimited cgroup v1 reports a huge limit); 0.0 if neither can be read.
+    """
+    try:
+        physical = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        physical = None
+    limit = None
+    for path in (_CGROUP_V2_MEMORY_MAX, _CGROUP_V1_MEMORY_LIMIT):
+        try:
+            with open(path) as limit_file:
+                value = limit_file.read().strip()
+        except OSError:
+            continue
+        if value != 'max':
+            try:
+                limit = int(value) / (1024 * 1024)
+            except ValueError:
+                pass
+        break
+    if limit is None:
+        return physical or 0.0
+    return limit if physical is None else min(limit, physical)
+
+
+def plan_rss_ceiling(max_workers: int, fraction: float = 0.75, memory_mb: float = None):
+    """
+    Per-worker RSS ceiling that keeps a whole pool within a share of the container's memory.
+
+    Args:
+        max_workers: Worker processes sharing the memory
+        fraction: Share of the memory limit for all workers together; the rest is left to
+            the web process, the pool's parent and a retry worker
+        memory_mb: Memory limit to plan for; defaults to available_memory_mb()
+
+    Returns:
+        The ceiling in MiB, or None if the memory limit is unknown
+    """
+    if memory_mb is None:
+        memory_mb = available_memory_mb()
+    if not memory_mb:
+        return None
+    return memory_mb * fraction / max(1, int(max_workers))
+
+
+def _run_task(fn, args, kwargs):
+    """Worker-side wrapper: runs one task and reports the worker's RSS with the result."""
+    result = fn(*args, **kwargs)
+    return result, os.getpid(), current_rss_mb()
+
+
+class RecyclingExecutor:
+    """
+    ProcessPoolExecutor replacement that recycles and replaces its worker processes.
+
+    Args:
+        max_workers: Worker processes per generation.
+        initializer: Called in every new worker process, as for ProcessPoolExecutor.
+        initargs: Arguments for initializer.
+        retry_initializer: Called in the single-use workers that retry crashed tasks;
+            None runs no initializer there.
+        retry_initargs: Arguments for retry_initializer.
+        max_tasks_per_child: Average tasks per worker before the generation is recycled;
+            None disables task-count recycling.
+        max_rss_mb: Per-worker RSS ceiling checked after each task; None disables it
+            (see plan_rss_ceiling).
+        max_retries: Times a task is retried in isolation after its generation crashed.
+    """
+
+    def __init__(self, max_workers: int = None, initializer=None, initargs=(), max_tasks_per_child: int = None,
+                 max_rss_mb: float = None, max_retries: int = 1, retry_initializer=None, retry_initargs=()):
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._initializer = initializer
+        self._initargs = initargs
+        self._retry_initializer = retry_initializer
+        self._retry_initargs = retry_initargs
+        self._retries = deque() # Crashed tasks waiting for their isolated retry
+        self._retrying = False # Whether a retry worker is running
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_rss_mb = max_rss_mb
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._pool = None
+        self._generation = 0
+        self._submitted = 0 # Tasks submitted to the current generation
+        self._shutdown = False
+        self.recycle_count = 0 # Generations retired so far (recycled or broken)
+
+    @property
+    def max_workers(self) -> int:
+        """Worker processes per generation."""
+        return self._max_workers
+
+    @property
+    def generation(self) -> int:
+        """Number of the current pool generation (starts at 1 once a task is submitted)."""
+        return self._generation
+
+    def _current_pool(self):
+        """Returns (pool, generation), starting a generation if needed. Caller holds the lock."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._max_workers, initializer=self._initializer,
+                                             initargs=self._initargs)
+            self._generation += 1
+            self._submitted = 0
+        return self._pool, self._generation
+
+    def _retire(self, generation: int, reason: str):
+        """Retires the given generation if it is still current; the next submit starts a new one."""
+        with self._lock:
+            if generation != self._generation or self._pool is None:
+                return # Already replaced by another task's report
+            pool, self._pool = self._pool, None
+            self.recycle_count += 1
+        print(f"Recycling detector worker pool (generation {generation}): {reason}")
+        pool.shutdown(wait=False)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Schedules fn(*args, **kwargs) and returns a Future for its result."""
+        outer = Future()
+        self._submit(outer, fn, args, kwargs, attempt=0)
+        return outer
+
+    def _submit(self, outer: Future, fn, args, kwargs, attempt: int):
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            pool, generation = self._current_pool()
+            self._submitted += 1
+            recycle = (self.max_tasks_per_child is not None
+                       and self._submitted >= self.max_tasks_per_child * self._max_workers)
+        try:
+            inner = pool.submit(_run_task, fn, args, kwargs)
+        except BrokenProcessPool as e:
+            self._retire(generation, f"broken on submit ({e})")
+            self._resubmit(outer, fn, args, kwargs, attempt, e)
+            return
+        inner.add_done_callback(lambda done: self._task_done(done, outer, fn, args, kwargs, attempt, generation))
+        if recycle:
+            self._retire(generation, f"reached {self.max_tasks_per_child} tasks per worker")
+
+    def _resubmit(self, outer: Future, fn, args, kwargs, attempt: int, error: Exception):
+        """
+        Queues a task whose generation broke for a retry in a single-use worker of its own.
+
+        Every task in flight on a broken generation fails the same way, so the one that
+        killed the worker cannot be told apart from its bystanders. Running each retry in
+        isolation lets the bystanders complete while a poisoned task can only take down
+        its own worker. Retries run serially, so a crash adds at most one process.
+        """
+        if attempt >= self.max_retries or self._shutdown:
+            outer.set_exception(error)
+            return
+        with self._lock:
+            self._retries.append((outer, fn, args, kwargs, attempt))
+            if self._retrying:
+                return
+            self._retrying = True
+        self._next_retry()
+
+    def _next_retry(self):
+        """Starts the next queued retry, or marks the retry worker idle if there is none."""
+        with self._lock:
+            if not self._retries:
+                self._retrying = False
+                return
+            outer, fn, args, kwargs, attempt = self._retries.popleft()
+        if self._shutdown:
+            outer.set_exception(RuntimeError('executor shut down before the task could be retried'))
+            self._next_retry()
+            return
+        try:
+            pool = ProcessPoolExecutor(max_workers=1, initializer=self._retry_initializer,
+                                       initargs=self._retry_initargs)
+            inner = pool.submit(_run_task, fn, args, kwargs)
+        except Exception as e:
+            outer.set_exception(e)
+            self._next_retry()
+            return
+
+        def isolated_done(done: Future):
+            pool.shutdown(wait=False)
+            if done.cancelled():
+                outer.cancel()
+            elif isinstance(done.exception(), BrokenProcessPool):
+                if attempt + 1 >= self.max_retries:
+                    outer.set_exception(done.exception())
+                else:
+                    with self._lock:
+                        self._retries.append((outer, fn, args, kwargs, attempt + 1))
+            elif done.exception() is not None:
+                outer.set_exception(done.exception())
+            else:
+                outer.set_result(done.result()[0])
+            self._next_retry()
+
+        inner.add_done_callback(isolated_done)
+
+    def _task_done(self, inner: Future, outer: Future, fn, args, kwargs, attempt: int, generation: int):
+        if inner.cancelled():
+            outer.cancel()
+            return
+        error = inner.exception()
+        if isinstance(error, BrokenProcessPool):
+            # A worker died (crash, OOM kill): replace the pool and retry the task in isolation
+            self._retire(generation, f"worker crashed ({error})")
+            self._resubmit(outer, fn, args, kwargs, attempt, error)
+            return
+        if error is not None:
+            outer.set_exception(error)
+            return
+        result, pid, rss_mb = inner.result()
+        if self.max_rss_mb is not None and rss_mb > self.max_rss_mb:
+            self._retire(generation, f"worker {pid} at {rss_mb:.0f} MiB exceeds {self.max_rss_mb} MiB")
+        outer.set_result(result)
+
+    def shutdown(self, wait: bool = True):
+        """Shuts down the current generation; retired generations finish on their own."""
+        with self._lock:
+            self._shutdown = True
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
@@ -1,10 +1,37 @@
 import time
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Form
+import threading
+from typing import Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Form, Query
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from forensics import engine, ml_predictor
-from concurrent.futures import ThreadPoolExecutor
+from forensics.profiles import PROFILES, PROFILE_ORDER
+import asyncio
 
 app = FastAPI()
 
+@app.on_event("startup")
+def start_engine():
+    # The model is loaded here rather than at import time; a fresh deployment trains it
+    # once from the shipped base training data, and startup fails loudly if that is missing
+    # or the model does not take the engine's feature vector.
+    engine.startup(train_if_missing=True)
+    # Warm the worker pool in the background: the app serves /healthz right away and
+    # /readyz reports ready once every worker has run each detector once
+    threading.Thread(target=engine.warm_up, name="engine-warmup", daemon=True).start()
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once the ML model is loaded and the worker pool is warm, 503 before.
+    Also reports the load governor's state, including the profile unpinned requests get."""
+    status = engine.readiness()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.time()
@@ -18,9 +45,10 @@ from PIL import Image
 from io import BytesIO
 # ... (rest of imports)
 
-def _analyze_single_image(file_data: bytes, filename: str):
+def _analyze_single_image(file_data: bytes, filename: str, profile: str = None, tiled: bool = False):
     """
     Helper function to analyze a single image and return its results.
+    Without a profile, the engine picks one based on the current load.
     """
     start_time = time.time()
     try:
@@ -33,7 +61,8 @@ def _analyze_single_image(file_data: bytes, filename: str):
                 detail=f"Image resolution too low for {filename}. Minimum resolution is 480x480 pixels."
             )
 
-        results = engine.run_analysis(file_data)
+        # Identical uploads analyzed at the same time share one analysis
+        results = engine.run_analysis_coalesced(file_data, profile=profile, tiled=tiled)
         analysis_duration = round(time.time() - start_time, 2)
         results['analysis_duration'] = analysis_duration
         return {"filename": filename, "prediction": results}
@@ -46,28 +75,34 @@ def _analyze_single_image(file_data: bytes, filename: str):
         return {"filename": filename, "error": str(e)}
 
 @app.post("/analyze")
-async def predict_cgi(files: list[UploadFile] = File(...)):
+async def predict_cgi(
+    files: list[UploadFile] = File(...),
+    profile: Optional[str] = Query(None, description="Pin the analysis profile: thorough, balanced or fast. "
+                                                     "By default the service steps down to cheaper profiles under load."),
+    tiled: bool = Query(False, description="Score ELA, JPEG ghost, HOS and RAMBiNo over overlapping full-resolution "
+                                           "tiles and return the per-tile score grid under 'tiles'. Detector memory is "
+                                           "bounded by the tile size, but the decoded image still grows with the "
+                                           "upload's resolution, and the analysis takes longer for large images.")
+):
     if len(files) > 5:
         raise HTTPException(status_code=400, detail="Maximum 5 images allowed per request.")
+    if profile is not None and profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile '{profile}'. Expected one of: {', '.join(PROFILE_ORDER)}.")
 
+    # Analyses run in the threadpool so concurrent requests (and the files of a batch)
+    # overlap instead of blocking the event loop one after another
     if len(files) == 1:
         file = files[0]
         contents = await file.read()
-        result = _analyze_single_image(contents, file.filename)
+        result = await run_in_threadpool(_analyze_single_image, contents, file.filename, profile, tiled)
         if "error" in result:
             raise HTTPException(status_code=500, detail=f"An error occurred during analysis: {result['error']}")
         return result
     else:
-        with ThreadPoolExecutor() as executor:
-            tasks = []
-            for file in files:
-                contents = await file.read()
-                tasks.append(executor.submit(_analyze_single_image, contents, file.filename))
-            
-            results = []
-            for future in tasks:
-                results.append(future.result())
-        
+        uploads = [(await file.read(), file.filename) for file in files]
+        results = list(await asyncio.gather(*(run_in_threadpool(_analyze_single_image, contents, filename, profile, tiled)
+                                              for contents, filename in uploads)))
+
         # Check for errors in any of the results
         for result in results:
             if "error" in result:
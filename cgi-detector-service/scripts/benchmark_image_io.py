@@ -0,0 +1,63 @@
+"""
+Benchmarks decoding and downsizing phone-sized JPEGs to 480p (full decode vs. JPEG draft mode).
+Run from anywhere: python scripts/benchmark_image_io.py
+"""
+import os
+import sys
+import time
+import numpy as np
+from io import BytesIO
+from PIL import Image
+
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forensics.image_io import downsize_image_to_480p
+
+SOURCE_MEGAPIXELS = [2, 8, 12, 24, 48]
+REPEATS = 3
+
+
+def make_jpeg(megapixels: float, quality: int = 90) -> bytes:
+    """Builds a 4:3 phone-like JPEG (smooth gradients plus sensor-like noise)."""
+    height = int(np.sqrt(megapixels * 1e6 * 3 / 4))
+    width = height * 4 // 3
+    rng = np.random.default_rng(0)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    base = np.stack([y + 0 * x, 0 * y + x, (y + x) / 2], axis=2)
+    pixels = np.clip(base + rng.normal(0, 6, base.shape).astype(np.float32), 0, 255).astype(np.uint8)
+    buffered = BytesIO()
+    Image.fromarray(pixels).save(buffered, format="JPEG", quality=quality)
+    return buffered.getvalue()
+
+
+def time_downsize(image_bytes: bytes, draft: bool, resample):
+    """Best-of-REPEATS (decode, resize) seconds for one configuration."""
+    best = (float('inf'), float('inf'))
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        image = Image.open(BytesIO(image_bytes))
+        if draft:
+            target = (int(image.size[0] * 480 / image.size[1]), 480)
+            image.draft(None, target)
+        image.load()
+        decoded = time.perf_counter()
+        downsize_image_to_480p(image, resample=resample, draft=False).load()
+        resized = time.perf_counter()
+        best = min(best, (decoded - start, resized - decoded), key=sum)
+    return best
+
+
+if __name__ == "__main__":
+    configurations = [
+        ("full decode + LANCZOS", False, Image.LANCZOS),
+        ("draft + LANCZOS", True, Image.LANCZOS),
+        ("draft + BILINEAR", True, Image.BILINEAR),
+    ]
+    print(f"{'MP':>4}  {'configuration':<24}{'decode ms':>10}{'resize ms':>10}{'total ms':>10}")
+    for megapixels in SOURCE_MEGAPIXELS:
+        image_bytes = make_jpeg(megapixels)
+        for name, draft, resample in configurations:
+            decode, resize = time_downsize(image_bytes, draft, resample)
+            print(f"{megapixels:>4}  {name:<24}{decode * 1e3:>10.1f}{resize * 1e3:>10.1f}{(decode + resize) * 1e3:>10.1f}")
@@ -19,8 +19,8 @@ def test_ml_predictor_load_and_predict():
     print("=" * 60)
 
     # Ensure a dummy model exists for loading
-    # The load_model function in ml_predictor.py will create one if it doesn't exist
-    model = ml_predictor.load_model()
+    # load_model trains one from the base training data if none is saved
+    model = ml_predictor.load_model(train_if_missing=True)
     assert model is not None, "ML model should be loaded or created."
 
     # Create dummy features for prediction (12 features as used in engine.py and ml_predictor.py)
@@ -11,6 +11,7 @@ from concurrent.futures import ProcessPoolExecutor, as_completed
 # Adjust path to import from forensics
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from forensics.ml_predictor import extract_features_from_image_bytes, train_and_save_model
+from forensics.perceptual_hash import deduplicate_files
 
 # --- Configuration --- #
 DATASET_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'dataset', 'train'))
@@ -32,9 +33,14 @@ def initialize_progress_file():
     for label_dir_name in ['REAL', 'FAKE']:
         current_label_path = os.path.join(DATASET_ROOT, label_dir_name)
         if os.path.exists(current_label_path):
-            for filename in os.listdir(current_label_path):
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    all_files.append(os.path.join(current_label_path, filename))
+            label_files = sorted(os.path.join(current_label_path, filename) for filename in os.listdir(current_label_path)
+                                 if filename.lower().endswith(('.png', '.jpg', '.jpeg')))
+            # Re-encoded or resized copies of one picture would be extracted and weighted twice.
+            # Only copies within a label are dropped: an edited fake of a real photo is kept.
+            label_files, duplicates = deduplicate_files(label_files)
+            for duplicate, original in duplicates.items():
+                print(f"Skipping near-duplicate {duplicate} (copy of {original})")
+            all_files.extend(label_files)
     
     all_files.sort()
     chunks = [all_files[i:i + CHUNK_SIZE] for i in range(0, len(all_files), CHUNK_SIZE)]
@@ -0,0 +1,38 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import numpy as np
+from scipy import ndimage
+from skimage import morphology
+from forensics.box_filters import summed_area_table, box_sum, box_mean, disk_sum
+
+
+class TestBoxFilters:
+    def test_summed_area_table(self):
+        image = np.arange(12, dtype=np.float64).reshape(3, 4)
+        table = summed_area_table(image)
+        assert table.shape == (4, 5)
+        assert table[0].max() == 0 and table[:, 0].max() == 0
+        assert table[2, 3] == image[:2, :3].sum()
+        assert table[-1, -1] == image.sum()
+
+    def test_box_mean_matches_uniform_filter(self):
+        image = np.random.default_rng(0).random((37, 61))
+        for size in (3, 8, 51):
+            np.testing.assert_allclose(box_mean(image, size), ndimage.uniform_filter(image, size), atol=1e-12)
+
+    def test_box_sum_counts_window(self):
+        image = np.ones((20, 20), dtype=bool)
+        assert np.all(box_sum(image, 5) == 25)
+
+    def test_exact_disk_matches_convolve(self):
+        edges = np.random.default_rng(1).random((45, 70)) > 0.8
+        expected = ndimage.convolve(edges.astype(float), morphology.disk(15).astype(float))
+        np.testing.assert_array_equal(disk_sum(edges, 15, exact=True), expected)
+
+    def test_box_disk_approximation_preserves_total_weight(self):
+        image = np.ones((40, 40))
+        area = morphology.disk(6).sum()
+        np.testing.assert_allclose(disk_sum(image, 6), area)
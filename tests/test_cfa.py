@@ -0,0 +1,58 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import pytest
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from skimage.feature import graycomatrix, graycoprops
+from forensics.cfa import analyze_cfa, _glcm_counts, _glcm_contrast_correlation
+
+
+def make_texture(height=64, width=80, seed=0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.random((height, width)) * 255).astype(np.uint8)
+
+
+class TestCFA:
+    def test_matches_skimage_for_multiple_offsets(self):
+        channel = make_texture()
+        distances = [1, 3]
+        angles = [0, np.pi / 4, np.pi / 2, 3 * np.pi / 4]
+        glcm = graycomatrix(channel, distances, angles, levels=256, symmetric=True, normed=True)
+
+        counts = _glcm_counts(channel, distances=distances, angles=angles)
+        contrast, correlation = _glcm_contrast_correlation(counts)
+
+        np.testing.assert_allclose(contrast, graycoprops(glcm, 'contrast'), rtol=1e-9)
+        np.testing.assert_allclose(correlation, graycoprops(glcm, 'correlation'), atol=1e-12)
+
+    def test_quantized_contrast_stays_on_full_scale(self):
+        # A ramp with step 2: a bin of width w is crossed by 2/w of the horizontal pairs,
+        # each crossing costing w^2 on the 0-255 scale, so the contrast is 2 * w.
+        channel = np.tile(np.arange(0, 256, 2, dtype=np.uint8), (32, 1))
+        full_contrast, _ = _glcm_contrast_correlation(_glcm_counts(channel))
+        assert full_contrast[0, 0] == pytest.approx(4.0)
+        for levels in (64, 32):
+            contrast, correlation = _glcm_contrast_correlation(_glcm_counts(channel, levels=levels))
+            assert contrast.shape == (1, 1)
+            assert contrast[0, 0] == pytest.approx(2.0 * (256 // levels), rel=0.05)
+            assert correlation[0, 0] > 0.99
+
+    def test_constant_channel_has_unit_correlation(self):
+        contrast, correlation = _glcm_contrast_correlation(_glcm_counts(np.full((20, 20), 9, np.uint8)))
+        assert contrast[0, 0] == 0.0
+        assert correlation[0, 0] == 1.0
+
+    def test_invalid_levels_raise(self):
+        with pytest.raises(ValueError):
+            _glcm_counts(make_texture(), levels=100)
+
+    def test_analyze_cfa_score_range(self):
+        buffered = BytesIO()
+        Image.fromarray(np.dstack([make_texture(seed=i) for i in range(3)])).save(buffered, format="PNG")
+        score = analyze_cfa(buffered.getvalue(), distances=(1, 2), angles=(0.0, np.pi / 2), levels=64)
+        assert 0.0 <= score <= 1.0
+        assert analyze_cfa(b"not an image") == 0.0
@@ -0,0 +1,34 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import pytest
+import numpy as np
+from skimage import color
+from forensics.color_stats import channel_extrema, saturation_histogram, saturation_statistics
+
+
+class TestColorStats:
+    def test_saturation_matches_rgb2hsv(self):
+        rgb = np.random.default_rng(0).integers(0, 256, (40, 50, 3), dtype=np.uint8)
+        rgb[:5] = 0          # black: saturation defined as 0
+        rgb[5:10] = 128      # gray: zero chroma
+        saturation = color.rgb2hsv(rgb)[:, :, 1]
+        stats = saturation_statistics(rgb)
+        assert stats['mean'] == pytest.approx(saturation.mean(), abs=1e-12)
+        assert stats['std'] == pytest.approx(saturation.std(), abs=1e-12)
+
+    def test_histogram_counts_every_pixel(self):
+        rgb = np.zeros((3, 4, 3), dtype=np.uint8)
+        rgb[..., 0] = 200
+        rgb[..., 2] = 50
+        counts = saturation_histogram(rgb)
+        assert counts.sum() == 12
+        assert counts[200, 200] == 12
+        channel_max, channel_min = channel_extrema(rgb)
+        assert channel_max.dtype == np.uint8 and channel_min.max() == 0
+
+    def test_rejects_float_input(self):
+        with pytest.raises(ValueError):
+            saturation_statistics(np.zeros((4, 4, 3)))
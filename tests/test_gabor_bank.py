@@ -0,0 +1,31 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import pytest
+import numpy as np
+from skimage import filters
+from forensics import specialized_detectors
+
+
+class TestGaborBank:
+    @pytest.mark.parametrize("shape", [(64, 80), (21, 17)])
+    def test_matches_skimage_gabor_real_part(self, shape):
+        gray = (np.random.default_rng(0).random(shape) * 255).astype(np.float32)
+        frequencies = (0.1, 0.2, 0.3)
+        thetas = (0.0, np.pi / 3)
+        responses = specialized_detectors._gabor_real_responses(gray, frequencies, thetas)
+        assert len(responses) == len(frequencies) * len(thetas)
+        expected = [filters.gabor(gray, f, theta=t)[0] for f in frequencies for t in thetas]
+        for response, reference in zip(responses, expected):
+            assert response.shape == shape
+            np.testing.assert_allclose(response, reference, atol=1e-5 * np.abs(reference).max())
+
+    def test_kernel_spectra_are_cached_per_shape(self):
+        specialized_detectors._gabor_kernel_spectrum.cache_clear()
+        gray = np.ones((40, 40), dtype=np.float32)
+        specialized_detectors._gabor_real_responses(gray, (0.2,))
+        specialized_detectors._gabor_real_responses(gray, (0.2,))
+        info = specialized_detectors._gabor_kernel_spectrum.cache_info()
+        assert (info.misses, info.hits) == (1, 1)
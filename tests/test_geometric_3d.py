@@ -0,0 +1,67 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import numpy as np
+from PIL import Image, ImageDraw
+from scipy.stats import entropy
+from skimage import feature, measure
+from forensics.geometric_3d import _contour_curvature_entropies, _analyze_edge_regularity
+
+
+def _loop_entropy(contour, bins=20):
+    """The per-contour implementation the vectorized kernel replaced."""
+    dx = np.gradient(contour[:, 0])
+    dy = np.gradient(contour[:, 1])
+    ddx = np.gradient(dx)
+    ddy = np.gradient(dy)
+    curvature = np.abs(dx * ddy - dy * ddx) / (dx**2 + dy**2 + 1e-8)**1.5
+    hist, _ = np.histogram(curvature, bins=bins, density=True)
+    return entropy(hist + 1e-10)
+
+
+def _loop_regularity(contours):
+    scores = [1.0 - e / 1.5 if e < 1.5 else 0.0 for e in map(_loop_entropy, contours)]
+    return float(np.clip(np.mean(scores), 0.0, 1.0))
+
+
+def make_shapes(size=(320, 240), seed=0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    image = Image.new('L', size, 40)
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.integers(0, size[0] - 60), rng.integers(0, size[1] - 60)
+        w, h = rng.integers(10, 60, size=2)
+        shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+        shape((int(x), int(y), int(x + w), int(y + h)), fill=int(rng.integers(90, 255)))
+    pixels = np.asarray(image, dtype=np.float64)
+    return pixels + rng.normal(0.0, 3.0, pixels.shape)
+
+
+def _long_contours(gray):
+    contours = measure.find_contours(feature.canny(gray, sigma=2), 0.5)
+    return [contour for contour in contours if len(contour) >= 10]
+
+
+class TestContourCurvature:
+    def test_matches_per_contour_loop(self):
+        rng = np.random.default_rng(1)
+        contours = [np.cumsum(rng.normal(size=(n, 2)), axis=0) for n in (10, 11, 37, 200)]
+        # A straight line has constant (zero) curvature: the flat-range histogram case
+        contours.append(np.stack([np.arange(15.0), np.arange(15.0)], axis=1))
+        expected = [_loop_entropy(contour) for contour in contours]
+        np.testing.assert_allclose(_contour_curvature_entropies(contours), expected, rtol=1e-9, atol=1e-12)
+
+    def test_edge_regularity_matches_loop(self):
+        gray = make_shapes()
+        contours = _long_contours(gray)
+        assert len(contours) > 5
+        assert _analyze_edge_regularity(gray) == _loop_regularity(contours)
+
+    def test_max_contours_keeps_the_longest(self):
+        gray = make_shapes(seed=2)
+        contours = sorted(_long_contours(gray), key=len, reverse=True)
+        assert len(contours) > 3
+        assert _analyze_edge_regularity(gray, max_contours=3) == _loop_regularity(contours[:3])
+        assert _analyze_edge_regularity(gray, max_contours=len(contours)) == _analyze_edge_regularity(gray)
@@ -0,0 +1,45 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import numpy as np
+from forensics.gradient_stats import block_sums, compute_gradient_field, gradient_block_stats
+
+
+class TestGradientStats:
+    def test_block_sums_cover_every_pixel(self):
+        values = np.random.default_rng(0).random((70, 100))
+        (sums,), counts = block_sums([values], 32)
+        # 2x3 full blocks, 2 right-edge blocks, 3 bottom-edge blocks and the corner
+        assert len(counts) == 6 + 2 + 3 + 1
+        assert counts.sum() == values.size
+        assert np.isclose(sums.sum(), values.sum())
+        np.testing.assert_allclose(sums[0], values[:32, :32].sum())
+
+    def test_block_sums_can_skip_partial_blocks(self):
+        values = np.ones((70, 100))
+        (sums,), counts = block_sums([values], 32, include_partial=False)
+        assert len(counts) == 6
+        assert np.all(sums == 32 * 32)
+
+    def test_image_smaller_than_block_is_one_block(self):
+        (sums,), counts = block_sums([np.ones((10, 12))], 32)
+        assert counts.tolist() == [120]
+        assert sums.tolist() == [120.0]
+
+    def test_gradient_block_stats_for_uniform_ramp(self):
+        # A horizontal ramp has every gradient pointing along +x
+        ramp = np.tile(np.arange(0, 200, 2, dtype=np.uint8), (64, 1))
+        stats = gradient_block_stats(compute_gradient_field(ramp), 32, include_partial=False)
+        np.testing.assert_allclose(stats['weighted_direction'], 0.0, atol=1e-12)
+        # Border rows/columns of a Sobel ramp still point along +x, so the resultant is 1
+        np.testing.assert_allclose(stats['resultant_length'], 1.0, atol=1e-6)
+        assert np.all(stats['mean_magnitude'] > 10)
+
+    def test_uint8_input_does_not_overflow(self):
+        step = np.zeros((32, 32), dtype=np.uint8)
+        step[:, 16:] = 255
+        gradients = compute_gradient_field(step)
+        assert gradients['grad_x'].dtype == np.float32
+        assert gradients['grad_x'].max() == 4 * 255
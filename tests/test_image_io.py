@@ -0,0 +1,76 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from forensics.image_io import (downsize_image_to_480p, downsize_to_budget, budget_scale,
+                                prepare_analysis_inputs, detector_input, describe_inputs)
+
+
+def _encode(size, format):
+    y = np.linspace(0, 255, size[1])[:, None]
+    x = np.linspace(0, 255, size[0])[None, :]
+    pixels = np.stack([y + 0 * x, 0 * y + x, (x + y) / 2], axis=2).astype(np.uint8)
+    buffered = BytesIO()
+    Image.fromarray(pixels).save(buffered, format=format)
+    return buffered.getvalue()
+
+
+class TestDownsize:
+    def test_jpeg_uses_scaled_decoding(self):
+        image = Image.open(BytesIO(_encode((2400, 1800), "JPEG")))
+        resized = downsize_image_to_480p(image)
+        assert resized.size == (640, 480)
+        # libjpeg decoded at 1/2 (900 lines >= 480) rather than full resolution
+        assert image.size == (1200, 900)
+
+    def test_draft_matches_full_decode(self):
+        data = _encode((2400, 1800), "JPEG")
+        drafted = np.asarray(downsize_image_to_480p(Image.open(BytesIO(data))), dtype=float)
+        full = np.asarray(downsize_image_to_480p(Image.open(BytesIO(data)), draft=False), dtype=float)
+        assert drafted.shape == full.shape
+        assert np.abs(drafted - full).mean() < 2.0
+
+    def test_png_and_small_images(self):
+        image = Image.open(BytesIO(_encode((1000, 960), "PNG")))
+        assert downsize_image_to_480p(image, resample=Image.BILINEAR).size == (500, 480)
+        small = Image.open(BytesIO(_encode((320, 240), "JPEG")))
+        assert downsize_image_to_480p(small) is small
+
+
+class TestPixelBudget:
+    def test_panorama_bounded_by_long_side(self):
+        assert budget_scale((20000, 3000)) == 1280 / 20000
+        resized, scale = downsize_to_budget(Image.new("RGB", (20000, 3000)))
+        assert resized.size == (1280, 192) and scale == 0.064
+
+    def test_short_strip_is_reduced(self):
+        # Under 480 lines, so the height cap alone would keep it at full size
+        resized, _ = downsize_to_budget(Image.new("L", (10000, 400)))
+        assert resized.size[0] == 1280
+
+    def test_pixel_count_bound(self):
+        scale = budget_scale((3000, 3000), {'max_pixels': 250000})
+        assert scale == 500 / 3000
+
+    def test_photo_matches_height_cap(self):
+        image = Image.open(BytesIO(_encode((1600, 720), "PNG")))
+        resized, scale = downsize_to_budget(image)
+        assert resized.size == (1066, 480) and scale == 480 / 720
+
+    def test_prepared_inputs_report_scale(self):
+        inputs = prepare_analysis_inputs(_encode((2400, 1800), "JPEG"))
+        decoded = Image.open(BytesIO(detector_input(inputs, 'cfa')))
+        assert decoded.format == "PNG" and decoded.size == (640, 480)
+        summary = describe_inputs(inputs)
+        assert summary['original_size'] == [2400, 1800]
+        assert summary['scale'] == 480 / 1800
+        assert summary['resolutions']['default']['size'] == [640, 480]
+
+    def test_undecodable_input_falls_back(self):
+        inputs = prepare_analysis_inputs(b"not an image")
+        assert detector_input(inputs, 'cfa') == b"not an image"
+        assert describe_inputs(inputs)['scale'] == 1.0
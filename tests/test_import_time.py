@@ -0,0 +1,75 @@
+import sys
+import os
+import json
+import subprocess
+import textwrap
+
+import pytest
+
+SERVICE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service"))
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, SERVICE_ROOT)
+
+from forensics import engine, ml_predictor, tasks
+
+# Generous ceiling for a cold `import forensics.engine`; it measures about 0.1 s
+IMPORT_BUDGET_SECONDS = 0.75
+
+HEAVY_MODULES = ("mediapipe", "cv2", "sklearn", "skimage", "scipy.stats", "scipy.ndimage")
+
+
+def _import_engine_in_fresh_interpreter():
+    code = textwrap.dedent(f"""
+        import json, sys, time
+        sys.path.insert(0, {SERVICE_ROOT!r})
+        start = time.perf_counter()
+        import forensics.engine
+        elapsed = time.perf_counter() - start
+        print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+    """)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestColdStart:
+    def test_engine_import_skips_heavy_dependencies(self):
+        result = _import_engine_in_fresh_interpreter()
+        assert result["loaded"] == []
+
+    def test_engine_import_within_budget(self):
+        # Best of three, so one slow run on a busy machine does not fail the suite
+        elapsed = min(_import_engine_in_fresh_interpreter()["elapsed"] for _ in range(3))
+        assert elapsed < IMPORT_BUDGET_SECONDS
+
+    def test_detector_tasks_resolve(self):
+        for target in tasks.DETECTOR_TASKS.values():
+            assert callable(tasks.load_task(target))
+
+
+class TestModelLoading:
+    def test_missing_model_fails_without_training(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ml_predictor, "MODEL_PATH", str(tmp_path / "ml_model.joblib"))
+        monkeypatch.setattr(ml_predictor, "_current_ml_model", None)
+        monkeypatch.setattr(ml_predictor, "retrain_with_feedback", lambda: pytest.fail("must not train"))
+        with pytest.raises(ml_predictor.ModelUnavailableError):
+            ml_predictor.load_model()
+        with pytest.raises(ml_predictor.ModelUnavailableError):
+            ml_predictor.get_model()
+
+    def test_missing_training_data_fails_clearly(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ml_predictor, "MODEL_PATH", str(tmp_path / "ml_model.joblib"))
+        monkeypatch.setattr(ml_predictor, "_current_ml_model", None)
+        with pytest.raises(ml_predictor.ModelUnavailableError, match="training data"):
+            ml_predictor.load_model(train_if_missing=True)
+
+    def test_startup_rejects_model_with_other_feature_count(self, monkeypatch):
+        class OldModel:
+            n_features_in_ = len(ml_predictor.FEATURE_NAMES) - 1
+
+        monkeypatch.setattr(ml_predictor, "load_model", lambda train_if_missing=False: OldModel())
+        monkeypatch.setattr(engine, "_ml_model", None)
+        monkeypatch.setitem(engine._readiness, 'model_loaded', False)
+        with pytest.raises(ml_predictor.ModelUnavailableError, match="features"):
+            engine.startup()
+        assert engine._ml_model is None
+        assert not engine.readiness()['model_loaded']
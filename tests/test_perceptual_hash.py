@@ -0,0 +1,139 @@
+import sys
+import os
+import random
+from io import BytesIO
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from forensics.perceptual_hash import (phash, file_phash, hamming_distance, MultiIndexHash,
+                                       NearDuplicateIndex, deduplicate_files)
+from forensics.image_io import prepare_analysis_inputs
+
+
+def _picture(seed, size=(640, 480)):
+    """Smooth random scene, so copies are recognizable the way photos are."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    image = Image.fromarray(small).resize(size, Image.BICUBIC)
+    return image.filter(ImageFilter.GaussianBlur(4))
+
+
+def _jpeg(image, quality=90):
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG", quality=quality)
+    return buffered.getvalue()
+
+
+class TestPHash:
+    def test_copies_are_close_and_pictures_are_far(self):
+        original = _picture(1)
+        reencoded = Image.open(BytesIO(_jpeg(original.resize((320, 240)), quality=50)))
+        assert hamming_distance(phash(original), phash(reencoded)) <= 4
+        assert hamming_distance(phash(original), phash(_picture(2))) > 12
+
+    def test_file_hash_matches_full_decode(self, tmp_path):
+        image = _picture(3, size=(2000, 1500))
+        path = tmp_path / "photo.jpg"
+        path.write_bytes(_jpeg(image))
+        assert hamming_distance(file_phash(str(path)), phash(image)) <= 4
+        assert file_phash(str(tmp_path / "missing.jpg")) is None
+
+    def test_analysis_inputs_carry_the_hash(self):
+        image = _picture(4, size=(1600, 1200))
+        inputs = prepare_analysis_inputs(_jpeg(image))
+        assert hamming_distance(inputs["perceptual_hash"], phash(image)) <= 4
+        assert prepare_analysis_inputs(b"not an image")["perceptual_hash"] is None
+
+
+class TestMultiIndexHash:
+    def test_matches_linear_scan(self):
+        rng = random.Random(0)
+        keys = [rng.getrandbits(64) for _ in range(3000)]
+        table = MultiIndexHash(max_distance=6)
+        for key in keys:
+            table.add(key)
+        queries = [key ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for key in keys[:50]]
+        queries += [rng.getrandbits(64) for _ in range(50)]
+        for query in queries:
+            expected = sorted((hamming_distance(query, key), key) for key in keys if hamming_distance(query, key) <= 6)
+            assert table.search(query) == expected
+        # Radii beyond the build radius fall back to a scan
+        query = queries[0]
+        assert table.search(query, 10) == sorted((hamming_distance(query, key), key) for key in keys
+                                                 if hamming_distance(query, key) <= 10)
+
+    def test_remove(self):
+        table = MultiIndexHash(max_distance=4)
+        table.add(0b1011)
+        table.add(0b1011)
+        assert len(table) == 1
+        table.remove(0b1011)
+        assert len(table) == 0 and table.search(0b1011) == []
+
+
+class TestNearDuplicateIndex:
+    def test_nearest_and_eviction(self):
+        index = NearDuplicateIndex(max_distance=4, max_entries=3)
+        index.add(0, "a")
+        assert index.nearest(0b111) == (3, 0, "a")
+        assert index.nearest(0b11111) is None
+        far = [0xFFFF << shift for shift in (16, 32, 48)] # 16 bits from 0 and from each other
+        for key, record in zip(far, "bcd"):
+            index.add(key, record)
+        assert len(index) == 3
+        assert index.nearest(0) is None # The oldest entry was dropped
+        assert index.nearest(far[2])[2] == "d"
+        index.clear()
+        assert len(index) == 0
+
+
+class TestDeduplicateFiles:
+    def test_keeps_first_copy(self, tmp_path):
+        paths = []
+        for name, image, quality in (("a.jpg", _picture(5), 90), ("b.jpg", _picture(6), 90),
+                                     ("a_copy.jpg", _picture(5).resize((400, 300)), 60)):
+            path = tmp_path / name
+            path.write_bytes(_jpeg(image, quality))
+            paths.append(str(path))
+        broken = tmp_path / "broken.jpg"
+        broken.write_bytes(b"not an image")
+        kept, duplicates = deduplicate_files(paths + [str(broken)])
+        assert kept == [paths[0], paths[1], str(broken)]
+        assert duplicates == {paths[2]: paths[0]}
+
+
+class _Analyzed(Exception):
+    """Raised in place of running the detectors."""
+
+
+class TestEngineReuse:
+    def _analyze(self, monkeypatch, distance):
+        from forensics import engine
+        index = NearDuplicateIndex(max_distance=engine.NEAR_DUPLICATE_MAX_DISTANCE)
+        prior = {'prediction': 'real', 'confidence': 0.9, 'profile': {'name': 'thorough', 'skipped_features': []}}
+        index.add(0, prior)
+        inputs = {'original_size': (64, 64), 'resolutions': {'default': {'bytes': b'', 'size': (64, 64), 'scale': 1.0}},
+                  'perceptual_hash': (1 << distance) - 1} # Differs from the stored hash in `distance` bits
+
+        def analyze():
+            raise _Analyzed()
+
+        monkeypatch.setattr(engine, "NEAR_DUPLICATE_MODE", "reuse")
+        monkeypatch.setattr(engine, "_near_duplicates", index)
+        monkeypatch.setattr(engine, "prepare_analysis_inputs", lambda *args, **kwargs: inputs)
+        monkeypatch.setattr(engine, "get_executor", analyze)
+        return engine.run_analysis(b"image")
+
+    def test_near_identical_copy_reuses_verdict(self, monkeypatch):
+        result = self._analyze(monkeypatch, distance=2)
+        assert result['prediction'] == 'real'
+        assert result['near_duplicate']['reused'] and result['near_duplicate']['distance'] == 2
+
+    def test_copy_within_flagging_distance_is_analyzed(self, monkeypatch):
+        # An edited copy can land this close to its original; its verdict must not be reused
+        with pytest.raises(_Analyzed):
+            self._analyze(monkeypatch, distance=5)
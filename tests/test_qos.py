@@ -0,0 +1,259 @@
+import sys
+import os
+import threading
+import time
+from io import BytesIO
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import joblib
+import numpy as np
+import pytest
+from PIL import Image
+
+from forensics import engine, ml_predictor
+from forensics.single_flight import SingleFlight
+from forensics.qos import LoadGovernor
+from forensics.profiles import PROFILES, PROFILE_ORDER, get_profile, skipped_features, covers
+from forensics.image_io import prepare_analysis_inputs, detector_input
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _run(governor, clock, seconds, profile=None):
+    """Records one analysis that took the given time."""
+    with governor.track(profile):
+        clock.now += seconds
+
+
+class TestLoadGovernor:
+    def _governor(self, **kwargs):
+        clock = FakeClock()
+        settings = dict(max_in_flight=2, max_p95_seconds=10.0, min_samples=3, step_down_seconds=5.0,
+                        step_up_seconds=30.0, clock=clock)
+        settings.update(kwargs)
+        return LoadGovernor(**settings), clock
+
+    def test_starts_thorough(self):
+        governor, _ = self._governor()
+        assert governor.current_profile() == 'thorough'
+        assert governor.status()['p95_seconds'] is None
+
+    def test_steps_down_on_queue_depth(self):
+        governor, clock = self._governor()
+        clock.now += 10
+        with governor.track(), governor.track(), governor.track():
+            assert governor.current_profile() == 'balanced'
+            # A second step down waits for step_down_seconds
+            with governor.track():
+                assert governor.current_profile() == 'balanced'
+            clock.now += 5
+            assert governor.current_profile() == 'fast'
+            # There is nothing below the cheapest profile
+            clock.now += 5
+            assert governor.current_profile() == 'fast'
+        assert governor.step_downs == 2
+
+    def test_steps_down_on_p95_latency(self):
+        governor, clock = self._governor()
+        clock.now += 10
+        for seconds in (2.0, 3.0):
+            _run(governor, clock, seconds)
+        assert governor.current_profile() == 'thorough'
+        _run(governor, clock, 15.0)
+        assert governor.current_profile() == 'balanced'
+        # The slow samples of the previous level are forgotten
+        assert governor.status()['samples'] == 0
+
+    def test_steps_up_when_load_subsides(self):
+        governor, clock = self._governor(step_down_seconds=0.0)
+        with governor.track(), governor.track(), governor.track():
+            pass
+        assert governor.current_profile() == 'balanced'
+        # Fast enough to stay, but not fast enough to step up (hysteresis)
+        for _ in range(3):
+            _run(governor, clock, 7.0)
+        clock.now += 30
+        assert governor.current_profile() == 'balanced'
+        for _ in range(50):
+            _run(governor, clock, 2.0)
+        assert governor.current_profile() == 'thorough'
+        assert governor.step_ups == 1
+
+    def test_idle_service_steps_up(self):
+        governor, clock = self._governor(step_down_seconds=0.0)
+        with governor.track(), governor.track(), governor.track():
+            pass
+        assert governor.current_profile() == 'balanced'
+        clock.now += 29
+        assert governor.current_profile() == 'balanced'
+        clock.now += 1
+        assert governor.current_profile() == 'thorough'
+
+    def test_pinned_requests_at_other_levels_are_not_sampled(self):
+        governor, clock = self._governor()
+        for _ in range(5):
+            _run(governor, clock, 60.0, profile='fast')
+        assert governor.current_profile() == 'thorough'
+        assert governor.status()['samples'] == 0
+
+    def test_limit_keeps_cheaper_profiles_off(self):
+        governor, clock = self._governor()
+        clock.now += 10
+        with governor.track(), governor.track(), governor.track():
+            assert governor.current_profile() == 'balanced'
+            governor.limit('thorough')
+            assert governor.current_profile() == 'thorough'
+            clock.now += 10
+            assert governor.current_profile() == 'thorough'
+            assert governor.status()['lowest_profile'] == 'thorough'
+            governor.limit(None)
+            assert governor.current_profile() == 'balanced'
+
+    def test_concurrent_tracking(self):
+        governor = LoadGovernor(max_in_flight=1000)
+        threads = [threading.Thread(target=_track_many, args=(governor,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert governor.status()['in_flight'] == 0
+
+
+class TestCoalescedLoad:
+    def test_only_the_leader_counts_as_load(self, monkeypatch):
+        governor = LoadGovernor(max_in_flight=1000)
+        started, release = threading.Event(), threading.Event()
+        in_flight = []
+
+        def fake_analysis(image_bytes, profile=None, **options):
+            in_flight.append(governor.status()['in_flight'])
+            started.set()
+            release.wait(10)
+            return {'profile': {'name': profile}}
+
+        monkeypatch.setattr(engine, "_governor", governor)
+        monkeypatch.setattr(engine, "_single_flight", SingleFlight())
+        monkeypatch.setattr(engine, "run_analysis", fake_analysis)
+        callers = [threading.Thread(target=engine.run_analysis_coalesced, args=(b"same image",)) for _ in range(5)]
+        for caller in callers:
+            caller.start()
+        assert started.wait(10)
+        time.sleep(0.1) # Let the followers join the running analysis
+        assert governor.status()['in_flight'] == 1
+        release.set()
+        for caller in callers:
+            caller.join(10)
+        assert in_flight == [1]
+        assert governor.status()['in_flight'] == 0
+
+
+def _track_many(governor):
+    for _ in range(100):
+        with governor.track():
+            governor.current_profile()
+
+
+class TestProfiles:
+    def test_profiles_get_cheaper(self):
+        detectors = [set(PROFILES[name]['detectors']) for name in PROFILE_ORDER]
+        assert detectors[0] >= detectors[1] >= detectors[2]
+        assert 'geometric' not in detectors[1]
+        with pytest.raises(ValueError):
+            get_profile('instant')
+
+    def test_skipped_features(self):
+        assert skipped_features('thorough', ml_predictor.FEATURE_NAMES) == set()
+        assert skipped_features('balanced', ml_predictor.FEATURE_NAMES) == {'geometric'}
+        assert skipped_features('fast', ml_predictor.FEATURE_NAMES) == {'geometric', 'hos', 'rambino', 'specialized'}
+        # Tiled mode computes HOS and RAMBiNo from the tiles
+        assert skipped_features('fast', ml_predictor.FEATURE_NAMES, tiled=True) == {'geometric', 'specialized'}
+
+    def test_covers(self):
+        assert covers('thorough', 'fast') and covers('balanced', 'balanced')
+        assert not covers('fast', 'thorough')
+
+    def test_profiles_keep_the_training_resolution(self):
+        # The model is trained on default-budget features; a cheaper profile only skips detectors
+        buffered = BytesIO()
+        Image.new('RGB', (1920, 1080), 'gray').save(buffered, format='JPEG')
+        inputs = prepare_analysis_inputs(buffered.getvalue(), detectors=PROFILES['fast']['detectors'])
+        assert list(inputs['resolutions']) == ['default']
+        assert inputs['resolutions']['default']['size'][1] == 480
+        assert detector_input(inputs, 'cfa') == inputs['resolutions']['default']['bytes']
+
+
+class _ScoringModel:
+    """Stands in for the trained model; it takes one feature per FEATURE_NAMES entry."""
+    n_features_in_ = len(ml_predictor.FEATURE_NAMES)
+
+    def predict(self, features):
+        assert features.shape == (1, self.n_features_in_)
+        return np.array([0])
+
+    def predict_proba(self, features):
+        return np.array([[0.8, 0.2]])
+
+
+class TestShippedTrainingData:
+    @pytest.fixture
+    def engine_state(self, monkeypatch):
+        # The shipped training data at ml_predictor.MODEL_PATH, checked afresh
+        monkeypatch.setattr(ml_predictor, "_feature_means", None)
+        monkeypatch.setattr(engine, "_imputation_checked", False)
+        monkeypatch.setattr(engine, "_readiness", dict(engine._readiness, imputation_error=None))
+        monkeypatch.setattr(engine, "_governor", LoadGovernor())
+        monkeypatch.setattr(engine, "_ml_model", _ScoringModel())
+        monkeypatch.setattr(engine, "NEAR_DUPLICATE_MODE", "off")
+        yield
+        engine.shutdown_executor()
+
+    def test_fast_profile_does_not_fail(self, engine_state):
+        buffered = BytesIO()
+        Image.new('RGB', (320, 240), 'gray').save(buffered, format='JPEG')
+        result = engine.run_analysis(buffered.getvalue(), profile='fast')
+        assert result['prediction'] == 'real'
+        assert result['profile']['requested'] == 'fast'
+        if engine.readiness()['imputation_error'] is None:
+            assert result['profile']['name'] == 'fast'
+        else:
+            # Training data that does not match FEATURE_NAMES cannot impute: the full profile runs
+            assert result['profile']['name'] == 'thorough' and result['profile']['skipped_features'] == []
+            assert engine.readiness()['qos']['lowest_profile'] == 'thorough'
+
+
+class TestImputation:
+    def _training_data(self, tmp_path, monkeypatch, columns):
+        monkeypatch.setattr(ml_predictor, "MODEL_PATH", str(tmp_path / "ml_model.joblib"))
+        monkeypatch.setattr(ml_predictor, "_feature_means", None)
+        joblib.dump({'features': np.array([[0.2] * columns, [0.4] * columns]), 'labels': np.array([0, 1])},
+                    str(tmp_path / "ml_model_training_data.joblib"))
+
+    def test_skipped_features_get_training_means(self, tmp_path, monkeypatch):
+        self._training_data(tmp_path, monkeypatch, len(ml_predictor.FEATURE_NAMES))
+        features = [0.9] * len(ml_predictor.FEATURE_NAMES)
+        imputed = ml_predictor.impute_features(features, {'geometric', 'statistical_anomaly'})
+        geometric = ml_predictor.FEATURE_NAMES.index('geometric')
+        assert imputed[geometric] == pytest.approx(0.3)
+        assert imputed[-1] == pytest.approx(0.3)
+        assert imputed[:geometric] == features[:geometric]
+        assert features == [0.9] * len(ml_predictor.FEATURE_NAMES)
+
+    def test_misaligned_training_data_raises(self, tmp_path, monkeypatch):
+        self._training_data(tmp_path, monkeypatch, len(ml_predictor.FEATURE_NAMES) - 1)
+        features = [0.9] * len(ml_predictor.FEATURE_NAMES)
+        with pytest.raises(ValueError, match="feature columns"):
+            ml_predictor.impute_features(features, {'geometric'})
+        # Nothing to impute: the training data is not needed
+        assert ml_predictor.impute_features(features, set()) == features
+
+    def test_missing_training_data_imputes_zero(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ml_predictor, "MODEL_PATH", str(tmp_path / "ml_model.joblib"))
+        monkeypatch.setattr(ml_predictor, "_feature_means", None)
+        assert ml_predictor.impute_features([0.5, 0.5], {'cfa'}) == [0.5, 0.0]
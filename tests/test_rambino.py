@@ -0,0 +1,45 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import numpy as np
+from forensics import rambino
+
+
+def make_noise_image(height, width, seed=0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.random((height, width)) * 255).astype(np.uint8)
+
+
+class TestRambino:
+    def test_batched_histograms_match_histogram2d(self):
+        rng = np.random.default_rng(3)
+        a = rng.normal(0.0, 0.03, (3, 40, 40)).astype(np.float32)
+        b = rng.normal(0.0, 0.03, (3, 40, 40)).astype(np.float32)
+        batched = rambino._bivariate_hist(a, b, bins=16, range_val=0.05)
+        for i in range(3):
+            ca = np.clip(a[i], -0.05, 0.05).ravel()
+            cb = np.clip(b[i], -0.05, 0.05).ravel()
+            expected, _, _ = np.histogram2d(ca, cb, bins=16, range=[[-0.05, 0.05], [-0.05, 0.05]], density=True)
+            np.testing.assert_allclose(batched[i], expected)
+
+    def test_patch_sampling_is_deterministic(self):
+        image = make_noise_image(600, 700)
+        first = rambino.compute_rambino_features(image)
+        second = rambino.compute_rambino_features(image)
+        assert first.shape == (17,)
+        np.testing.assert_array_equal(first, second)
+
+    def test_global_rng_state_is_untouched(self):
+        np.random.seed(1234)
+        expected = np.random.random()
+        np.random.seed(1234)
+        rambino.compute_rambino_features(make_noise_image(600, 700))
+        assert np.random.random() == expected
+
+    def test_small_image_uses_full_decomposition(self):
+        feats = rambino.compute_rambino_features(make_noise_image(120, 150))
+        # 2 levels x 3 subbands x 4 offsets x 17 summary values
+        assert feats.shape == (2 * 3 * 4 * 17,)
+        assert feats.dtype == np.float32
@@ -0,0 +1,60 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from forensics import ela, jpeg_ghost
+from forensics.recompression import RecompressionCache, run_recompression_analysis
+
+
+def make_image_bytes(height=64, width=96, seed=0) -> bytes:
+    rng = np.random.default_rng(seed)
+    buffered = BytesIO()
+    Image.fromarray((rng.random((height, width, 3)) * 255).astype(np.uint8)).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class TestRecompressionCache:
+    def test_each_quality_is_encoded_once(self):
+        cache = RecompressionCache.from_bytes(make_image_bytes())
+        first = cache.recompressed(95, 'RGB')
+        assert cache.recompressed(95, 'RGB') is first
+        gray = cache.recompressed(95, 'L')
+        # The grayscale view is decoded from the same RGB encode
+        assert cache.encode_count == 1
+        assert first.shape == (64, 96, 3)
+        assert gray.shape == (64, 96)
+        assert not first.flags.writeable
+
+    def test_grayscale_view_matches_grayscale_encode(self):
+        cache = RecompressionCache.from_bytes(make_image_bytes(seed=3))
+        buffer = BytesIO()
+        cache.image('L').save(buffer, format='JPEG', quality=90)
+        expected = np.asarray(Image.open(buffer), dtype=np.float32)
+        # Same luma plane and quantization; only rounding in the color conversion differs
+        assert np.abs(cache.recompressed(90, 'L') - expected).max() <= 2
+
+    def test_shared_cache_matches_standalone_detectors(self):
+        image_bytes = make_image_bytes(seed=1)
+        cache = RecompressionCache.from_bytes(image_bytes)
+        assert jpeg_ghost.analyze_jpeg_ghost(image_bytes, cache=cache) == jpeg_ghost.analyze_jpeg_ghost(image_bytes)
+        assert ela.analyze_ela(image_bytes, cache=cache) == ela.analyze_ela(image_bytes)
+        # ELA's q95 encode is one of the 26 ghost encodes (q75-q100)
+        assert cache.encode_count == 26
+
+    def test_runner_scores_both_detectors(self):
+        image_bytes = make_image_bytes(seed=4)
+        assert run_recompression_analysis(image_bytes) == {
+            'ela': ela.analyze_ela(image_bytes), 'jpeg_ghost': jpeg_ghost.analyze_jpeg_ghost(image_bytes)}
+        assert run_recompression_analysis(b"not an image") == {'ela': 0.0, 'jpeg_ghost': 0.0}
+
+    def test_multi_quality_ela_reuses_encodes(self):
+        image_bytes = make_image_bytes(seed=2)
+        cache = RecompressionCache.from_bytes(image_bytes)
+        scores = ela.analyze_ela_multi_quality(image_bytes, qualities=(75, 95), cache=cache)
+        assert scores[95] == ela.analyze_ela(image_bytes, cache=cache)
+        assert cache.encode_count == 2
+        assert ela.analyze_ela_multi_quality(b"not an image") == {}
@@ -0,0 +1,129 @@
+import sys
+import os
+import json
+import threading
+import time
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import numpy as np
+import pytest
+
+from forensics.single_flight import SingleFlight, content_key
+
+
+def _run_concurrently(callables):
+    results, errors = [None] * len(callables), [None] * len(callables)
+
+    def call(i):
+        try:
+            results[i] = callables[i]()
+        except Exception as e:
+            errors[i] = e
+
+    workers = [threading.Thread(target=call, args=(i,)) for i in range(len(callables))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    return results, errors
+
+
+class SlowAnalysis:
+    """Counts its calls and blocks until released, so concurrent callers overlap."""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.fail = fail
+
+    def __call__(self, data):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(timeout=10)
+        if self.fail:
+            raise ValueError("analysis failed")
+        return {"score": np.float64(0.75), "size": len(data)}
+
+
+class TestContentKey:
+    def test_options_change_the_key(self):
+        assert content_key(b"image") == content_key(b"image")
+        assert content_key(b"image") != content_key(b"other")
+        assert content_key(b"image", tiled=True) != content_key(b"image")
+        assert content_key(b"image", tiled=True, tile_size=512) == content_key(b"image", tile_size=512, tiled=True)
+
+
+class TestInProcess:
+    def test_identical_calls_share_one_computation(self):
+        flight, analysis = SingleFlight(), SlowAnalysis()
+        key = content_key(b"viral")
+        callables = [lambda: flight.run(key, analysis, b"viral") for _ in range(8)]
+        threading.Timer(0.2, analysis.release.set).start()
+        results, errors = _run_concurrently(callables)
+        assert errors == [None] * 8
+        assert analysis.calls == 1
+        assert flight.computed == 1 and flight.coalesced == 7
+        assert all(result == {"score": 0.75, "size": 5} for result in results)
+        # Every caller gets its own copy
+        assert len({id(result) for result in results}) == 8
+
+    def test_different_keys_run_separately(self):
+        flight = SingleFlight()
+        assert flight.run("a", len, b"ab") == 2
+        assert flight.run("b", len, b"abc") == 3
+        assert flight.computed == 2 and flight.coalesced == 0
+
+    def test_failure_reaches_every_waiter(self):
+        flight, analysis = SingleFlight(), SlowAnalysis(fail=True)
+        callables = [lambda: flight.run("key", analysis, b"x") for _ in range(4)]
+        threading.Timer(0.2, analysis.release.set).start()
+        _, errors = _run_concurrently(callables)
+        assert analysis.calls == 1
+        assert all(isinstance(error, ValueError) for error in errors)
+
+    def test_finished_work_is_not_reused(self):
+        flight = SingleFlight()
+        flight.run("key", len, b"x")
+        flight.run("key", len, b"x")
+        assert flight.computed == 2
+
+
+class TestAcrossProcesses:
+    def test_second_process_waits_for_the_lease_holder(self, tmp_path):
+        # Two instances sharing a directory behave like two uvicorn workers
+        leader, follower = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path), poll_interval=0.01)
+        analysis = SlowAnalysis()
+        key = content_key(b"viral")
+        leader_thread = threading.Thread(target=leader.run, args=(key, analysis, b"viral"))
+        leader_thread.start()
+        assert analysis.started.wait(timeout=10)
+        threading.Timer(0.2, analysis.release.set).start()
+        result = follower.run(key, analysis, b"viral")
+        leader_thread.join(timeout=10)
+        assert analysis.calls == 1
+        assert result == {"score": 0.75, "size": 5}
+        assert follower.computed == 0 and follower.coalesced == 1
+        assert not (tmp_path / f"{key}.lease").exists()
+
+    def test_failure_is_shared_across_processes(self, tmp_path):
+        leader, follower = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path), poll_interval=0.01)
+        analysis = SlowAnalysis(fail=True)
+        leader_thread = threading.Thread(target=lambda: pytest.raises(ValueError, leader.run, "key", analysis, b"x"))
+        leader_thread.start()
+        assert analysis.started.wait(timeout=10)
+        threading.Timer(0.2, analysis.release.set).start()
+        with pytest.raises(RuntimeError, match="analysis failed"):
+            follower.run("key", analysis, b"x")
+        leader_thread.join(timeout=10)
+        assert analysis.calls == 1
+
+    def test_abandoned_lease_is_taken_over(self, tmp_path):
+        # A lease left behind by a worker that died mid-analysis
+        lease = {"token": "dead", "pid": os.getpid(), "started": time.time() - 3600}
+        (tmp_path / "key.lease").write_text(json.dumps(lease))
+        flight = SingleFlight(str(tmp_path), lease_timeout=60, poll_interval=0.01)
+        assert flight.run("key", len, b"abc") == 3
+        assert flight.computed == 1
+        assert not (tmp_path / "key.lease").exists()
@@ -0,0 +1,43 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import pytest
+import numpy as np
+from scipy import ndimage
+from forensics import specialized_detectors
+
+DETECTORS = ('_detect_gan_fingerprints', '_detect_diffusion_artifacts',
+             '_detect_face_synthesis', '_detect_3d_rendering')
+
+
+def make_scene(height=200, width=240, seed=0) -> np.ndarray:
+    # Smooth shading, a few hard-edged shapes and sensor-like noise
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[:height, :width]
+    base = 90 + 60 * np.sin(x / 23.0) * np.cos(y / 31.0)
+    base[40:120, 60:150] += 50
+    base[(y - 140) ** 2 + (x - 180) ** 2 < 30 ** 2] -= 40
+    channels = [base + offset + rng.normal(0, 6, base.shape) for offset in (-10, 0, 15)]
+    return np.clip(np.dstack(channels), 0, 255).astype(np.uint8)
+
+
+class TestSpecializedFloat32:
+    def test_local_std_matches_generic_filter(self):
+        image = ndimage.gaussian_filter(np.random.default_rng(1).random((60, 70)), 2).astype(np.float32) * 255
+        for size in (16, 20):
+            expected = ndimage.generic_filter(image.astype(np.float64), np.std, size=size)
+            np.testing.assert_allclose(specialized_detectors._local_std(image, size), expected, atol=1e-2)
+
+    @pytest.mark.parametrize("seed", [0, 1])
+    def test_float32_scores_match_float64(self, monkeypatch, seed):
+        image = make_scene(seed=seed)
+        monkeypatch.setattr(specialized_detectors, "FLOAT_DTYPE", np.float64)
+        reference = {name: getattr(specialized_detectors, name)(image) for name in DETECTORS}
+        monkeypatch.setattr(specialized_detectors, "FLOAT_DTYPE", np.float32)
+        for name in DETECTORS:
+            assert getattr(specialized_detectors, name)(image) == pytest.approx(reference[name], abs=1e-3), name
+
+    def test_gray_image_uses_policy_dtype(self):
+        assert specialized_detectors._to_gray(make_scene()).dtype == specialized_detectors.FLOAT_DTYPE
@@ -0,0 +1,48 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import pytest
+import numpy as np
+from scipy import ndimage, signal
+from forensics import specialized_detectors as sd
+
+
+class TestSpecializedKernels:
+    def test_checkerboard_matches_correlate2d(self):
+        gray = (np.random.default_rng(0).random((60, 80)) * 255).astype(np.float32)
+        kernel = np.array([[1, -1], [-1, 1]], dtype=np.float64)
+        expected = np.abs(signal.correlate2d(gray.astype(np.float64), kernel, mode='valid')).mean()
+        assert sd._detect_checkerboard_pattern(gray) == pytest.approx(min(expected / 50.0, 1.0), rel=1e-5)
+
+    def test_stratified_patches_reproduce_full_image_filter(self):
+        gray = np.random.default_rng(1).random((130, 170))
+        margin = 8
+        patches = sd._stratified_patches(gray, margin, grid=4, patch_size=6, seed=3)
+        assert patches.shape == (16, 22, 22)
+        full = np.pad(ndimage.gaussian_laplace(gray, sigma=2), margin)
+        filtered = ndimage.gaussian_laplace(patches, sigma=2, axes=(1, 2))[:, margin:-margin, margin:-margin]
+        # Every filtered patch appears verbatim in the full-image response, one per stratum
+        rows = []
+        for patch in filtered:
+            hits = np.argwhere(np.isclose(full, patch[0, 0], rtol=0, atol=1e-12))
+            match = [(y, x) for y, x in hits
+                     if np.allclose(full[y:y + 6, x:x + 6], patch, rtol=0, atol=1e-12)]
+            assert match
+            rows.append(match[0][0] - margin)
+        assert min(rows) < 130 // 4 and max(rows) >= 3 * 130 // 4
+
+    def test_small_images_use_every_pixel(self):
+        gray = np.zeros((30, 40))
+        assert sd._stratified_patches(gray, 5).shape == (1, 40, 50)
+
+    def test_noise_pattern_is_deterministic(self):
+        gray = (np.random.default_rng(2).random((200, 260)) * 255).astype(np.float32)
+        assert sd._detect_diffusion_noise_pattern(gray) == sd._detect_diffusion_noise_pattern(gray)
+
+    def test_face_region_matches_the_analyzed_resolution(self):
+        faces = {'image_size': (200, 100), 'boxes': [[50, 20, 89, 59]], 'landmarks': []}
+        assert sd._face_region(faces, (100, 200, 3), margin=0.0) == (20, 60, 50, 90)
+        # Detected at half the analyzed resolution: the box is scaled up, not cropped as is
+        assert sd._face_region(faces, (200, 400, 3), margin=0.0) == (40, 119, 100, 179)
@@ -0,0 +1,36 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import pytest
+import numpy as np
+from forensics.spectrum import compute_spectrum, weighted_spectrum_stats
+
+
+def full_radial_profile(gray_image: np.ndarray) -> np.ndarray:
+    # Reference: radial mean of the fftshift-centered full spectrum
+    magnitude = np.abs(np.fft.fftshift(np.fft.fft2(gray_image)))
+    center = np.array(magnitude.shape) // 2
+    y, x = np.ogrid[:magnitude.shape[0], :magnitude.shape[1]]
+    r = np.sqrt((x - center[1]) ** 2 + (y - center[0]) ** 2).astype(int)
+    return np.array([magnitude[r == radius].mean() for radius in range(min(center))])
+
+
+class TestSpectrum:
+    @pytest.mark.parametrize("shape", [(48, 64), (49, 63), (50, 33)])
+    def test_half_spectrum_matches_full_fft(self, shape):
+        gray = np.random.default_rng(0).random(shape) * 255
+        spectrum = compute_spectrum(gray)
+        np.testing.assert_allclose(spectrum['radial_profile'], full_radial_profile(gray), rtol=1e-10)
+
+        full = np.abs(np.fft.fft2(gray))
+        mean, std = weighted_spectrum_stats(spectrum['magnitude'], spectrum['column_weights'])
+        assert mean == pytest.approx(full.mean(), rel=1e-10)
+        assert std == pytest.approx(full.std(), rel=1e-10)
+
+    def test_stack_matches_single_images(self):
+        stack = np.random.default_rng(1).random((3, 32, 40))
+        batched = compute_spectrum(stack, workers=2)
+        for i in range(3):
+            np.testing.assert_allclose(batched['radial_profile'][i], compute_spectrum(stack[i])['radial_profile'])
@@ -0,0 +1,48 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+from forensics import threads, spectrum
+
+
+class TestThreadBudget:
+    def test_cgroup_v2_quota(self, tmp_path, monkeypatch):
+        cpu_max = tmp_path / "cpu.max"
+        cpu_max.write_text("250000 100000\n")
+        monkeypatch.setattr(threads, "_CGROUP_V2_CPU_MAX", str(cpu_max))
+        monkeypatch.setattr(threads.os, "cpu_count", lambda: 64)
+        monkeypatch.setattr(threads.os, "sched_getaffinity", lambda pid: set(range(64)), raising=False)
+        assert threads.available_cpus() == 3
+
+    def test_cgroup_v1_and_unlimited(self, tmp_path, monkeypatch):
+        quota, period = tmp_path / "quota", tmp_path / "period"
+        quota.write_text("-1\n")
+        period.write_text("100000\n")
+        monkeypatch.setattr(threads, "_CGROUP_V2_CPU_MAX", str(tmp_path / "missing"))
+        monkeypatch.setattr(threads, "_CGROUP_V1_QUOTA", str(quota))
+        monkeypatch.setattr(threads, "_CGROUP_V1_PERIOD", str(period))
+        assert threads._read_cgroup_quota() is None
+        quota.write_text("200000\n")
+        assert threads._read_cgroup_quota() == (200000, 100000)
+
+    def test_plan_workers(self):
+        assert threads.plan_workers(1, cpus=16) == (16, 1)
+        assert threads.plan_workers(4, cpus=16) == (4, 4)
+        assert threads.plan_workers(8, cpus=2) == (1, 2)
+
+    def test_apply_thread_budget(self, monkeypatch):
+        import cv2
+        previous = spectrum.get_default_workers()
+        previous_cv2 = cv2.getNumThreads()
+        for name in threads.THREAD_ENV_VARS:
+            monkeypatch.delenv(name, raising=False)
+        try:
+            threads.apply_thread_budget(2)
+            assert all(os.environ[name] == "2" for name in threads.THREAD_ENV_VARS)
+            assert spectrum.get_default_workers() == 2
+        finally:
+            spectrum.set_default_workers(previous)
+            cv2.setNumThreads(previous_cv2)
+            if threads._blas_limiter is not None:
+                threads._blas_limiter.restore_original_limits()
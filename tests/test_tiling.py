@@ -0,0 +1,86 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import pytest
+import numpy as np
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from forensics.tiling import tile_boxes, analyze_tiled
+
+
+def _mean_brightness(tile):
+    return {'ela': float(tile.mean()), 'area': float(tile.shape[0] * tile.shape[1])}
+
+
+def _png(pixels):
+    buffered = BytesIO()
+    Image.fromarray(pixels).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class TestTiling:
+    def test_tiles_cover_image_on_block_grid(self):
+        width, height = 1031, 700
+        covered = np.zeros((height, width), dtype=bool)
+        for _, _, (left, top, right, bottom) in tile_boxes((width, height), tile_size=256, overlap=32):
+            assert left % 8 == 0 and top % 8 == 0
+            assert right - left <= 256 + 7 and bottom - top <= 256 + 7
+            covered[top:bottom, left:right] = True
+        assert covered.all()
+
+    def test_small_image_is_one_tile(self):
+        assert tile_boxes((300, 200)) == [(0, 0, (0, 0, 300, 200))]
+
+    def test_grid_and_weighted_scores(self):
+        pixels = np.zeros((600, 900, 3), dtype=np.uint8)
+        pixels[:, 450:] = 200
+        result = analyze_tiled(_png(pixels), _mean_brightness, tile_size=256, overlap=64)
+        assert result['size'] == [900, 600]
+        grid = np.array(result['grid']['ela'], dtype=float)
+        assert grid.shape == (result['rows'], result['cols'])
+        assert grid[:, 0].max() == 0.0 and grid[:, -1].min() == 200.0
+        assert 0.0 < result['scores']['ela'] < 200.0
+        assert 'area' not in result['grid']
+
+    def test_executor_matches_in_process(self):
+        pixels = np.random.default_rng(0).integers(0, 256, (400, 500, 3), dtype=np.uint8)
+        data = _png(pixels)
+        expected = analyze_tiled(data, _mean_brightness, tile_size=128, overlap=16)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            streamed = analyze_tiled(data, _mean_brightness, executor=executor, tile_size=128,
+                                     overlap=16, max_in_flight=2)
+        assert streamed['grid'] == expected['grid']
+        assert streamed['scores']['ela'] == pytest.approx(expected['scores']['ela'])
+
+    def test_failed_tiles_are_skipped(self):
+        def failing(tile):
+            if tile.max() > 0:
+                raise ValueError("bad tile")
+            return {'ela': 1.0}
+        pixels = np.zeros((100, 400, 3), dtype=np.uint8)
+        pixels[:, 300:] = 255  # Only in the second tile
+        result = analyze_tiled(_png(pixels), failing, tile_size=256, overlap=0)
+        assert result['grid']['ela'] == [[1.0, None]]
+        assert result['scores']['ela'] == 1.0
+
+    def test_undecodable_bytes(self):
+        result = analyze_tiled(b"not an image", _mean_brightness)
+        assert result['scores'] == {} and result['size'] is None
+
+
+class TestTiledRequests:
+    def test_api_passes_tiled_to_the_engine(self, monkeypatch):
+        import main
+        from forensics.single_flight import content_key
+        calls = []
+        monkeypatch.setattr(main.engine, "run_analysis_coalesced",
+                            lambda data, **options: calls.append(options) or {"tiles": {}})
+        image_bytes = _png(np.zeros((480, 640, 3), dtype=np.uint8))
+        result = main._analyze_single_image(image_bytes, "large.png", None, True)
+        assert calls == [{'profile': None, 'tiled': True}]
+        assert "tiles" in result["prediction"]
+        # Tiled and regular analyses of one image are not coalesced with each other
+        assert content_key(image_bytes, tiled=True) != content_key(image_bytes, tiled=False)
@@ -0,0 +1,80 @@
+import sys
+import os
+import json
+import subprocess
+import textwrap
+from io import BytesIO
+
+SERVICE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service"))
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, SERVICE_ROOT)
+
+import pytest
+from PIL import Image
+
+from forensics import engine, ml_predictor, warmup
+from forensics.tasks import DETECTOR_TASKS
+
+
+@pytest.fixture
+def fresh_readiness(monkeypatch):
+    monkeypatch.setattr(engine, "_readiness", dict(engine._readiness, model_loaded=False, pool_warm=False,
+                                                   errors={}, error=None))
+    yield
+    engine.shutdown_executor()
+
+
+class TestSyntheticImage:
+    def test_deterministic_jpeg(self):
+        data = warmup.synthetic_image_bytes((320, 240))
+        assert data == warmup.synthetic_image_bytes((320, 240))
+        image = Image.open(BytesIO(data))
+        assert image.format == "JPEG"
+        assert image.size == (320, 240)
+
+
+class TestWarmup:
+    def test_process_warmup_runs_every_detector(self):
+        result = warmup.warm_up_process()
+        assert result["pid"] == os.getpid()
+        assert result["errors"] == {}
+        # Later calls return the first result without running the detectors again
+        assert warmup.warm_up_process() is result
+        for target in DETECTOR_TASKS.values():
+            module_name = target.split(":")[0]
+            assert f"forensics.{module_name}" in sys.modules
+
+    def test_engine_ready_after_warmup(self, tmp_path):
+        # Run in a fresh interpreter like the service: forking the pool after this process
+        # has run OpenCV with a thread pool can deadlock the workers. The model is trained
+        # on one feature per FEATURE_NAMES entry, as startup() requires.
+        code = textwrap.dedent(f"""
+            import json, sys
+            import numpy as np
+            sys.path.insert(0, {SERVICE_ROOT!r})
+            from forensics import engine, ml_predictor
+            ml_predictor.MODEL_PATH = {str(tmp_path / "ml_model.joblib")!r}
+            rng = np.random.default_rng(0)
+            ml_predictor.train_and_save_model(rng.random((40, len(ml_predictor.FEATURE_NAMES))), np.arange(40) % 2)
+            before = engine.readiness()["ready"]
+            status = engine.warm_up()
+            status["before"] = before
+            status["max_workers"] = engine.get_executor().max_workers
+            engine.shutdown_executor()
+            print(json.dumps(status))
+        """)
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                timeout=300).stdout
+        status = json.loads(output.strip().splitlines()[-1])
+        assert status["before"] is False
+        assert status["ready"] is True
+        assert status["workers"] == status["max_workers"]
+        assert status["error"] is None
+
+    def test_not_ready_without_model(self, fresh_readiness, tmp_path, monkeypatch):
+        monkeypatch.setattr(ml_predictor, "MODEL_PATH", str(tmp_path / "ml_model.joblib"))
+        monkeypatch.setattr(ml_predictor, "_current_ml_model", None)
+        monkeypatch.setattr(engine, "_ml_model", None)
+        status = engine.warm_up()
+        assert status["ready"] is False
+        assert "No trained ML model" in status["error"]
@@ -0,0 +1,42 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import cv2
+import numpy as np
+from forensics import watermarking
+
+
+def full_spectrum_score(gray_image: np.ndarray) -> float:
+    # Reference: the full fft2 spectrum statistics the half-spectrum path must reproduce
+    magnitude_spectrum = 20 * np.log(np.abs(np.fft.fftshift(np.fft.fft2(gray_image))) + 1e-10)
+    threshold = magnitude_spectrum.mean() + 3 * magnitude_spectrum.std()
+    return min(1.0, np.sum(magnitude_spectrum > threshold) / (gray_image.size * 0.01))
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+class TestWatermarkSpectrum:
+    def test_half_spectrum_matches_full_fft(self):
+        rng = np.random.default_rng(5)
+        stack = (rng.random((3, 256, 256)) * 255).astype(np.uint8)
+        stack[1, ::8, :] = 255  # periodic pattern with strong spectral peaks
+        scores = watermarking._frequency_domain_scores(stack)
+        for gray_image, score in zip(stack, scores):
+            assert score == full_spectrum_score(gray_image.astype(np.float32))
+
+    def test_lsb_uses_native_resolution(self):
+        # Constant LSBs are destroyed by INTER_AREA resampling but must still be detected
+        rng = np.random.default_rng(1)
+        image = (rng.integers(0, 128, (300, 400)) * 2).astype(np.uint8)
+        assert watermarking._least_significant_bit_analysis(encode_png(image)) == 1.0
+
+    def test_batch_matches_single_image_scores(self):
+        rng = np.random.default_rng(2)
+        images = [encode_png((rng.random((120 + 10 * i, 90, 3)) * 255).astype(np.uint8)) for i in range(3)]
+        scores = watermarking.analyze_watermark_batch(images + [b"not an image"])
+        np.testing.assert_allclose(scores[:3], [watermarking.analyze_watermark(b) for b in images])
+        assert scores[3] == 0.0
@@ -0,0 +1,72 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+from io import BytesIO
+import numpy as np
+import pywt
+from PIL import Image
+from forensics import hos, rambino
+from forensics.wavelets import WaveletCache
+
+
+def make_gray(height=96, width=128, seed=0) -> np.ndarray:
+    return np.random.default_rng(seed).random((height, width)).astype(np.float32)
+
+
+class TestWaveletCache:
+    def test_decomposition_is_computed_once_per_key(self):
+        cache = WaveletCache(make_gray())
+        first = cache.decomposition('db1', 3)
+        assert cache.decomposition('db1', 3) is first
+        cache.decomposition('db2', 2)
+        cache.decomposition('db2', 2, region=((0, 0, 32, 32), (10, 20, 32, 32)))
+        assert cache.transform_count == 3
+
+    def test_region_stack_matches_individual_crops(self):
+        gray = make_gray(seed=1)
+        cache = WaveletCache(gray)
+        cH, cV, cD = cache.decomposition('db2', 1, region=((0, 0, 32, 32), (10, 20, 32, 32)))[1]
+        expected = pywt.wavedec2(gray[10:42, 20:52], 'db2', level=1)[1]
+        np.testing.assert_allclose(cD[1], expected[2])
+
+    def test_hos_finest_level_matches_dwt2(self):
+        gray = make_gray(seed=2)
+        cache = WaveletCache(gray)
+        stats = hos.compute_hos_statistics(cache, levels=3)
+        assert list(stats) == ['level_1', 'level_2', 'level_3']
+        _, (_, _, cD) = pywt.dwt2(gray, 'db1')
+        assert np.isclose(stats['level_1']['diagonal']['variance'], np.var(cD))
+        # Score and statistics share the single db1 decomposition
+        hos.analyze_hos(b"", wavelets=cache)
+        assert cache.transform_count == 1
+
+    def test_rambino_uses_shared_cache(self):
+        gray = make_gray(300, 400, seed=3)
+        cache = WaveletCache(gray)
+        np.testing.assert_array_equal(rambino.compute_rambino_features(gray, wavelets=cache),
+                                      rambino.compute_rambino_features(gray))
+        rambino.compute_rambino_features(gray, wavelets=cache)
+        assert cache.transform_count == 1
+
+
+def make_gray_bytes(height=96, width=128, seed=0) -> bytes:
+    buffered = BytesIO()
+    Image.fromarray((make_gray(height, width, seed) * 255).astype(np.uint8)).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class TestWaveletTasks:
+    def test_hos_task_returns_score_and_statistics(self):
+        image_bytes = make_gray_bytes(seed=4)
+        result = hos.run_hos_analysis(image_bytes)
+        assert result['hos'] == hos.analyze_hos(image_bytes)
+        assert list(result['hos_statistics']) == ['level_1', 'level_2', 'level_3']
+        assert hos.run_hos_analysis(b"not an image") == {'hos': 0.0, 'hos_statistics': {}}
+
+    def test_rambino_task_scales_raw_score(self):
+        result = rambino.run_rambino_analysis(make_gray_bytes(300, 400, seed=5))
+        assert result['score'] == np.clip(result['raw_score'] / 30000.0, 0.0, 1.0)
+        assert 0 < len(result['features']) <= 128
+        assert rambino.run_rambino_analysis(b"not an image") == {'score': 0.0, 'features': None, 'raw_score': 0.0}
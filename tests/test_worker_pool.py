@@ -0,0 +1,143 @@
+import sys
+import os
+# Add the service root to sys.path so the forensics package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cgi-detector-service")))
+
+import threading
+import time
+import pytest
+from forensics import worker_pool
+from forensics.worker_pool import RecyclingExecutor, current_rss_mb, plan_rss_ceiling
+
+
+def _square(value):
+    return value * value
+
+
+def _slow_pid(delay):
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _crash():
+    os._exit(1)
+
+
+def _fail():
+    raise ValueError("detector error")
+
+
+def _mark_initialized():
+    os.environ["CGI_TEST_WORKER_INIT"] = "pool"
+
+
+def _init_state():
+    return os.environ.get("CGI_TEST_WORKER_INIT"), os.getpid()
+
+
+class TestRecyclingExecutor:
+    def test_runs_tasks(self):
+        executor = RecyclingExecutor(max_workers=2)
+        try:
+            assert [executor.submit(_square, n).result(timeout=30) for n in range(4)] == [0, 1, 4, 9]
+            assert executor.generation == 1 and executor.recycle_count == 0
+        finally:
+            executor.shutdown()
+
+    def test_task_errors_propagate_without_recycling(self):
+        executor = RecyclingExecutor(max_workers=1)
+        try:
+            with pytest.raises(ValueError):
+                executor.submit(_fail).result(timeout=30)
+            assert executor.submit(_square, 3).result(timeout=30) == 9
+            assert executor.recycle_count == 0
+        finally:
+            executor.shutdown()
+
+    def test_recycles_after_task_budget(self):
+        executor = RecyclingExecutor(max_workers=1, max_tasks_per_child=2)
+        try:
+            pids = [executor.submit(_slow_pid, 0).result(timeout=30) for _ in range(4)]
+            assert pids[0] == pids[1] and pids[1] != pids[2]
+            assert executor.generation == 2
+        finally:
+            executor.shutdown()
+
+    def test_rss_ceiling_recycles_worker(self):
+        executor = RecyclingExecutor(max_workers=1, max_rss_mb=0)
+        try:
+            first = executor.submit(_slow_pid, 0).result(timeout=30)
+            second = executor.submit(_slow_pid, 0).result(timeout=30)
+            assert first != second and executor.recycle_count >= 1
+        finally:
+            executor.shutdown()
+
+    def test_crash_does_not_fail_in_flight_tasks(self):
+        executor = RecyclingExecutor(max_workers=2)
+        try:
+            survivors = [executor.submit(_slow_pid, 0.5) for _ in range(3)]
+            poisoned = executor.submit(_crash)
+            assert all(isinstance(future.result(timeout=60), int) for future in survivors)
+            with pytest.raises(Exception):
+                poisoned.result(timeout=60)
+            # The service keeps working on a replacement pool
+            assert executor.submit(_square, 5).result(timeout=30) == 25
+            assert executor.generation >= 2
+        finally:
+            executor.shutdown()
+
+    def test_retries_are_serial_and_skip_the_pool_initializer(self):
+        executor = RecyclingExecutor(max_workers=3, initializer=_mark_initialized)
+        try:
+            bystanders = [executor.submit(_slow_pid, 0.5) for _ in range(2)]
+            executor.submit(_crash)
+            bystanders += [executor.submit(_init_state) for _ in range(2)]
+            retried = [future.result(timeout=60) for future in bystanders]
+            assert all(state is None for state, _ in retried[2:])
+            assert executor.submit(_init_state).result(timeout=30)[0] == "pool"
+        finally:
+            executor.shutdown()
+
+    def test_current_rss(self):
+        assert current_rss_mb() > 0
+
+
+class TestRssCeiling:
+    def test_splits_memory_over_workers(self):
+        assert plan_rss_ceiling(4, fraction=0.75, memory_mb=2048) == 384
+        assert plan_rss_ceiling(0, fraction=0.5, memory_mb=2048) == 1024
+        assert plan_rss_ceiling(2, memory_mb=0) is None
+
+    def test_reads_cgroup_limit(self, tmp_path, monkeypatch):
+        memory_max = tmp_path / "memory.max"
+        memory_max.write_text(f"{2048 * 1024 * 1024}\n")
+        monkeypatch.setattr(worker_pool, "_CGROUP_V2_MEMORY_MAX", str(memory_max))
+        physical = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        assert worker_pool.available_memory_mb() == min(2048, physical)
+        memory_max.write_text("max\n")
+        assert worker_pool.available_memory_mb() == physical
+
+
+class TestEngineExecutor:
+    def test_concurrent_first_use_creates_one_pool(self, monkeypatch):
+        from forensics import engine
+        created = []
+
+        class SlowExecutor:
+            def __init__(self, **kwargs):
+                time.sleep(0.05) # Widen the window between the None check and the assignment
+                created.append(self)
+
+            def shutdown(self, wait=True):
+                pass
+
+        monkeypatch.setattr(engine, "RecyclingExecutor", SlowExecutor)
+        monkeypatch.setattr(engine, "_executor", None)
+        threads = [threading.Thread(target=engine.get_executor) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        assert len(created) == 1 and engine.get_executor() is created[0]
+        engine.shutdown_executor()
+        assert engine._executor is None